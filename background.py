@@ -0,0 +1,404 @@
+'''
+Background execution of the heavy S-tilde commands.
+
+polar_plot_async, loadCSV_async, multiple_vectors_async and checkVecs_async
+run the parsing and geometry work of their synchronous counterparts in a
+thread pool (or, for polar plots with process=1, a process pool) and return
+a job id at once. Only the final load_cgo/group calls are handed back to the
+PyMOL thread: in the GUI through a queued Qt signal, otherwise whenever
+stilde_jobs, stilde_wait or the next background command runs. stilde_jobs
+lists the jobs with their progress, stilde_cancel stops them and stilde_wait
+blocks until they finish.
+
+Without the GUI nothing else loads finished results, so headless scripts must
+call stilde_wait before they save, render or read back the objects.
+'''
+import itertools
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures import wait as wait_futures
+import numpy as np
+from pymol import cmd
+import pymol_functions
+from generate_arrow import arrow_colors
+from stilde_table import row_vectors
+
+##Pool sizes, defaults to the number of cores
+workers = None
+
+##Every job submitted, by id
+jobs = OrderedDict()
+
+##Emit steps waiting for the PyMOL thread
+pending = queue.Queue()
+
+_ids = itertools.count(1)
+_local = threading.local()
+_pools = {}
+_dispatcher = None
+
+
+class Cancelled(Exception):
+    '''Raised inside a job that was cancelled while running'''
+
+
+class Job:
+    '''
+       State of one background command
+
+       :param name: Name of the command
+       :type name: String
+
+       :param emit: Function loading the result into PyMOL
+       :type emit: Function, optional
+    '''
+    def __init__(self, name, emit=None):
+        self.id = next(_ids)
+        self.name = name
+        self.emit = emit
+        self.status = 'queued'
+        self.progress = 0.0
+        self.submitted = time.time()
+        self.finished = None
+        self.result = None
+        self.error = None
+        self.future = None
+        self.cancelled = threading.Event()
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.time()) - self.submitted
+
+    @property
+    def active(self):
+        return self.status in ('queued', 'running', 'emitting')
+
+    def cancel(self):
+        '''Stops the job before its next progress report and skips its emit step'''
+        self.cancelled.set()
+        if self.future is not None and self.future.cancel():
+            self.status = 'cancelled'
+
+
+def progress(fraction):
+    '''
+       Reports the progress of the job running in this thread, if any
+
+       Raises Cancelled once the job was cancelled, so call it between steps.
+
+       :param fraction: Part of the work done, between 0 and 1
+       :type fraction: Float
+    '''
+    job = getattr(_local, 'job', None)
+    if job is None:
+        return
+    if job.cancelled.is_set():
+        raise Cancelled(job.id)
+    job.progress = float(fraction)
+
+
+def _pool(process):
+    kind = 'process' if process else 'thread'
+    if kind not in _pools:
+        pool = ProcessPoolExecutor if process else ThreadPoolExecutor
+        _pools[kind] = pool(max_workers=workers)
+    return _pools[kind]
+
+
+def _run(job, compute, args):
+    _local.job = job
+    job.status = 'running'
+    try:
+        progress(0.0)
+        return compute(*args)
+    finally:
+        _local.job = None
+
+
+def apply_pending():
+    '''
+       Runs the emit steps handed back by finished jobs. Call on the PyMOL thread
+
+       :return: Number of steps run
+       :rtype: Int
+    '''
+    done = 0
+    while True:
+        try:
+            call = pending.get_nowait()
+        except queue.Empty:
+            return done
+        call()
+        done += 1
+
+
+def _install_dispatcher():
+    ##In the Qt GUI a queued signal runs apply_pending on the thread that created the dispatcher
+    global _dispatcher
+    if _dispatcher is not None:
+        return
+    try:
+        from pymol.Qt import QtCore
+    except ImportError:
+        return
+    app = QtCore.QCoreApplication.instance()
+    if app is None or QtCore.QThread.currentThread() is not app.thread():
+        return
+
+    class Dispatcher(QtCore.QObject):
+        wake = QtCore.Signal()
+
+        @QtCore.Slot()
+        def drain(self):
+            apply_pending()
+
+    _dispatcher = Dispatcher()
+    _dispatcher.wake.connect(_dispatcher.drain, QtCore.Qt.QueuedConnection)
+
+
+def _dispatch(call):
+    pending.put(call)
+    if _dispatcher is not None:
+        _dispatcher.wake.emit()
+
+
+def _emit(job, emit):
+    if job.cancelled.is_set():
+        job.status = 'cancelled'
+        return
+    job.status = 'emitting'
+    try:
+        if emit is not None:
+            emit(job.result)
+    except Exception as err:
+        job.status, job.error = 'failed', err
+        print(f"Job {job.id} {job.name} failed: {err}")
+        return
+    finally:
+        job.finished = time.time()
+    job.status = 'done'
+    print(f"Job {job.id} {job.name} done in {job.elapsed:.1f} s")
+
+
+def _finished(job, future):
+    if future.cancelled():
+        job.status, job.finished = 'cancelled', time.time()
+        return
+    err = future.exception()
+    if isinstance(err, Cancelled):
+        job.status, job.finished = 'cancelled', time.time()
+    elif err is not None:
+        job.status, job.error, job.finished = 'failed', err, time.time()
+        _dispatch(lambda: print(f"Job {job.id} {job.name} failed: {err}"))
+    else:
+        job.result = future.result()
+        if not job.cancelled.is_set():
+            job.progress = 1.0
+        _dispatch(lambda: _emit(job, job.emit))
+
+
+def submit(name, compute, args=(), emit=None, process=False):
+    '''
+       Runs compute(*args) in the background and emit(result) on the PyMOL thread
+
+       :param name: Name shown by stilde_jobs
+       :type name: String
+
+       :param compute: Function doing the work, without PyMOL calls. May call progress
+       :type compute: Function
+
+       :param emit: Function loading the result into PyMOL
+       :type emit: Function, optional
+
+       :param process: Run in the process pool; compute and args must be picklable and
+                       progress is only reported at the start and end
+       :type process: Boolean, optional - default False
+
+       :return: The job
+       :rtype: Job
+    '''
+    _install_dispatcher()
+    ##Results finished since the last command are loaded first, also without the GUI
+    apply_pending()
+    job = Job(name, emit)
+    jobs[job.id] = job
+    if process:
+        job.status = 'running'
+        job.future = _pool(True).submit(compute, *args)
+    else:
+        job.future = _pool(False).submit(_run, job, compute, args)
+    job.future.add_done_callback(lambda future: _finished(job, future))
+    if _dispatcher is None:
+        print(f"Job {job.id} {name} started, stilde_wait loads the result")
+    else:
+        print(f"Job {job.id} {name} started")
+    return job
+
+
+def _jobs(job):
+    if str(job) == 'all':
+        return list(jobs.values())
+    return [jobs[int(job)]]
+
+
+def result(job):
+    '''
+       :param job: Job id
+       :type job: Int
+
+       :return: What the compute step of the job returned, e.g. the table of loadCSV_async
+    '''
+    return jobs[int(job)].result
+
+
+def polar_plot_async(tensor=None, Ntheta=150, Nphi=150, origin=None, scale=1.0, pos_color="Blue",
+                     neg_color="Orange", style="loop", max_points=1000000, adaptive=0, tol=0.01,
+                     max_level=4, process=0):
+    '''
+       polar_plot in the background, see it for the parameters
+
+       :param process: 1 to evaluate the grid in the process pool
+       :type process: Int, optional - default 0
+
+       :return: Job id
+       :rtype: Int
+    '''
+    ##progress is a no-op in worker processes, and cannot be pickled there
+    process = bool(int(process))
+    args = (tensor, int(Ntheta), int(Nphi), origin, float(scale), style, int(max_points),
+            int(adaptive), float(tol), int(max_level), None if process else progress)
+    emit = lambda objs: pymol_functions.load_polar_plot(*objs, pos_color, neg_color)
+    return submit('polar_plot', pymol_functions.polar_plot_objects, args, emit, process).id
+cmd.extend("polar_plot_async", polar_plot_async)
+
+
+def loadCSV_async(filename, cache=True, compact=False, float32=False, lazy=False):
+    '''
+       loadCSV in the background, see it for the parameters. The table is kept as
+       the result of the job, see result
+
+       :return: Job id
+       :rtype: Int
+    '''
+    def emit(data):
+        if data.empty:
+            print("Dataframe is empty")
+        else:
+            print(data[['S','Electric Magnitude', 'Magnetic Magnitude','Cosine of Angle']])
+    return submit('loadCSV', pymol_functions.read_table,
+                  (filename, cache, compact, float32, lazy, progress), emit).id
+cmd.extend("loadCSV_async", loadCSV_async)
+
+
+def vector_objects(indices, df, start, from_atom, colors):
+    '''
+       Arrow geometry of multiple_vectors_async
+
+       :return: Objects from elec_mag_objects
+       :rtype: List of tuples
+    '''
+    elecVecs, magVecs = row_vectors(df, indices)
+    progress(0.2)
+    return pymol_functions.elec_mag_objects(elecVecs, magVecs, 2, 2, start, start, from_atom,
+                                            lambda f: progress(.2+.8*f), colors)
+
+
+def multiple_vectors_async(indices, df, fromAtom=False):
+    '''
+       multiple_vectors with batch=True in the background, see it for the parameters
+
+       :return: Job id
+       :rtype: Int
+    '''
+    if isinstance(indices, str):
+        indices = pymol_functions.str_to_list(indices, internalType="int")
+    indices = np.asarray(list(indices), dtype=int)
+    ##The selection and colors are read now, the worker must not call PyMOL
+    fromAtom = bool(int(fromAtom))
+    start = cmd.get_coords('sele', 1)[0] if fromAtom else None
+    colors = {kind: arrow_colors(kind) for kind in ('electric', 'magnetic')}
+    return submit('multiple_vectors', vector_objects, (indices, df, start, fromAtom, colors),
+                  pymol_functions.load_elec_mag).id
+cmd.extend("multiple_vectors_async", multiple_vectors_async)
+
+
+def checkVecs_async(pairs, gauge="VE"):
+    '''
+       checkVecs in the background: the vector files are read and looked up in a
+       worker, the comparisons are drawn when they are done
+
+       :return: Job id
+       :rtype: Int
+    '''
+    def emit(vectors):
+        for elec1, mag1 in zip(*vectors):
+            pymol_functions.gaugeComp({gauge: [elec1, mag1]})
+    return submit('checkVecs', pymol_functions.gauge_vectors, (pairs, gauge, progress),
+                  emit).id
+cmd.extend("checkVecs_async", checkVecs_async)
+
+
+def stilde_jobs(clear=0):
+    '''
+       Lists the background jobs, after loading any finished results
+
+       :param clear: 1 to forget the jobs that are no longer running
+       :type clear: Int, optional - default 0
+
+       :return: Id, name, status, progress and elapsed seconds of every job
+       :rtype: List of tuples
+    '''
+    apply_pending()
+    rows = [(job.id, job.name, job.status, job.progress, job.elapsed) for job in jobs.values()]
+    print(f"{'id':>4s} {'command':20s} {'status':10s} {'progress':>8s} {'time (s)':>9s}")
+    for row in rows:
+        print(f"{row[0]:4d} {row[1]:20s} {row[2]:10s} {100*row[3]:7.0f}% {row[4]:9.1f}")
+    if int(clear):
+        for job in list(jobs.values()):
+            if not job.active:
+                del jobs[job.id]
+    return rows
+cmd.extend("stilde_jobs", stilde_jobs)
+
+
+def stilde_cancel(job='all'):
+    '''
+       Cancels a background job
+
+       :param job: Job id, or all
+       :type job: Int or String, optional - default all
+    '''
+    for j in _jobs(job):
+        if j.active:
+            j.cancel()
+            print(f"Job {j.id} {j.name} cancelled")
+cmd.extend("stilde_cancel", stilde_cancel)
+
+
+def stilde_wait(job='all', timeout=None):
+    '''
+       Waits for background jobs and loads their results, e.g. in scripts
+
+       :param job: Job id, or all
+       :type job: Int or String, optional - default all
+
+       :param timeout: Seconds to wait at most
+       :type timeout: Float, optional
+
+       :return: True if every job finished
+       :rtype: Boolean
+    '''
+    end = None if timeout is None else time.time() + float(timeout)
+    waiting = [j for j in _jobs(job) if j.future is not None]
+    while True:
+        left = None if end is None else max(0.0, end - time.time())
+        wait_futures([j.future for j in waiting], timeout=0.1 if left is None else min(left, 0.1))
+        apply_pending()
+        if not any(j.active for j in waiting):
+            return True
+        if end is not None and time.time() >= end:
+            return False
+cmd.extend("stilde_wait", stilde_wait)
@@ -0,0 +1,118 @@
+'''
+Recording stand-in for the parts of PyMOL used by this package.
+
+install() registers fake pymol, pymol.cmd, pymol.cgo, pymol.preset and
+pymol.util modules in sys.modules, so pymol_functions and generate_arrow
+can be imported on a headless machine without PyMOL. Every cmd
+call is counted and the length of every CGO list passed to load_cgo is kept.
+'''
+import sys
+import types
+
+
+class RecordingCmd(types.ModuleType):
+    '''
+       Fake pymol.cmd. Any attribute is a function that only records its call
+    '''
+    def __init__(self):
+        super().__init__('pymol.cmd')
+        ##Commands added with extend, as in PyMOL
+        self.keyword = {}
+        self.reset()
+
+    def reset(self):
+        '''Forget all recorded calls and loaded objects'''
+        self.calls = {}
+        self.cgo_lengths = []
+        self.objects = {}
+        ##Groups and pseudoatom objects, which have no CGO
+        self.others = set()
+
+    def record(self, name):
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        def call(*args, **kwargs):
+            self.record(name)
+        return call
+
+    @property
+    def total_calls(self):
+        return sum(self.calls.values())
+
+    def extend(self, name, function=None):
+        if function is None:
+            name, function = name.__name__, name
+        self.keyword[name] = [function]
+        return function
+
+    def load_cgo(self, obj, name, state=0, **kwargs):
+        self.record('load_cgo')
+        self.cgo_lengths.append(len(obj))
+        self.objects[name] = obj
+
+    def get_color_tuple(self, color):
+        self.record('get_color_tuple')
+        return {'red': (1.0, 0.0, 0.0), 'blue': (0.0, 0.0, 1.0)}.get(str(color).lower(), (0.5, 0.5, 0.5))
+
+    def get_coords(self, selection='all', state=1):
+        import numpy as np
+        self.record('get_coords')
+        return np.zeros((1, 3))
+
+    def get_unused_name(self, prefix='obj'):
+        self.record('get_unused_name')
+        return prefix + '01'
+
+    def get_names(self, *args, **kwargs):
+        self.record('get_names')
+        return list(self.objects) + sorted(self.others)
+
+    def group(self, name, members='', *args, **kwargs):
+        self.record('group')
+        self.others.add(name)
+
+    def pseudoatom(self, object='', *args, **kwargs):
+        self.record('pseudoatom')
+        self.others.add(object)
+
+    def delete(self, name):
+        self.record('delete')
+        for n in str(name).split():
+            self.objects.pop(n, None)
+            self.others.discard(n)
+
+
+##Values of the constants in pymol.cgo
+cgo_constants = {'POINTS': 0.0, 'LINES': 1.0, 'LINE_LOOP': 2.0, 'LINE_STRIP': 3.0,
+                 'TRIANGLES': 4.0, 'TRIANGLE_STRIP': 5.0, 'TRIANGLE_FAN': 6.0,
+                 'STOP': 0.0, 'NULL': 1.0, 'BEGIN': 2.0, 'END': 3.0, 'VERTEX': 4.0,
+                 'NORMAL': 5.0, 'COLOR': 6.0, 'SPHERE': 7.0, 'TRIANGLE': 8.0,
+                 'CYLINDER': 9.0, 'LINEWIDTH': 10.0, 'WIDTHSCALE': 11.0, 'ALPHA': 25.0,
+                 'CONE': 27.0}
+
+
+def install():
+    '''
+       Registers the fake modules in sys.modules
+
+       :return: The fake cmd module
+       :rtype: RecordingCmd
+    '''
+    cmd = RecordingCmd()
+    pymol = types.ModuleType('pymol')
+    cgo = types.ModuleType('pymol.cgo')
+    cgo.__dict__.update(cgo_constants)
+    cgo.__all__ = list(cgo_constants)
+    preset = types.ModuleType('pymol.preset')
+    preset.ball_and_stick = lambda *args, **kwargs: cmd.record('preset.ball_and_stick')
+    util = types.ModuleType('pymol.util')
+
+    pymol.cmd, pymol.cgo, pymol.preset, pymol.util = cmd, cgo, preset, util
+    pymol.CmdException = type('CmdException', (Exception,), {})
+
+    sys.modules.update({'pymol': pymol, 'pymol.cmd': cmd, 'pymol.cgo': cgo,
+                        'pymol.preset': preset, 'pymol.util': util})
+    return cmd
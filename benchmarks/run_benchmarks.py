@@ -0,0 +1,267 @@
+'''
+Benchmarks the hot paths of the package on synthetic data, without PyMOL.
+Usage at command line: py benchmarks/run_benchmarks.py -s small medium -o results.json
+Compare against a saved run: py benchmarks/run_benchmarks.py -c baseline.json -t 0.25
+
+PyMOL is replaced by the recording stand-in of fake_pymol. Every benchmark
+records its wall time (best of --repeat runs), peak traced memory, number of
+cmd calls and total length of the CGO lists passed to load_cgo. With --compare,
+benchmarks slower than the baseline by more than --threshold are flagged and
+the exit code is 1.
+'''
+import argparse as ap
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+root = Path(__file__).resolve().parent
+sys.path[:0] = [str(root), str(root.parent)]
+import fake_pymol
+cmd = fake_pymol.install()
+
+import numpy as np
+import pandas as pd
+import cgo_cache
+import generate_arrow
+import mesh_export
+import pymol_functions
+import sorting
+from stilde_table import StildeTable
+
+##Only the disk cache benchmarks use cgo_cache, in the temporary directory of each size
+cgo_cache.enabled = False
+
+sizes = {'small': {'rows': 10000, 'grid': 100, 'arrows': 20, 'pairs': 100},
+         'medium': {'rows': 200000, 'grid': 300, 'arrows': 100, 'pairs': 2000},
+         'large': {'rows': 2000000, 'grid': 600, 'arrows': 400, 'pairs': 20000}}
+
+
+def make_data(size, directory, seed=0):
+    '''
+       Writes the synthetic S-tilde tables and gauge vector files for one size
+
+       :param size: Entry of `sizes`
+       :type size: Dict
+
+       :param directory: Directory the files are written to
+       :type directory: Path
+
+       :return: Paths and arrays used by the benchmarks
+       :rtype: Dict
+    '''
+    rng = np.random.default_rng(seed)
+    rows = size['rows']
+    raw = pd.DataFrame({'nocc': rng.integers(1, 200, rows), 'nvirt': rng.integers(200, 2000, rows),
+                        'stilde': rng.normal(size=rows)})
+    for kind in ('Electric', 'Magnetic'):
+        for x in 'XYZ':
+            raw[kind + x] = rng.normal(size=rows)
+    raw.to_csv(directory / 'raw.csv', index=False)
+
+    data = sorting.add_derived_columns(raw.rename(columns={'stilde': 'S'}))
+    data = sorting.sort_by_magnitude(data)
+    data.to_csv(directory / 'sorted.csv', index=False)
+
+    pairs = [(i, a) for i in range(1, 101) for a in range(101, 101 + -(-size['pairs']//100))]
+    pairs = pairs[:size['pairs']]
+    for gauge in ('VE', 'VM'):
+        for n in (0, 1):
+            values = rng.normal(size=(len(pairs), 7))
+            with open(directory / f"vector_{gauge}{n}N", 'w') as f:
+                for (i, a), row in zip(pairs[::-1], values):
+                    f.write(f"{i} {a} " + " ".join(f"{v:.8f}" for v in row) + "\n")
+
+    return {'raw': directory / 'raw.csv', 'sorted': directory / 'sorted.csv', 'frame': data,
+            'pairs': pairs, 'tensor': [1.0, -0.5, 0.8, 0.3, -0.2, 0.1],
+            'elec': rng.normal(size=(max(size['pairs'], size['arrows']), 3)),
+            'mag': rng.normal(size=(max(size['pairs'], size['arrows']), 3))}
+
+
+def remove_caches(directory):
+    '''Deletes the .stcache files so the next load parses the text files again'''
+    for cache in directory.glob('*.stcache'):
+        cache.unlink()
+
+
+def disk_cached(run):
+    '''
+       :return: `run`, with cgo_cache turned on while it runs
+       :rtype: Function
+    '''
+    def wrapped():
+        cgo_cache.enabled = True
+        try:
+            return run()
+        finally:
+            cgo_cache.enabled = False
+    return wrapped
+
+
+def cases(size, data, directory):
+    '''
+       :return: Benchmarks as (name, setup, run) tuples, setup is not timed
+       :rtype: List of tuples
+    '''
+    grid, arrows, pairs = size['grid'], size['arrows'], data['pairs']
+    elec, mag = data['elec'], data['mag']
+    frame = data['frame'].reset_index(drop=True)
+    compact = StildeTable.from_table(frame)
+    nothing = lambda: None
+    cold = lambda: remove_caches(directory)
+    cgo_cache.directory = str(directory / 'cgo')
+    no_cgo_cache = lambda: cgo_cache.evict(0)
+    fresh_polar = lambda: (no_cgo_cache(), pymol_functions.polar_cache.clear())
+    return [
+        ('polar_plot', nothing, lambda: pymol_functions.polar_plot(data['tensor'], grid, grid)),
+        ('polar_plot_disk_cold', fresh_polar,
+         disk_cached(lambda: pymol_functions.polar_plot(data['tensor'], grid, grid))),
+        ('polar_plot_disk_warm', lambda: pymol_functions.polar_cache.clear(),
+         disk_cached(lambda: pymol_functions.polar_plot(data['tensor'], grid, grid))),
+        ('export_polar_surface', nothing,
+         lambda: pymol_functions.export_polar_plot(str(directory / 'polar.glb'), data['tensor'], grid, grid)),
+        ('cgo_arrow', nothing, lambda: [generate_arrow.cgo_arrow([0.0, 0.0, 0.0], list(v), name=str(k))
+                                        for k, v in enumerate(elec[:arrows])]),
+        ('elec_mag', nothing, lambda: [pymol_functions.elec_mag(list(e), list(m))
+                                       for e, m in zip(elec[:arrows], mag[:arrows])]),
+        ('multiple_vectors', nothing, lambda: pymol_functions.multiple_vectors(range(arrows), frame)),
+        ('multiple_vectors_batch', nothing,
+         lambda: pymol_functions.multiple_vectors(range(arrows), frame, batch=True)),
+        ('multiple_vectors_compact', nothing, lambda: pymol_functions.multiple_vectors(range(arrows), compact)),
+        ('export_vectors_glb', nothing,
+         lambda: mesh_export.export_table(frame, range(len(pairs)), str(directory / 'vectors.glb'))),
+        ('gaugeComp', nothing, lambda: [pymol_functions.gaugeComp({'VE': [list(e), list(m)],
+                                                                   'VM': [list(m), list(e)]})
+                                        for e, m in zip(elec[:arrows], mag[:arrows])]),
+        ('gaugeCompBatch', nothing,
+         lambda: pymol_functions.gaugeCompBatch({'VE': [elec[:len(pairs)], mag[:len(pairs)]],
+                                                 'VM': [mag[:len(pairs)], elec[:len(pairs)]]}, pairs)),
+        ('checkVecs_cold', cold, lambda: pymol_functions.checkVecs(pairs[:arrows])),
+        ('checkVecs_warm', nothing, lambda: pymol_functions.checkVecs(pairs[:arrows])),
+        ('checkVecsBatch', nothing, lambda: pymol_functions.checkVecsBatch(pairs)),
+        ('sorting_full', nothing,
+         lambda: sorting.sort_by_magnitude(sorting.add_derived_columns(
+             pd.read_csv(data['raw'], header=0, names=sorting.columns)))[:20]),
+        ('sorting_stream', nothing, lambda: sorting.stream_top_n(data['raw'], 20, 100000)),
+        ('loadCSV_text', nothing, lambda: pymol_functions.loadCSV(str(data['sorted']), cache=False)),
+        ('loadCSV_cold', cold, lambda: pymol_functions.loadCSV(str(data['sorted']))),
+        ('loadCSV_warm', nothing, lambda: pymol_functions.loadCSV(str(data['sorted']))),
+        ('loadCSV_compact', nothing,
+         lambda: pymol_functions.loadCSV(str(data['sorted']), compact=True, float32=True)),
+    ]
+
+
+def measure(setup, run, repeat=3):
+    '''
+       Runs one benchmark `repeat` times
+
+       :return: Best wall time, largest peak memory, cmd calls and CGO length of the last run
+       :rtype: Dict
+    '''
+    walls, peaks = [], []
+    for _ in range(repeat):
+        setup()
+        cmd.reset()
+        tracemalloc.start()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            run()
+        walls.append(time.perf_counter() - start)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return {'wall': min(walls), 'peak_mb': max(peaks)/2**20, 'cmd_calls': cmd.total_calls,
+            'cgo_floats': sum(cmd.cgo_lengths)}
+
+
+def run_all(size_names, repeat=3, only=None):
+    '''
+       Runs every benchmark for every size
+
+       :param size_names: Keys of `sizes`
+       :type size_names: List of strings
+
+       :param only: Names of the benchmarks to run, defaults to all
+       :type only: List of strings, optional
+
+       :return: Results keyed by benchmark/size
+       :rtype: Dict
+    '''
+    results = {}
+    cwd = os.getcwd()
+    for name in size_names:
+        with tempfile.TemporaryDirectory() as tmp:
+            directory = Path(tmp)
+            data = make_data(sizes[name], directory)
+            ##checkVecs reads the vector files from the working directory
+            os.chdir(directory)
+            try:
+                for bench, setup, run in cases(sizes[name], data, directory):
+                    if only and bench not in only:
+                        continue
+                    results[f"{bench}/{name}"] = measure(setup, run, repeat)
+                    print(f"{bench}/{name}: {results[f'{bench}/{name}']['wall']:.4f} s", flush=True)
+            finally:
+                os.chdir(cwd)
+    return results
+
+
+def compare(results, baseline, threshold=0.25):
+    '''
+       :param results: Results of this run
+       :type results: Dict
+
+       :param baseline: Results of a saved run
+       :type baseline: Dict
+
+       :param threshold: Allowed relative slowdown
+       :type threshold: Float, optional - default 0.25
+
+       :return: Benchmarks slower than the baseline by more than `threshold`, with the ratio
+       :rtype: Dict
+    '''
+    slower = {}
+    for key, result in results.items():
+        if key in baseline and baseline[key]['wall'] > 0:
+            ratio = result['wall']/baseline[key]['wall']
+            if ratio > 1.0 + threshold:
+                slower[key] = ratio
+    return slower
+
+
+if __name__ == "__main__":
+    parser = ap.ArgumentParser()
+    parser.add_argument('-s', '--sizes', nargs='+', choices=list(sizes), default=['small', 'medium'],
+                        help="Data sizes to run")
+    parser.add_argument('-b', '--bench', nargs='+', help="Only run these benchmarks")
+    parser.add_argument('-r', '--repeat', type=int, default=3, help="Runs per benchmark, best is kept")
+    parser.add_argument('-o', '--output', help="Write the results to this JSON file")
+    parser.add_argument('-c', '--compare', help="Baseline JSON file to compare against")
+    parser.add_argument('-t', '--threshold', type=float, default=0.25,
+                        help="Allowed relative slowdown before a benchmark is flagged")
+    args = parser.parse_args()
+
+    results = run_all(args.sizes, args.repeat, args.bench)
+    print(f"\n{'benchmark':40s} {'wall (s)':>10s} {'peak (MB)':>10s} {'cmd calls':>10s} {'CGO floats':>12s}")
+    for key, result in results.items():
+        print(f"{key:40s} {result['wall']:10.4f} {result['peak_mb']:10.1f} "
+              f"{result['cmd_calls']:10d} {result['cgo_floats']:12d}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'python': platform.python_version(), 'numpy': np.__version__,
+                       'pandas': pd.__version__, 'results': results}, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            slower = compare(results, json.load(f)['results'], args.threshold)
+        for key, ratio in slower.items():
+            print(f"SLOWER: {key} is {ratio:.2f}x the baseline")
+        if slower:
+            sys.exit(1)
+        print("No slowdowns beyond the threshold")
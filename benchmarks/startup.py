@@ -0,0 +1,95 @@
+'''
+Measures how long loading the S-tilde commands adds to PyMOL startup.
+Usage at command line: py benchmarks/startup.py -r 20
+
+Each measurement runs in a fresh interpreter with the fake_pymol stand-in, and
+compares registering the stubs of stilde_plugin with importing generate_arrow
+and pymol_functions directly (what running them from pymolrc.pml used to do).
+With --pymol, full headless PyMOL launches (pymol -cq) with each are timed too.
+'''
+import argparse as ap
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+root = Path(__file__).resolve().parent
+
+##Code timed in a fresh interpreter; prints the seconds taken and whether numpy was imported
+loaders = {
+    'plugin stubs': "import stilde_plugin; stilde_plugin.register()",
+    'eager import': "import generate_arrow, pymol_functions",
+}
+template = '''
+import sys, time
+sys.path[:0] = [{bench!r}, {repo!r}]
+import fake_pymol; fake_pymol.install()
+start = time.perf_counter()
+{code}
+print(time.perf_counter() - start, 'numpy' in sys.modules, 'pandas' in sys.modules)
+'''
+
+
+def time_loader(code, repeat=10):
+    '''
+       :param code: Python code loading the commands
+       :type code: String
+
+       :param repeat: Number of fresh interpreters
+       :type repeat: Int, optional - default 10
+
+       :return: Seconds taken by each run, and whether numpy/pandas ended up imported
+       :rtype: Tuple of (List of floats, Bool, Bool)
+    '''
+    script = template.format(bench=str(root), repo=str(root.parent), code=code)
+    times = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True,
+                             check=True).stdout.split()
+        times.append(float(out[0]))
+    return times, out[1] == 'True', out[2] == 'True'
+
+
+def time_pymol(commands, pymol='pymol', repeat=10):
+    '''
+       :param commands: PyMOL commands run at startup, e.g. the content of pymolrc.pml
+       :type commands: String
+
+       :return: Wall time of each full pymol -cq launch
+       :rtype: List of floats
+    '''
+    with tempfile.NamedTemporaryFile('w', suffix='.pml', delete=False) as f:
+        f.write(commands)
+    times = []
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            subprocess.run([pymol, '-cq', f.name], capture_output=True, check=True)
+            times.append(time.perf_counter() - start)
+    finally:
+        os.remove(f.name)
+    return times
+
+
+if __name__ == "__main__":
+    parser = ap.ArgumentParser()
+    parser.add_argument('-r', '--repeat', type=int, default=10, help="Launches per loader")
+    parser.add_argument('--pymol', help="Also time full launches of this PyMOL executable")
+    args = parser.parse_args()
+
+    print(f"{'loader':20s} {'median (ms)':>12s} {'min (ms)':>10s} {'numpy':>6s} {'pandas':>7s}")
+    for name, code in loaders.items():
+        times, numpy, pandas = time_loader(code, args.repeat)
+        print(f"{name:20s} {1e3*statistics.median(times):12.1f} {1e3*min(times):10.1f} "
+              f"{str(numpy):>6s} {str(pandas):>7s}")
+
+    if args.pymol:
+        repo = str(root.parent)
+        for name, code in loaders.items():
+            commands = "\n".join(["python", "import sys", f"sys.path.insert(0, {repo!r})",
+                                  *code.split('; '), "python end", ""])
+            times = time_pymol(commands, args.pymol, args.repeat)
+            print(f"pymol -cq, {name:10s} {1e3*statistics.median(times):12.1f} {1e3*min(times):10.1f}")
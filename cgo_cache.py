@@ -0,0 +1,187 @@
+'''
+Content addressed on-disk cache of finished CGO lists.
+
+Drawing functions pass a builder and the inputs that determine the geometry
+(vectors, tensor, style, ...) to cached. The inputs are hashed into a key; on
+a hit the CGO lists are read back from *key*.cgo instead of being built, so
+reopened scenes and headless render jobs share the work. Files hold float64
+values, so a hit returns exactly what the builder returned, and are evicted
+least recently used first once the directory grows past max_bytes.
+
+The cache is off unless STILDE_CGO_CACHE is set, to 1 for ~/.cache/stilde/cgo
+or to the directory to use. In PyMOL, stilde_cgo_cache turns it on or off.
+'''
+import hashlib
+import os
+import tempfile
+import numpy as np
+
+default_directory = os.path.join(os.path.expanduser('~'), '.cache', 'stilde', 'cgo')
+setting = os.environ.get('STILDE_CGO_CACHE', '0')
+directory = default_directory if setting in ('0', '1') else setting
+enabled = setting != '0'
+
+##Size cap of the directory
+max_bytes = 512*2**20
+
+##Smaller results are not stored, building them is cheaper than reading a file
+min_floats = 1024
+
+suffix = '.cgo'
+
+
+def make_key(kind, *parts):
+    '''
+       :param kind: Name of the kind of geometry, e.g. polar or arrows
+       :type kind: String
+
+       :param parts: Inputs the geometry depends on; arrays, lists, numbers or strings
+       :type parts: Any
+
+       :return: Hex digest identifying the geometry
+       :rtype: String
+    '''
+    ##The version tells the float64 files apart from the float32 ones written before
+    digest = hashlib.sha256(b'2|' + kind.encode())
+    for part in parts:
+        if isinstance(part, (np.ndarray, list, tuple)):
+            part = np.asarray(part, dtype=float)
+            digest.update(str(part.shape).encode())
+            digest.update(np.ascontiguousarray(part).tobytes())
+        else:
+            digest.update(repr(part).encode())
+        digest.update(b'|')
+    return digest.hexdigest()
+
+
+def entry_path(key):
+    return os.path.join(directory, key + suffix)
+
+
+def load(key, arrays=False):
+    '''
+       :param key: Key from make_key
+       :type key: String
+
+       :param arrays: Return numpy arrays instead of lists
+       :type arrays: Bool, optional
+
+       :return: The stored CGO lists, or None on a miss
+       :rtype: List of lists of floats
+    '''
+    path = entry_path(key)
+    try:
+        with open(path, 'rb') as f:
+            count = int(np.fromfile(f, dtype=np.int64, count=1)[0])
+            lengths = np.fromfile(f, dtype=np.int64, count=count)
+            values = np.fromfile(f, dtype=np.float64)
+        ##Reading counts as a use for the eviction order
+        os.utime(path)
+    except (OSError, IndexError, ValueError):
+        return None
+    if len(lengths) != count or len(values) != lengths.sum():
+        return None
+    parts = np.split(values, np.cumsum(lengths)[:-1])
+    return parts if arrays else [part.tolist() for part in parts]
+
+
+def store(key, objs):
+    '''
+       Writes the CGO lists under `key`, then evicts old entries past max_bytes
+
+       :param key: Key from make_key
+       :type key: String
+
+       :param objs: CGO lists
+       :type objs: List of lists of floats
+
+       :return: None
+    '''
+    os.makedirs(directory, exist_ok=True)
+    path = entry_path(key)
+    ##A temporary file of its own, threads and processes may store the same key at once
+    fd, temp = tempfile.mkstemp(suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.array([len(objs)] + [len(obj) for obj in objs], dtype=np.int64).tofile(f)
+            for obj in objs:
+                np.asarray(obj, dtype=np.float64).tofile(f)
+        os.replace(temp, path)
+    except BaseException:
+        os.remove(temp)
+        raise
+    evict()
+
+
+def entries():
+    '''
+       :return: (last use, bytes, path) of every cache file, least recently used first
+       :rtype: List of tuples
+    '''
+    found = []
+    if os.path.isdir(directory):
+        for entry in os.scandir(directory):
+            if entry.name.endswith(suffix):
+                try:
+                    info = entry.stat()
+                except OSError:
+                    continue
+                found.append((info.st_mtime, info.st_size, entry.path))
+    return sorted(found)
+
+
+def evict(limit=None):
+    '''
+       Deletes the least recently used entries until the cache holds at most `limit` bytes
+
+       :param limit: Size to shrink to, defaults to max_bytes
+       :type limit: Int, optional
+
+       :return: Number of entries deleted
+       :rtype: Int
+    '''
+    limit = max_bytes if limit is None else limit
+    found = entries()
+    total = sum(size for _, size, _ in found)
+    deleted = 0
+    for _, size, path in found:
+        if total <= limit:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        total -= size
+        deleted += 1
+    return deleted
+
+
+def cached(kind, build, *parts, arrays=False):
+    '''
+       :param kind: Name of the kind of geometry
+       :type kind: String
+
+       :param build: Function returning the CGO lists when they are not cached
+       :type build: Function
+
+       :param parts: Inputs the geometry depends on, see make_key
+       :type parts: Any
+
+       :param arrays: On a hit, return numpy arrays instead of lists, for builders returning arrays
+       :type arrays: Bool, optional
+
+       :return: CGO lists, from the cache or from `build`
+       :rtype: List of lists of floats
+    '''
+    if not enabled:
+        return build()
+    key = make_key(kind, *parts)
+    objs = load(key, arrays)
+    if objs is None:
+        objs = build()
+        if sum(len(obj) for obj in objs) >= min_floats:
+            try:
+                store(key, objs)
+            except OSError as err:
+                print("Could not write CGO cache: {0}".format(err))
+    return objs
@@ -0,0 +1,275 @@
+'''
+Binary columnar cache for sorted s-tilde .csv files.
+
+The parsed table is written next to the .csv as *filename.csv.stcache*: a short
+JSON header followed by each column as a raw, aligned array. Set
+STILDE_COLUMN_CACHE (or directory) to keep the cache files in one directory
+instead, e.g. when the .csv files are read-only or shared. The header records
+the path, size and modification time of the .csv it was built from, so a cache
+is only reused while the .csv is unchanged. Columns are opened through memory
+mapping and only when they are first used.
+'''
+import hashlib
+import json
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+
+MAGIC = b'STCACHE2'
+ALIGN = 64
+
+##Directory of the cache files, None keeps each one next to its .csv
+directory = os.environ.get('STILDE_COLUMN_CACHE') or None
+
+
+def cache_path(filename):
+    '''
+       :param filename: Path of the .csv file
+       :type filename: String
+
+       :return: Path of its cache file, next to it or in `directory`
+       :rtype: String
+    '''
+    if directory is None:
+        return os.fspath(filename) + '.stcache'
+    ##.csv files of the same name in different directories get a cache each
+    name = os.path.abspath(os.fspath(filename))
+    digest = hashlib.sha1(name.encode()).hexdigest()[:16]
+    return os.path.join(directory, f"{os.path.basename(name)}.{digest}.stcache")
+
+
+def csv_key(filename):
+    '''
+       Builds the key a cache must match to be reused
+
+       :param filename: Path of the .csv file
+       :type filename: String
+
+       :return: Absolute path, size and modification time of the file
+       :rtype: Dict
+    '''
+    stat = os.stat(filename)
+    return {'path': os.path.abspath(filename), 'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns}
+
+
+def write_cache(dataframe, path, key):
+    '''
+       Writes every column of `dataframe` to a cache file
+
+       :param dataframe: Parsed table, all columns numeric
+       :type dataframe: Dataframe
+
+       :param path: Cache file to write
+       :type path: String
+
+       :param key: Key of the source file, from csv_key
+       :type key: Dict
+
+       :return: None
+    '''
+    ##Offsets are relative to the data block, which starts at the first ALIGN boundary after
+    ##the header, so the header size does not depend on them
+    columns = []
+    offset = 0
+    for name in dataframe.columns:
+        dtype = dataframe[name].dtype
+        columns.append({'name': name, 'dtype': dtype.str, 'offset': offset})
+        offset += -(-len(dataframe)*dtype.itemsize // ALIGN)*ALIGN
+    header = json.dumps({'key': key, 'nrows': len(dataframe), 'columns': columns}).encode()
+    start = data_start(len(header))
+
+    ##Write to a temporary file first so a half written cache is never read
+    ##Background loads may write the same cache at once, so each gets its own file
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(MAGIC)
+            f.write(len(header).to_bytes(8, 'little'))
+            f.write(header)
+            for column in columns:
+                f.seek(start + column['offset'])
+                f.write(np.ascontiguousarray(dataframe[column['name']].values).tobytes())
+            f.truncate(start + offset)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def data_start(size):
+    '''
+       :param size: Length of the JSON header in bytes
+       :type size: Int
+
+       :return: Position of the first column in the file
+       :rtype: Int
+    '''
+    return -(-(len(MAGIC) + 8 + size) // ALIGN)*ALIGN
+
+
+def read_header(path):
+    '''
+       :param path: Cache file
+       :type path: String
+
+       :return: Header of the cache, with the position of the data block as start,
+                or None if the file is missing or not a cache
+       :rtype: Dict
+    '''
+    try:
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                return None
+            size = int.from_bytes(f.read(8), 'little')
+            header = json.loads(f.read(size))
+            header['start'] = data_start(size)
+            return header
+    except (OSError, ValueError):
+        return None
+
+
+class ArrayTable:
+    '''
+       Row selection and printing of tables whose columns are NumPy arrays
+
+       Subclasses provide columns, len and column lookup by name.
+    '''
+    def __contains__(self, name):
+        return name in self.columns
+
+    def take(self, rows):
+        '''
+           :param rows: Row positions
+           :type rows: Array-like of ints
+
+           :return: The selected rows of every column
+           :rtype: Dataframe
+        '''
+        rows = np.asarray(rows, dtype=int)
+        return pd.DataFrame({c: np.asarray(self[c][rows]) for c in self.columns}, index=rows)
+
+    def to_frame(self):
+        '''
+           :return: Every row, materialized as a Dataframe
+           :rtype: Dataframe
+        '''
+        return pd.DataFrame({c: np.array(self[c]) for c in self.columns})
+
+    def __repr__(self):
+        n = len(self)
+        if n <= 10:
+            return repr(self.to_frame())
+        ##First and last rows printed together, so their columns line up under one header
+        lines = self.take(np.r_[0:5, n-5:n]).to_string().split('\n')
+        lines.insert(len(lines)-5, '...')
+        return '\n'.join(lines) + f"\n\n[{n} rows x {len(self.columns)} columns]"
+
+
+class ColumnTable(ArrayTable):
+    '''
+       Read-only table whose columns are memory mapped from a cache file on first use
+
+       Supports the parts of the Dataframe interface used by the PyMOL
+       functions: column lookup by name (returning a NumPy array), selecting
+       several columns, len, empty and printing.
+    '''
+    def __init__(self, path, header, columns=None):
+        self.path = path
+        self.header = header
+        self._info = {c['name']: c for c in header['columns']}
+        self.columns = list(columns) if columns is not None else list(self._info)
+        self._loaded = {}
+
+    def __len__(self):
+        return self.header['nrows']
+
+    @property
+    def empty(self):
+        return len(self) == 0 or not self.columns
+
+    def __getitem__(self, name):
+        if isinstance(name, (list, tuple)):
+            view = ColumnTable(self.path, self.header, name)
+            view._loaded = self._loaded
+            return view
+        if name not in self.columns:
+            raise KeyError(name)
+        if name not in self._loaded:
+            info = self._info[name]
+            if len(self):
+                self._loaded[name] = np.memmap(self.path, dtype=np.dtype(info['dtype']), mode='r',
+                                               offset=self.header['start'] + info['offset'],
+                                               shape=(len(self),))
+            else:
+                self._loaded[name] = np.empty(0, dtype=np.dtype(info['dtype']))
+        return self._loaded[name]
+
+
+def read_csv_chunks(filename, progress=None, chunksize=200000, **kwargs):
+    '''
+       pd.read_csv in chunks of rows, reporting the part of the file read after each one
+
+       :param filename: Path of the .csv file
+       :type filename: String
+
+       :param progress: Called with the fraction of the file read, see background.progress
+       :type progress: Function, optional
+
+       :param chunksize: Rows parsed at a time
+       :type chunksize: Int, optional - default 200000
+
+       :param kwargs: Passed on to pd.read_csv
+
+       :return: The table
+       :rtype: Dataframe
+    '''
+    if progress is None:
+        return pd.read_csv(filename, **kwargs)
+    size = max(os.path.getsize(filename), 1)
+    chunks = []
+    with open(filename, 'rb') as f:
+        for chunk in pd.read_csv(f, chunksize=chunksize, **kwargs):
+            chunks.append(chunk)
+            progress(min(f.tell()/size, 1.0))
+    if not chunks:
+        return pd.read_csv(filename, **kwargs)
+    return pd.concat(chunks, ignore_index=True)
+
+
+def load_table(filename, reader=pd.read_csv):
+    '''
+       Opens a .csv through its cache, building the cache when it is missing or stale
+
+       Tables with non numeric columns are not cached and come back as a Dataframe.
+
+       :param filename: Path of the .csv file
+       :type filename: String
+
+       :param reader: Function parsing `filename` into a Dataframe when the cache is (re)built
+       :type reader: Function, optional - default pd.read_csv
+
+       :return: The table
+       :rtype: ColumnTable or Dataframe
+    '''
+    path = cache_path(filename)
+    key = csv_key(filename)
+    header = read_header(path)
+    if header is None or header['key'] != key:
+        data = reader(filename)
+        ##Pandas extension dtypes, such as its string dtype, are not NumPy dtypes
+        if not all(isinstance(dtype, np.dtype) and np.issubdtype(dtype, np.number)
+                   for dtype in data.dtypes):
+            return data
+        try:
+            write_cache(data, path, key)
+        except OSError as err:
+            print("Could not write cache: {0}".format(err))
+            return data
+        header = read_header(path)
+        if header is None or header['key'] != key:
+            print("Could not read back cache {0}".format(path))
+            return data
+    return ColumnTable(path, header)
@@ -13,39 +13,36 @@ License: BSD-2-Clause
 #Add text for actual length and angle between vectors - not scaled
 #Add arc between vectors for angle
 
-from pymol import cmd, CmdException
-from pymol.cgo import *
+import ast
+from pymol import cmd, cgo, CmdException
 import numpy as np
-
-def scale_endpoint(end, factor=5):
-    '''
-       :param end: A list representing the endpoint of the vectors
-       :type end: List of floats
-
-       :param factor: The scaling factor for end to be increased by
-       :type factor: Int, optional - default 5
-
-       :return: Modified end vector
-       :rtype: List of floats
-     '''
-    for i in range(len(end)):
-        end[i] = end[i]*factor
-    return end
-
-def shift_vectors(start, atomCoords):
-    '''
-       :param start: A list representing the starting point of the vector
-       :type start: List of floats
-
-       :param atomCoords: The coordinates of the atom from which the vector will originate
-       :type atomCoords: List of floats
-
-       :return: Modified start vector
-       :rtype: List of floats
-    '''
-    for i in range(len(start)):
-        start[i] += atomCoords[i]
-    return start
+from profiling import phase
+from geometry import Arrows
+import cgo_cache
+
+def str_to_list(string,internalType="float"):
+    """
+        :param string: Object to be converted to list of floats. Nested lists such as
+                       "[[1,0,0],[0,1,0]]" keep their nesting
+        :type string: string, list, tuple, np.ndarray, or a single int or float
+
+        :param internalType: String indicating the type of list to be converted to
+        :type internalType: string (,optional -) defaults to float
+
+        :return: Converted list of objectss, a single number becomes a list of one
+        :rtype: List of floats
+    """
+    if type(string) in (list,tuple,np.ndarray):
+       return list(string)
+    ##e.g. sphere_field(positions, 0.5) from a script
+    if isinstance(string,(int,float,np.number)):
+       return [float(string)] if internalType=="float" else [string]
+    if string.strip().startswith('[['):
+       return ast.literal_eval(string.strip())
+    newList=string.strip('][').split(',')
+    if internalType=="float":
+       newList=[float(n) for n in newList]
+    return newList
 
 def cgo_arrow(origin, endpoint, color='blue', radius=0.10, gap=0.0, hlength=-1,  hradius=-1,
                type='electric', name='', scaling = 7,use_lab= True):
@@ -78,75 +75,173 @@ def cgo_arrow(origin, endpoint, color='blue', radius=0.10, gap=0.0, hlength=-1,
        :param name: Name to be shown in PyMol for the cgo object
        :type name: String, optional - default blank
 
-       :param scaling: Scaling factor that is passed to scale_endpoint function
+       :param scaling: Scaling factor applied to the endpoint
        :type scaling: Int, optional - default 7
 
 
-       :return: None
+       :return: CGO object loaded as vec_`name`
+       :rtype: List of floats
     '''
-    from chempy import cpv
     #converting parameters to floats
     radius, gap = float(radius), float(gap)
     hlength, hradius = float(hlength), float(hradius)
 
     if type == 'electric':
-        color = 'red'
         name = 'electric'+name
     if type == 'magnetic':
-        color = 'blue'
         name = 'magnetic'+name
-    try:
-        color1, color2 = color.split()
-    except:
-        color1 = color2 = color
-    color1 = list(cmd.get_color_tuple(color1))
-    color2 = list(cmd.get_color_tuple(color2))
+    color1, color2 = arrow_colors(type, color)
 
     if origin == 'sele':
         xyz1 = cmd.get_coords('sele', 1)
         xyz1 = xyz1.flatten()
         xyz1 = xyz1.tolist()
         length=np.linalg.norm(np.array(endpoint))
-        xyz2 = scale_endpoint(endpoint,scaling)
-        xyz2 = shift_vectors(xyz2, xyz1)
     else:
         xyz1 = origin
         length=np.linalg.norm(np.array(endpoint)-np.array(xyz1))
-        xyz2 = scale_endpoint(endpoint,scaling)
-
-
-    normal = cpv.normalize(cpv.sub(xyz1, xyz2))
-
-    if hlength < 0:
-        hlength = radius * 3.0
-    if hradius < 0:
-        hradius = hlength * 0.6
-    if gap:
-        diff = cpv.scale(normal, gap)
-        xyz1 = cpv.sub(xyz1, diff)
-        xyz2 = cpv.add(xyz2, diff)
-    ##Location where cylinder switches to cone
-    xyz3 = cpv.add(cpv.scale(normal, hlength), xyz2)
-
 
-    obj = [cgo.CYLINDER] + xyz1 + xyz3 + [radius] + color1 + color1 + \
-          [cgo.CONE] + xyz3 + xyz2 + [hradius, 0.0] + color1 + color2 + \
-          [1.0, 0.0]
+    ##Cylinder and cone points come from geometry.Arrows, the same math as cgo_arrows
+    arrow = Arrows.from_vectors(xyz1, endpoint, color1, color2, radius, gap, hlength, hradius,
+                                scaling, from_atom=origin == 'sele')
+    obj = arrow_rows(arrow)[0].tolist()
 #    print(obj)
 
     ##Place pseudoatom with label at midpoint of vector
-    v0=np.array(xyz1)
-    v1=np.array(xyz2)
-    loc=(v0+v1)/2
+    loc=arrow.midpoints[0]
 
     if not name:
         name = cmd.get_unused_name('arrow')
 
-    cmd.load_cgo(obj, f"vec_{name}")
-    if use_lab:
-        ##For some reason pos fails, but it just happens to put it where I want
-        cmd.pseudoatom(f"lab_{name}",name="lab_"+name,label=f"{length:.2f}")#,pos=loc
-        cmd.group(name,members=f"lab_{name} vec_{name}")
-    else:
-        cmd.group(name,members=f"vec_{name}")
+    with phase('emit'):
+        cmd.load_cgo(obj, f"vec_{name}")
+        if use_lab:
+            ##For some reason pos fails, but it just happens to put it where I want
+            cmd.pseudoatom(f"lab_{name}",name="lab_"+name,label=f"{length:.2f}")#,pos=loc
+            cmd.group(name,members=f"lab_{name} vec_{name}")
+        else:
+            cmd.group(name,members=f"vec_{name}")
+    return obj
 cmd.extend('cgo_arrow', cgo_arrow)
+
+
+def cgo_arrows(origins, endpoints, color='blue', radius=0.10, gap=0.0, hlength=-1, hradius=-1,
+               type='electric', scaling=7, from_atom=False, colors=None):
+    '''
+       Vectorized version of cgo_arrow that builds many arrows as a single CGO list.
+
+       All cylinder/cone endpoints, normals and midpoints are computed in one
+       pass over (N,3) arrays, and the colors are looked up once, so the caller
+       only needs one load_cgo for the whole set. Large sets go through cgo_cache.
+       It returns the geometry instead of loading it, so it is not a PyMOL
+       command; elec_mag_batch draws its result.
+
+       :param origins: Origin points of the vectors to be drawn
+       :type origins: (N,3) array-like of floats, or a string such as "[[0,0,0],[1,0,0]]"
+
+       :param endpoints: Endpoints of the vectors to be drawn
+       :type endpoints: (N,3) array-like of floats, or a string as for origins
+
+       :param color: Color of arrows, ignored for electric/magnetic types
+       :type color: String, optional - default blue
+
+       :param type: Type of vector being drawn, electric or magnetic
+       :type type: String, optional - default electric
+
+       :param scaling: Scaling factor applied to the endpoints
+       :type scaling: Float, optional - default 7
+
+       :param from_atom: Shift the scaled endpoints by the origins, as cgo_arrow does for 'sele'
+       :type from_atom: Boolean, optional - default False
+
+       :param colors: RGB of both ends from arrow_colors, looked up from type and color if not given.
+                      Background jobs pass them in, PyMOL is only called from its own thread
+       :type colors: Tuple of lists of floats, optional
+
+       :return: CGO object, vector lengths and label positions (arrow midpoints)
+       :rtype: Tuple of (List of floats, np.ndarray, np.ndarray)
+    '''
+    radius, gap = float(radius), float(gap)
+    hlength, hradius = float(hlength), float(hradius)
+    scaling = float(scaling)
+
+    if colors is None:
+        colors = arrow_colors(type, color)
+    color1, color2 = colors
+
+    ##Arguments typed in PyMOL arrive as strings
+    if isinstance(origins, str):
+        origins = str_to_list(origins)
+    if isinstance(endpoints, str):
+        endpoints = str_to_list(endpoints)
+    endpoints = np.asarray(endpoints, dtype=float).reshape(-1, 3)
+    xyz1 = np.broadcast_to(np.asarray(origins, dtype=float).reshape(-1, 3), endpoints.shape)
+    from_atom = bool(int(from_atom))
+    if from_atom:
+        length = np.linalg.norm(endpoints, axis=1)
+    else:
+        length = np.linalg.norm(endpoints - xyz1, axis=1)
+
+    def build():
+        return [arrow_rows(Arrows.from_vectors(xyz1, endpoints, color1, color2, radius, gap,
+                                               hlength, hradius, scaling,
+                                               from_atom)).ravel().tolist()]
+    obj, = cgo_cache.cached('arrows', build, xyz1, endpoints, color1, color2, radius, gap,
+                            hlength, hradius, scaling, bool(from_atom))
+
+    ##Label positions are read back from the cylinder start and cone tip of each arrow
+    rows = np.asarray(obj).reshape(-1, 31)
+    return obj, length, (rows[:, 1:4] + rows[:, 18:21])/2
+
+
+def arrow_colors(type='electric', color='blue'):
+    '''
+       :param type: Type of vector, electric arrows are red and magnetic ones blue
+       :type type: String, optional - default electric
+
+       :param color: Color of other arrows, or two colors for the start and end
+       :type color: String, optional - default blue
+
+       :return: RGB of the start and end of the arrows
+       :rtype: Tuple of lists of floats
+    '''
+    if type == 'electric':
+        color = 'red'
+    if type == 'magnetic':
+        color = 'blue'
+    try:
+        color1, color2 = color.split()
+    except:
+        color1 = color2 = color
+    return list(cmd.get_color_tuple(color1)), list(cmd.get_color_tuple(color2))
+
+
+def arrow_rows(arrows, caps=(1.0, 0.0)):
+    '''
+       CGO of geometry.Arrows, one 31 float row per arrow
+
+       :param arrows: Arrows to draw
+       :type arrows: Arrows
+
+       :param caps: Whether the cone base and tip are closed
+       :type caps: Tuple of floats, optional - default closed base, open tip
+
+       :return: CGO rows
+       :rtype: (N,31) np.ndarray
+    '''
+    ##One row per arrow, same layout as the obj list in cgo_arrow
+    obj = np.empty((len(arrows), 31))
+    obj[:, 0] = cgo.CYLINDER
+    obj[:, 1:4] = arrows.start
+    obj[:, 4:7] = arrows.split
+    obj[:, 7] = arrows.radius
+    obj[:, 8:11] = arrows.color
+    obj[:, 11:14] = arrows.color
+    obj[:, 14] = cgo.CONE
+    obj[:, 15:18] = arrows.split
+    obj[:, 18:21] = arrows.tip
+    obj[:, 21:23] = [arrows.head_radius, 0.0]
+    obj[:, 23:26] = arrows.color
+    obj[:, 26:29] = arrows.tip_color
+    obj[:, 29:31] = caps
+    return obj
@@ -0,0 +1,739 @@
+'''
+PyMOL independent geometry of the S-tilde drawings.
+
+Arrows, spheres, coordinate axes and polar plot lobes are computed here with
+NumPy only. The drawing commands pack the results into CGO lists, while the
+*_mesh functions tessellate them into Mesh vertex/index/color buffers that
+mesh_export writes as OBJ, PLY or binary glTF. The same geometry can then be
+produced on machines without PyMOL and opened in lightweight viewers.
+'''
+from functools import lru_cache
+import numpy as np
+
+##RGB of the PyMOL colors used by the commands, for color names without PyMOL
+named_colors = {'red': (1.0, 0.0, 0.0), 'green': (0.0, 1.0, 0.0), 'blue': (0.0, 0.0, 1.0),
+                'yellow': (1.0, 1.0, 0.0), 'orange': (1.0, 0.5, 0.0), 'cyan': (0.0, 1.0, 1.0),
+                'magenta': (1.0, 0.0, 1.0), 'white': (1.0, 1.0, 1.0), 'black': (0.0, 0.0, 0.0),
+                'grey': (0.5, 0.5, 0.5), 'gray': (0.5, 0.5, 0.5)}
+
+
+def color_rgb(color):
+    '''
+       :param color: Name from named_colors, or r,g,b values between 0 and 1
+       :type color: String or list of floats
+
+       :return: RGB of `color`
+       :rtype: Tuple of floats
+    '''
+    if isinstance(color, str):
+        try:
+            return named_colors[color.lower()]
+        except KeyError:
+            raise ValueError(f"Unknown color {color}, pass its r,g,b values instead")
+    return tuple(float(c) for c in color)
+
+
+def sign_colors(values, pos_color, neg_color):
+    '''
+       :param values: Values colored by their sign, e.g. S-tilde or r of a polar plot
+       :type values: Array-like of floats
+
+       :param pos_color: RGB of values >= 0
+       :type pos_color: List of floats
+
+       :param neg_color: RGB of negative values
+       :type neg_color: List of floats
+
+       :return: RGB of every value
+       :rtype: (N,3) np.ndarray
+    '''
+    values = np.asarray(values, dtype=float).ravel()
+    return np.where((values >= 0)[:,None], np.asarray(pos_color, dtype=float),
+                    np.asarray(neg_color, dtype=float))
+
+
+def normalize(v, tiny=1e-4):
+    '''
+       :param v: Vectors
+       :type v: (N,3) np.ndarray
+
+       :param tiny: Vectors at most this long become null vectors, as in chempy.cpv.normalize
+       :type tiny: Float, optional - default 1e-4
+
+       :return: Unit vectors
+       :rtype: (N,3) np.ndarray
+    '''
+    norm = np.linalg.norm(v, axis=-1)[...,None]
+    return np.divide(v, norm, out=np.zeros_like(v, dtype=float), where=norm > tiny)
+
+
+class Arrows:
+    '''
+       Arrows made of a cylinder and a cone, one row per arrow
+
+       :param start: Start of the cylinders
+       :type start: (N,3) array-like of floats
+
+       :param split: Where the cylinders end and the cones begin
+       :type split: (N,3) array-like of floats
+
+       :param tip: Tips of the cones
+       :type tip: (N,3) array-like of floats
+
+       :param radius: Radius of the cylinders
+       :type radius: Float
+
+       :param head_radius: Radius of the cone bases
+       :type head_radius: Float
+
+       :param color: RGB of the cylinders and cone bases
+       :type color: (3,) or (N,3) array-like of floats
+
+       :param tip_color: RGB of the cone tips, defaults to color
+       :type tip_color: (3,) or (N,3) array-like of floats, optional
+    '''
+    def __init__(self, start, split, tip, radius, head_radius, color, tip_color=None):
+        self.start = np.asarray(start, dtype=float).reshape(-1,3)
+        self.split = np.asarray(split, dtype=float).reshape(-1,3)
+        self.tip = np.asarray(tip, dtype=float).reshape(-1,3)
+        self.radius = float(radius)
+        self.head_radius = float(head_radius)
+        shape = self.start.shape
+        self.color = np.broadcast_to(np.asarray(color, dtype=float), shape)
+        self.tip_color = self.color if tip_color is None else np.broadcast_to(
+            np.asarray(tip_color, dtype=float), shape)
+
+    @classmethod
+    def from_vectors(cls, origins, endpoints, color, tip_color=None, radius=0.10, gap=0.0,
+                     hlength=-1, hradius=-1, scaling=7, from_atom=False):
+        '''
+           Arrows of vectors, laid out as cgo_arrow draws them
+
+           :param origins: Origin points of the vectors
+           :type origins: (3,) or (N,3) array-like of floats
+
+           :param endpoints: Endpoints of the vectors
+           :type endpoints: (N,3) array-like of floats
+
+           :param gap: Gap left at both ends of the arrows
+           :type gap: Float, optional - default 0
+
+           :param hlength: Length of the heads, defaults to 3 times the radius
+           :type hlength: Float, optional - default -1
+
+           :param hradius: Radius of the heads, defaults to 0.6 times hlength
+           :type hradius: Float, optional - default -1
+
+           :param scaling: Scaling factor applied to the endpoints
+           :type scaling: Float, optional - default 7
+
+           :param from_atom: Shift the scaled endpoints by the origins
+           :type from_atom: Boolean, optional - default False
+
+           :rtype: Arrows
+        '''
+        radius, gap = float(radius), float(gap)
+        hlength, hradius = float(hlength), float(hradius)
+        endpoints = np.asarray(endpoints, dtype=float).reshape(-1,3)
+        xyz1 = np.broadcast_to(np.asarray(origins, dtype=float).reshape(-1,3), endpoints.shape)
+        xyz2 = endpoints*float(scaling)
+        if from_atom:
+            xyz2 = xyz2 + xyz1
+
+        normal = normalize(xyz1 - xyz2)
+        if hlength < 0:
+            hlength = radius * 3.0
+        if hradius < 0:
+            hradius = hlength * 0.6
+        if gap:
+            xyz1 = xyz1 - normal*gap
+            xyz2 = xyz2 + normal*gap
+        ##Location where cylinder switches to cone
+        xyz3 = normal*hlength + xyz2
+        return cls(xyz1, xyz3, xyz2, radius, hradius, color, tip_color)
+
+    def __len__(self):
+        return len(self.start)
+
+    @property
+    def midpoints(self):
+        '''Middle of every arrow, where its label goes'''
+        return (self.start + self.tip)/2
+
+
+def axes_arrows(x_scale=1.0, y_scale=1.0, z_scale=1.0, loc=(1.0,1.0,1.0)):
+    '''
+       Red, green and blue x, y and z axes, as drawn by coord_axes
+
+       :param loc: Origin of the axes
+       :type loc: List of floats, optional - default 1,1,1
+
+       :rtype: Arrows
+    '''
+    w = 0.06 # cylinder width
+    l = 0.75 # cylinder length
+    h = 0.25 # cone height
+    d = w * 1.618 # cone base diameter
+
+    loc = np.asarray(loc, dtype=float)
+    split = loc + np.diag([x_scale*l, y_scale*l, z_scale*l])
+    return Arrows(np.tile(loc, (3,1)), split, split + np.eye(3)*h, w, d, np.eye(3))
+
+
+class Mesh:
+    '''
+       Vertex, index and color buffers of one object
+
+       :param positions: Vertex coordinates
+       :type positions: (N,3) array-like of floats
+
+       :param indices: Vertex indices, 3 per triangle, 2 per line segment or 1 per point
+       :type indices: Array-like of ints
+
+       :param colors: RGB or RGBA of the vertices
+       :type colors: (3,), (4,), (N,3) or (N,4) array-like of floats
+
+       :param normals: Unit normals of the vertices
+       :type normals: (N,3) array-like of floats, optional
+
+       :param mode: triangles, lines or points
+       :type mode: String, optional - default triangles
+
+       :param name: Name of the object in exported files
+       :type name: String, optional - default mesh
+
+       :param alpha: Opacity used when colors are RGB
+       :type alpha: Float, optional - default 1.0
+    '''
+    corners = {'triangles': 3, 'lines': 2, 'points': 1}
+
+    def __init__(self, positions, indices, colors, normals=None, mode='triangles', name='mesh',
+                 alpha=1.0):
+        if mode not in self.corners:
+            raise ValueError(f"Unknown mode {mode}, use one of {', '.join(self.corners)}")
+        self.positions = np.ascontiguousarray(positions, dtype=np.float32).reshape(-1,3)
+        self.indices = np.ascontiguousarray(indices, dtype=np.uint32).ravel()
+        colors = np.asarray(colors, dtype=np.float32)
+        if colors.shape[-1] == 3:
+            colors = np.concatenate([colors, np.full(colors.shape[:-1]+(1,), alpha, np.float32)],
+                                    axis=-1)
+        self.colors = np.ascontiguousarray(np.broadcast_to(colors, (len(self.positions), 4)))
+        self.normals = None if normals is None else np.ascontiguousarray(
+            normals, dtype=np.float32).reshape(-1,3)
+        self.mode = mode
+        self.name = name
+
+    def __len__(self):
+        return len(self.positions)
+
+    @property
+    def primitives(self):
+        '''Number of triangles, line segments or points'''
+        return len(self.indices)//self.corners[self.mode]
+
+    @property
+    def nbytes(self):
+        '''Bytes held by the buffers'''
+        return sum(a.nbytes for a in (self.positions, self.indices, self.colors, self.normals)
+                   if a is not None)
+
+    @classmethod
+    def concatenate(cls, meshes, name=None):
+        '''
+           :param meshes: Meshes of the same mode
+           :type meshes: List of Mesh
+
+           :param name: Name of the result, defaults to the name of the first mesh
+           :type name: String, optional
+
+           :return: One mesh holding all of `meshes`
+           :rtype: Mesh
+        '''
+        meshes = list(meshes)
+        if len({m.mode for m in meshes}) != 1:
+            raise ValueError("Only meshes of one mode can be concatenated")
+        offsets = np.cumsum([0] + [len(m) for m in meshes[:-1]])
+        normals = None
+        if all(m.normals is not None for m in meshes):
+            normals = np.concatenate([m.normals for m in meshes])
+        return cls(np.concatenate([m.positions for m in meshes]),
+                   np.concatenate([m.indices.astype(np.int64) + k for m, k in zip(meshes, offsets)]),
+                   np.concatenate([m.colors for m in meshes]), normals, meshes[0].mode,
+                   meshes[0].name if name is None else name)
+
+    def split(self, parts, names=None):
+        '''
+           Cuts a mesh of `parts` equal instances, e.g. the arrows of arrow_mesh, apart
+
+           :param parts: Number of instances
+           :type parts: Int
+
+           :param names: Name of every instance, defaults to name0, name1, ...
+           :type names: List of strings, optional
+
+           :rtype: List of Mesh
+        '''
+        parts = int(parts)
+        if parts == 0:
+            return []
+        nv, ni = len(self)//parts, len(self.indices)//parts
+        if nv*parts != len(self) or ni*parts != len(self.indices):
+            raise ValueError(f"{self.name} does not hold {parts} equal instances")
+        if names is None:
+            names = [f"{self.name}{k}" for k in range(parts)]
+        return [Mesh(self.positions[k*nv:(k+1)*nv], self.indices[k*ni:(k+1)*ni] - k*nv,
+                     self.colors[k*nv:(k+1)*nv],
+                     None if self.normals is None else self.normals[k*nv:(k+1)*nv],
+                     self.mode, name) for k, name in enumerate(names)]
+
+
+def vertex_normals(positions, triangles):
+    '''
+       :param positions: Vertex coordinates
+       :type positions: (N,3) np.ndarray
+
+       :param triangles: Vertex indices of every triangle
+       :type triangles: (M,3) np.ndarray
+
+       :return: Area weighted unit normal of every vertex
+       :rtype: (N,3) np.ndarray
+    '''
+    a, b, c = (positions[triangles[:,k]] for k in range(3))
+    face = np.cross(b - a, c - a)
+    normals = np.zeros((len(positions),3))
+    for k in range(3):
+        np.add.at(normals, triangles[:,k], face)
+    return normalize(normals, 0.0)
+
+
+def _basis(u):
+    ##Perpendicular unit vectors e1, e2 of every axis u, with e1 x e2 = u
+    helper = np.where((np.abs(u[:,0]) < 0.9)[:,None], [1.0,0.0,0.0], [0.0,1.0,0.0])
+    e1 = normalize(np.cross(u, helper), 0.0)
+    return e1, np.cross(u, e1)
+
+
+def arrow_mesh(arrows, segments=16, name='arrows'):
+    '''
+       Tessellates arrows into triangles, 5*segments+3 vertices and 5*segments
+       triangles per arrow: the cylinder side and bottom cap, the cone side and
+       base cap
+
+       :param arrows: Arrows to tessellate
+       :type arrows: Arrows
+
+       :param segments: Number of sides of the cylinders and cones
+       :type segments: Int, optional - default 16
+
+       :param name: Name of the mesh
+       :type name: String, optional - default arrows
+
+       :rtype: Mesh
+    '''
+    n, s = len(arrows), int(segments)
+    axis = normalize(arrows.tip - arrows.start, 0.0)
+    ##Arrows of null length still get a valid, if flat, frame
+    axis[~axis.any(axis=1)] = [0.0, 0.0, 1.0]
+    e1, e2 = _basis(axis)
+    t = 2*np.pi*np.arange(s)/s
+    radial = np.cos(t)[None,:,None]*e1[:,None,:] + np.sin(t)[None,:,None]*e2[:,None,:]
+    start, split, tip = (p[:,None,:] for p in (arrows.start, arrows.split, arrows.tip))
+    down = np.broadcast_to(-axis[:,None,:], (n,s,3))
+    height = np.linalg.norm(arrows.tip - arrows.split, axis=1)[:,None,None]
+    cone = normalize(radial*height + axis[:,None,:]*arrows.head_radius, 0.0)
+    r, hr = arrows.radius, arrows.head_radius
+
+    ##Rings of the cylinder bottom and top, bottom cap, cone side and cone base, then 3 centers
+    positions = np.concatenate([start + r*radial, split + r*radial, start + r*radial,
+                                split + hr*radial, split + hr*radial, start, split, tip], axis=1)
+    normals = np.concatenate([radial, radial, down, cone, down, -axis[:,None,:], -axis[:,None,:],
+                              axis[:,None,:]], axis=1)
+    colors = np.repeat(arrows.color[:,None,:], 5*s+3, axis=1)
+    colors[:,-1] = arrows.tip_color
+
+    k = np.arange(s)
+    k1 = (k + 1) % s
+    c0, c1, c2 = 5*s, 5*s+1, 5*s+2
+    triangles = np.concatenate([
+        np.column_stack([k, k1, s+k1]), np.column_stack([k, s+k1, s+k]),
+        np.column_stack([np.full(s, c0), 2*s+k1, 2*s+k]),
+        np.column_stack([3*s+k, 3*s+k1, np.full(s, c2)]),
+        np.column_stack([np.full(s, c1), 4*s+k1, 4*s+k])])
+    indices = triangles[None,:,:] + (5*s+3)*np.arange(n)[:,None,None]
+    return Mesh(positions.reshape(-1,3), indices.ravel(), colors.reshape(-1,3),
+                normals.reshape(-1,3), name=name)
+
+
+@lru_cache(maxsize=8)
+def uv_grid(around, rings):
+    '''
+       Unit directions and triangles of a sphere sampled on `around` values of
+       theta and `rings` intervals of phi, with one vertex at each pole
+
+       :return: (N,3) directions and (M,3) outward facing triangles, both read-only
+       :rtype: Tuple of np.ndarray
+    '''
+    around, rings = max(3, int(around)), max(2, int(rings))
+    theta = 2*np.pi*np.arange(around)/around
+    phi = np.pi*np.arange(1, rings)/rings
+    u = polar_to_cartesian(np.ones((rings-1, around)), theta[None,:], phi[:,None])
+    u = np.concatenate([[[0.0,0.0,1.0]], u, [[0.0,0.0,-1.0]]])
+    south = len(u) - 1
+
+    k = np.arange(around)
+    k1 = (k + 1) % around
+    ring = 1 + around*np.arange(rings-2)[:,None]
+    triangles = [np.column_stack([np.zeros(around, int), 1+k, 1+k1])]
+    if rings > 2:
+        triangles += [np.column_stack([(ring+k).ravel(), (ring+around+k).ravel(), (ring+k1).ravel()]),
+                      np.column_stack([(ring+around+k).ravel(), (ring+around+k1).ravel(),
+                                       (ring+k1).ravel()])]
+    last = 1 + around*(rings-2)
+    triangles.append(np.column_stack([last+k, np.full(around, south), last+k1]))
+    triangles = np.concatenate(triangles)
+    u.setflags(write=False)
+    triangles.setflags(write=False)
+    return u, triangles
+
+
+def sphere_mesh(centers, radii, colors, alpha=1.0, segments=16, name='spheres'):
+    '''
+       Tessellates spheres, e.g. those of sphere_field, into triangles
+
+       :param centers: Centers of the spheres
+       :type centers: (N,3) array-like of floats
+
+       :param radii: Radius of every sphere
+       :type radii: Array-like of floats
+
+       :param colors: RGB of every sphere
+       :type colors: (3,) or (N,3) array-like of floats
+
+       :param alpha: Opacity of the spheres
+       :type alpha: Float, optional - default 1.0
+
+       :param segments: Number of theta samples, phi gets half as many
+       :type segments: Int, optional - default 16
+
+       :rtype: Mesh
+    '''
+    centers = np.asarray(centers, dtype=float).reshape(-1,3)
+    radii = np.broadcast_to(np.asarray(radii, dtype=float).ravel(), (len(centers),))
+    colors = np.broadcast_to(np.asarray(colors, dtype=float), centers.shape)
+    u, triangles = uv_grid(segments, max(2, int(segments)//2))
+    positions = centers[:,None,:] + radii[:,None,None]*u[None,:,:]
+    indices = triangles[None,:,:] + len(u)*np.arange(len(centers))[:,None,None]
+    return Mesh(positions.reshape(-1,3), indices.ravel(), np.repeat(colors, len(u), axis=0),
+                np.tile(u, (len(centers),1)), name=name, alpha=alpha)
+
+
+def quadratic_basis(u):
+    '''
+       :param u: Unit directions
+       :type u: (N,3) np.ndarray
+
+       :return: (x*x, y*y, z*z, 2*x*y, 2*x*z, 2*y*z) of every direction, so that basis @ tensor equals calc_r
+       :rtype: (N,6) np.ndarray
+    '''
+    x, y, z = u.T
+    return np.column_stack([x*x, y*y, z*z, 2*x*y, 2*x*z, 2*y*z])
+
+
+def polar_surface(tensor, Ntheta=150, Nphi=150, scale=1.0, origin=None, pos_color="blue",
+                  neg_color="orange", name='polar'):
+    '''
+       Closed triangle surface of a polar plot: the point |r| along every grid
+       direction, colored by the sign of r. The lobes meet at the origin where
+       r changes sign
+
+       :param tensor: The 6 unique tensor components (xx,yy,zz,xy,xz,yz)
+       :type tensor: List of floats
+
+       :param origin: Displacement of the plot
+       :type origin: List of floats, optional
+
+       :param pos_color: Color of the positive lobes
+       :type pos_color: String or list of floats, optional - default blue
+
+       :param neg_color: Color of the negative lobes
+       :type neg_color: String or list of floats, optional - default orange
+
+       :rtype: Mesh
+    '''
+    u, triangles = uv_grid(Ntheta, Nphi)
+    r = float(scale)*(quadratic_basis(u) @ np.asarray(tensor, dtype=float))
+    positions = np.abs(r)[:,None]*u
+    if origin is not None:
+        positions += np.asarray(origin, dtype=float)
+    return Mesh(positions, triangles, sign_colors(r, color_rgb(pos_color), color_rgb(neg_color)),
+                vertex_normals(positions, triangles), name=name)
+
+
+def polyline_indices(n, style="loop"):
+    '''
+       :param n: Number of vertices
+       :type n: Int
+
+       :param style: loop, lines or points, as in polar_plot
+       :type style: String, optional - default loop
+
+       :return: Mesh mode and indices linking `n` vertices the way the CGO style does
+       :rtype: Tuple of (String, np.ndarray)
+    '''
+    k = np.arange(n)
+    style = style.lower()
+    if style == "points" or n < 2:
+        return 'points', k
+    if style == "lines":
+        return 'lines', k[:n - n%2]
+    return 'lines', np.column_stack([k, np.roll(k, -1)]).ravel()
+
+
+def polar_lines(pos, neg, style="loop", pos_color="blue", neg_color="orange", name='polar'):
+    '''
+       Lobes of polar_vertices as the lines or points polar_plot draws
+
+       :param pos: Vertices of the positive lobe
+       :type pos: (N,3) np.ndarray
+
+       :param neg: Vertices of the negative lobe
+       :type neg: (N,3) np.ndarray
+
+       :return: One mesh per lobe
+       :rtype: List of Mesh
+    '''
+    meshes = []
+    for sign, xyz, color in (('positive', pos, pos_color), ('negative', neg, neg_color)):
+        mode, indices = polyline_indices(len(xyz), style)
+        meshes.append(Mesh(xyz, indices, color_rgb(color), mode=mode, name=f"{name}_{sign}"))
+    return meshes
+
+
+def calc_r(theta=0.0,phi=0.0,tensor=None):
+    """Evaluate r from the polar function
+
+    theta and phi may be scalars or NumPy arrays of matching shape.
+    """
+    sp=np.sin(phi)
+    st=np.sin(theta)
+    cp=np.cos(phi)
+    ct=np.cos(theta)
+
+    r=(tensor[0]*sp**2*ct**2
+      +tensor[1]*sp**2*st**2
+      +tensor[2]*cp**2
+      +2*tensor[3]*st*ct*sp**2
+      +2*tensor[4]*ct*sp*cp
+      +2*tensor[5]*st*sp*cp)
+
+    return r
+
+def convert_cartesian(polar_coords):
+    """Convert polar coordinates to Cartesian
+
+    Expects `polar_coords` to be a list of (r,theta,phi) tuples.
+    """
+    return [(r*np.cos(theta)*np.sin(phi), r*np.sin(theta)*np.sin(phi), r*np.cos(phi))
+            for r,theta,phi in polar_coords]
+
+def polar_to_cartesian(r,theta,phi):
+    """Array version of convert_cartesian
+
+    Takes r, theta and phi arrays of the same shape and returns an (N,3)
+    array of Cartesian coordinates.
+    """
+    xyz = np.empty(np.shape(r)+(3,))
+    xyz[...,0] = r*np.cos(theta)*np.sin(phi)
+    xyz[...,1] = r*np.sin(theta)*np.sin(phi)
+    xyz[...,2] = r*np.cos(phi)
+    return xyz.reshape(-1,3)
+
+@lru_cache(maxsize=8)
+def direction_table(Ntheta, Nphi):
+    """Unit directions and quadratic form basis of a theta/phi grid
+
+    Rows follow the forward/reverse phi ordering of polar_vertices. The
+    basis rows are (x*x, y*y, z*z, 2*x*y, 2*x*z, 2*y*z) of each direction, so
+    r for every grid point is basis @ tensor, which equals calc_r. Only
+    depends on the grid size, so the tables of recent grids are kept.
+
+    :return: (N,3) unit directions and (N,6) basis, both read-only
+    :rtype: Tuple of np.ndarray
+    """
+    theta_increment=(2*np.pi)/Ntheta
+    phi_increment=(np.pi)/Nphi
+    i = np.arange(Ntheta)
+    phi = np.where((i%2==0)[:,None], np.arange(Nphi), np.arange(Nphi,0,-1))*phi_increment
+    theta = np.broadcast_to((i*theta_increment)[:,None], phi.shape)
+    u = polar_to_cartesian(np.ones(phi.shape),theta,phi)
+    basis = quadratic_basis(u)
+    u.setflags(write=False)
+    basis.setflags(write=False)
+    return u, basis
+
+def polar_vertices(tensor, Ntheta=150, Nphi=150, scale=1.0, max_points=1000000, progress=None,
+                   block=65536):
+    """Evaluate the polar function over the whole theta/phi grid
+
+    Even theta rows run forward over phi (j=0..Nphi-1) and odd rows run in
+    reverse (j=Nphi..1), so that for the 'loop' and 'lines' styles the next
+    linked vertex is never far away. Points are split into the positive and
+    negative lobes with a boolean mask, keeping that ordering.
+
+    Grids of at most max_points points use the cached direction_table, so
+    only one matrix product is left per tensor. Larger grids are evaluated in
+    blocks of theta rows holding at most max_points points, so the temporary
+    arrays stay bounded.
+
+    :param tensor: The 6 unique tensor components (xx,yy,zz,xy,xz,yz)
+    :type tensor: List of floats
+
+    :param max_points: Largest number of grid points evaluated at once
+    :type max_points: Int, optional - default 1000000
+
+    :param progress: Called with the fraction of the grid done, after every block of
+                     directions or theta rows, see background.progress
+    :type progress: Function, optional
+
+    :param block: Directions of the cached table evaluated between progress calls
+    :type block: Int, optional - default 65536
+
+    :return: Cartesian vertices of the positive and negative lobes
+    :rtype: Tuple of (N,3) np.ndarray
+    """
+    tensor = np.asarray(tensor, dtype=float)
+    Ntheta = int(Ntheta)
+    Nphi = int(Nphi)
+    scale = float(scale)
+
+    if Ntheta*Nphi <= int(max_points):
+        u, basis = direction_table(Ntheta, Nphi)
+        if progress is None:
+            r = scale*(basis @ tensor)
+        else:
+            r = np.empty(len(u))
+            for first in range(0, len(u), block):
+                r[first:first+block] = scale*(basis[first:first+block] @ tensor)
+                progress(min(first+block, len(u))/len(u))
+        positive = r>=0.0
+        xyz = np.abs(r)[:,None]*u
+        return xyz[positive], xyz[~positive]
+
+    theta_increment=(2*np.pi)/Ntheta
+    phi_increment=(np.pi)/Nphi
+    forward = np.arange(Nphi)
+    reverse = np.arange(Nphi,0,-1)
+    rows = max(1, int(max_points)//max(Nphi,1))
+
+    pos=[np.empty((0,3))]
+    neg=[np.empty((0,3))]
+    for first in range(0, Ntheta, rows):
+        i = np.arange(first, min(first+rows, Ntheta))
+        phi = np.where((i%2==0)[:,None], forward, reverse)*phi_increment
+        theta = np.broadcast_to((i*theta_increment)[:,None], phi.shape)
+        r = scale*calc_r(theta,phi,tensor)
+        xyz = polar_to_cartesian(np.abs(r),theta,phi)
+        positive = (r>=0.0).ravel()
+        pos.append(xyz[positive])
+        neg.append(xyz[~positive])
+        if progress is not None:
+            progress(min(first+rows, Ntheta)/Ntheta)
+    return np.concatenate(pos), np.concatenate(neg)
+
+def adaptive_polar_vertices(tensor, Ntheta=150, Nphi=150, scale=1.0, tol=0.01, max_level=4,
+                            progress=None):
+    """Evaluate the polar function on an adaptively refined theta/phi grid
+
+    Starts from Ntheta//2**max_level (at least 4) lines of constant theta, each
+    sampled at Nphi//2**max_level (at least 2) values of phi. An interval is
+    halved when r changes sign across it or when the surface point at its
+    middle is further than tol*max|r| from the chord between its ends, up to
+    max_level times, or fewer when the coarse grid was clamped, so the finest
+    grid never has more than Ntheta by Nphi intervals. Theta intervals are first
+    refined using all Nphi+1 values of phi as probes, then phi intervals are
+    refined along every remaining line of theta. Vertices come out in the
+    same forward/reverse phi order as polar_vertices.
+
+    :param tol: Largest allowed chord error, relative to the largest r
+    :type tol: Float, optional - default 0.01
+
+    :param max_level: Number of times an interval can be halved
+    :type max_level: Int, optional - default 4
+
+    :param progress: Called with the fraction of refinement levels done
+    :type progress: Function, optional
+
+    :return: Cartesian vertices of the positive and negative lobes
+    :rtype: Tuple of (N,3) np.ndarray
+    """
+    tensor = np.asarray(tensor, dtype=float)
+    scale = float(scale)
+    tol = float(tol)
+    max_level = int(max_level)
+    Ntheta, Nphi = int(Ntheta), int(Nphi)
+
+    def levels(n, least):
+        ##Coarse intervals and the halvings that keep them within n
+        n0 = max(min(least, n), n >> max_level)
+        level = 0
+        while level < max_level and n0 << (level+1) <= n:
+            level += 1
+        return n0, level
+    Ntheta0, theta_levels = levels(Ntheta, 4)
+    Nphi0, phi_levels = levels(Nphi, 2)
+    steps = theta_levels + phi_levels + 1
+
+    def surface(theta, phi):
+        r = scale*calc_r(theta, phi, tensor)
+        return r, polar_to_cartesian(np.abs(r), theta, phi).reshape(np.shape(r)+(3,))
+
+    def split(theta0, phi0, theta1, phi1):
+        ##True where r changes sign or the chord error is too big
+        r0, x0 = surface(theta0, phi0)
+        r1, x1 = surface(theta1, phi1)
+        rm, xm = surface((theta0+theta1)/2, (phi0+phi1)/2)
+        error = np.linalg.norm(xm - (x0+x1)/2, axis=-1)
+        sign = ((r0>=0.0) != (rm>=0.0)) | ((rm>=0.0) != (r1>=0.0))
+        return (error > tol*rmax) | sign
+
+    probe = np.linspace(0.0, np.pi, Nphi+1)
+    rmax = np.abs(surface(np.linspace(0.0, 2*np.pi, Ntheta0+1)[:,None], probe)[0]).max()
+    if rmax == 0.0:
+        rmax = 1.0
+
+    ##Refine lines of constant theta, judging each interval on all probe phis
+    lo = np.linspace(0.0, 2*np.pi, Ntheta0+1)[:-1]
+    width = 2*np.pi/Ntheta0
+    thetas = []
+    for level in range(theta_levels):
+        refine = split(lo[:,None], probe, (lo+width)[:,None], probe).any(axis=1)
+        thetas.append(lo[~refine])
+        width /= 2
+        lo = np.concatenate([lo[refine], lo[refine]+width])
+        if progress is not None:
+            progress((level+1)/steps)
+    thetas = np.sort(np.concatenate(thetas + [lo]))
+
+    ##Refine phi along every line of theta
+    theta = np.repeat(thetas, Nphi0)
+    lo = np.tile(np.linspace(0.0, np.pi, Nphi0+1)[:-1], len(thetas))
+    width = np.full(lo.shape, np.pi/Nphi0)
+    done_theta, done_phi = [thetas], [np.full(len(thetas), np.pi)]
+    for level in range(phi_levels):
+        refine = split(theta, lo, theta, lo+width)
+        done_theta.append(theta[~refine])
+        done_phi.append(lo[~refine])
+        theta, lo, width = (np.tile(theta[refine], 2),
+                            np.concatenate([lo[refine], lo[refine]+width[refine]/2]),
+                            np.tile(width[refine]/2, 2))
+        if progress is not None:
+            progress((theta_levels+level+1)/steps)
+    theta = np.concatenate(done_theta + [theta])
+    phi = np.concatenate(done_phi + [lo])
+
+    ##Forward phi on even lines of theta, reverse on odd ones
+    row = np.searchsorted(thetas, theta)
+    order = np.lexsort((np.where(row%2==0, phi, -phi), row))
+    r, xyz = surface(theta[order], phi[order])
+    positive = r>=0.0
+    return xyz[positive], xyz[~positive]
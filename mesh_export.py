@@ -0,0 +1,325 @@
+'''
+Writes the Mesh buffers of geometry as Wavefront OBJ, PLY or binary glTF.
+
+This needs neither PyMOL nor a display, so visualization assets for
+thousands of transitions can be generated on compute nodes and opened in
+lightweight viewers (Blender, MeshLab, three.js, ...).
+Usage at command line: py mesh_export.py *sorted.csv* -o *vectors.glb* -n *number*
+Per transition files: py mesh_export.py *sorted.csv* -n *number* --split --outdir *dir* -f ply
+
+The electric (red) and magnetic (blue) arrows of the first rows of the table
+are drawn from the origin, as multiple_vectors does, with --spheres *scale*
+also an S-tilde sphere per transition. write picks the format
+from the file extension: .obj (with vertex colors), .ply (binary) or .glb.
+'''
+import json
+import os
+import struct
+import argparse as ap
+import numpy as np
+from geometry import Arrows, Mesh, arrow_mesh, sphere_mesh, color_rgb, sign_colors
+from column_cache import load_table
+from stilde_table import row_vectors
+
+##glTF constants
+GLB_MAGIC = 0x46546C67
+JSON_CHUNK = 0x4E4F534A
+BIN_CHUNK = 0x004E4942
+FLOAT = 5126
+UNSIGNED_INT = 5125
+ARRAY_BUFFER = 34962
+ELEMENT_ARRAY_BUFFER = 34963
+gltf_modes = {'points': 0, 'lines': 1, 'triangles': 4}
+
+
+def write_obj(meshes, filename):
+    '''
+       :param meshes: Meshes written as one object each
+       :type meshes: List of Mesh
+
+       :param filename: Path of the .obj file
+       :type filename: String
+
+       :return: None
+    '''
+    ##OBJ numbers vertices and normals separately, from 1 over the whole file
+    first, first_normal = 1, 1
+    with open(filename, 'w') as f:
+        f.write("# S-tilde geometry, vertex colors follow the positions\n")
+        for mesh in meshes:
+            f.write(f"o {mesh.name}\n")
+            np.savetxt(f, np.hstack([mesh.positions, mesh.colors[:,:3]]),
+                       fmt="v %.6g %.6g %.6g %.4g %.4g %.4g")
+            corners = mesh.indices.reshape(-1, Mesh.corners[mesh.mode]).astype(np.int64)
+            if mesh.mode == 'triangles' and mesh.normals is not None:
+                np.savetxt(f, mesh.normals, fmt="vn %.4f %.4f %.4f")
+                faces = np.stack([corners + first, corners + first_normal], axis=2).reshape(-1,6)
+                np.savetxt(f, faces, fmt="f %d//%d %d//%d %d//%d")
+                first_normal += len(mesh)
+            elif len(corners):
+                fmt = {'triangles': "f %d %d %d", 'lines': "l %d %d", 'points': "p %d"}[mesh.mode]
+                np.savetxt(f, corners + first, fmt=fmt)
+            first += len(mesh)
+
+
+def write_ply(meshes, filename, binary=True):
+    '''
+       Writes all meshes as one PLY model: triangles as faces, lines as edges
+
+       :param meshes: Meshes to write
+       :type meshes: List of Mesh
+
+       :param filename: Path of the .ply file
+       :type filename: String
+
+       :param binary: Binary little endian instead of ascii
+       :type binary: Boolean, optional - default True
+
+       :return: None
+    '''
+    meshes = list(meshes)
+    normals = all(m.normals is not None for m in meshes)
+    vertex = [('x','<f4'), ('y','<f4'), ('z','<f4')]
+    if normals:
+        vertex += [('nx','<f4'), ('ny','<f4'), ('nz','<f4')]
+    vertex += [('red','u1'), ('green','u1'), ('blue','u1'), ('alpha','u1')]
+    vertices = np.empty(sum(len(m) for m in meshes), dtype=vertex)
+    faces, edges = [], []
+    first = 0
+    for m in meshes:
+        block = vertices[first:first+len(m)]
+        block['x'], block['y'], block['z'] = m.positions.T
+        if normals:
+            block['nx'], block['ny'], block['nz'] = m.normals.T
+        rgba = np.clip(np.rint(m.colors*255), 0, 255).astype(np.uint8)
+        block['red'], block['green'], block['blue'], block['alpha'] = rgba.T
+        if m.mode == 'triangles':
+            faces.append(m.indices.reshape(-1,3).astype(np.int64) + first)
+        elif m.mode == 'lines':
+            edges.append(m.indices.reshape(-1,2).astype(np.int64) + first)
+        first += len(m)
+    faces = np.concatenate(faces) if faces else np.empty((0,3), np.int64)
+    edges = np.concatenate(edges) if edges else np.empty((0,2), np.int64)
+
+    header = ["ply", f"format {'binary_little_endian' if binary else 'ascii'} 1.0",
+              "comment S-tilde geometry", f"element vertex {len(vertices)}"]
+    header += [f"property {'float' if t == '<f4' else 'uchar'} {name}" for name, t in vertex]
+    if len(faces):
+        header += [f"element face {len(faces)}", "property list uchar int vertex_indices"]
+    if len(edges):
+        header += [f"element edge {len(edges)}", "property int vertex1", "property int vertex2"]
+    header.append("end_header\n")
+
+    with open(filename, 'wb') as f:
+        f.write("\n".join(header).encode('ascii'))
+        if binary:
+            f.write(vertices.tobytes())
+            if len(faces):
+                face = np.empty(len(faces), dtype=[('n','u1'), ('v','<i4',(3,))])
+                face['n'], face['v'] = 3, faces
+                f.write(face.tobytes())
+            f.write(edges.astype('<i4').tobytes())
+        else:
+            fmt = "%.6g "*(6 if normals else 3) + "%d %d %d %d"
+            np.savetxt(f, np.column_stack([vertices[name] for name, _ in vertex]), fmt=fmt)
+            np.savetxt(f, np.column_stack([np.full(len(faces), 3), faces]), fmt="%d")
+            np.savetxt(f, edges, fmt="%d")
+
+
+def write_glb(meshes, filename):
+    '''
+       Writes the meshes as one binary glTF 2.0 scene, one node per mesh
+
+       :param meshes: Meshes to write
+       :type meshes: List of Mesh
+
+       :param filename: Path of the .glb file
+       :type filename: String
+
+       :return: None
+    '''
+    chunks, views, accessors, gltf_meshes, nodes = [], [], [], [], []
+    offset = 0
+
+    def add(array, kind, target, bounds=False):
+        nonlocal offset
+        data = np.ascontiguousarray(array).tobytes()
+        views.append({'buffer': 0, 'byteOffset': offset, 'byteLength': len(data), 'target': target})
+        accessor = {'bufferView': len(views)-1, 'count': len(array), 'type': kind,
+                    'componentType': UNSIGNED_INT if array.dtype == np.uint32 else FLOAT}
+        if bounds:
+            accessor['min'] = array.min(axis=0).tolist()
+            accessor['max'] = array.max(axis=0).tolist()
+        accessors.append(accessor)
+        chunks.append(data)
+        ##Every component is 4 bytes, so the views stay aligned
+        offset += len(data)
+        return len(accessors) - 1
+
+    for mesh in meshes:
+        if len(mesh) == 0:
+            continue
+        attributes = {'POSITION': add(mesh.positions, 'VEC3', ARRAY_BUFFER, bounds=True),
+                      'COLOR_0': add(mesh.colors, 'VEC4', ARRAY_BUFFER)}
+        if mesh.normals is not None:
+            attributes['NORMAL'] = add(mesh.normals, 'VEC3', ARRAY_BUFFER)
+        primitive = {'attributes': attributes, 'mode': gltf_modes[mesh.mode],
+                     'material': int(bool((mesh.colors[:,3] < 1).any()))}
+        if len(mesh.indices):
+            primitive['indices'] = add(mesh.indices, 'SCALAR', ELEMENT_ARRAY_BUFFER)
+        gltf_meshes.append({'name': mesh.name, 'primitives': [primitive]})
+        nodes.append({'name': mesh.name, 'mesh': len(gltf_meshes)-1})
+
+    ##Vertex colors times a white base color; the second material is for transparent meshes
+    material = {'pbrMetallicRoughness': {'baseColorFactor': [1.0, 1.0, 1.0, 1.0],
+                                         'metallicFactor': 0.0, 'roughnessFactor': 0.6},
+                'doubleSided': True}
+    binary = b''.join(chunks)
+    gltf = {'asset': {'version': '2.0', 'generator': 'Stilde-Interpretation-and-Visualization'},
+            'scene': 0, 'scenes': [{'nodes': list(range(len(nodes)))}], 'nodes': nodes,
+            'meshes': gltf_meshes, 'materials': [dict(material, name='opaque'),
+                                                 dict(material, name='transparent', alphaMode='BLEND')],
+            'accessors': accessors, 'bufferViews': views, 'buffers': [{'byteLength': len(binary)}]}
+    if not binary:
+        del gltf['buffers'], gltf['bufferViews'], gltf['accessors']
+    text = json.dumps(gltf, separators=(',', ':')).encode()
+    text += b' '*(-len(text) % 4)
+    binary += b'\0'*(-len(binary) % 4)
+    length = 12 + 8 + len(text) + (8 + len(binary) if binary else 0)
+    with open(filename, 'wb') as f:
+        f.write(struct.pack('<III', GLB_MAGIC, 2, length))
+        f.write(struct.pack('<II', len(text), JSON_CHUNK) + text)
+        if binary:
+            f.write(struct.pack('<II', len(binary), BIN_CHUNK) + binary)
+
+
+writers = {'.obj': write_obj, '.ply': write_ply, '.glb': write_glb}
+
+
+def write(meshes, filename):
+    '''
+       :param meshes: Meshes to write
+       :type meshes: Mesh or list of Mesh
+
+       :param filename: Path ending in .obj, .ply or .glb
+       :type filename: String
+
+       :return: `filename`
+       :rtype: String
+    '''
+    if isinstance(meshes, Mesh):
+        meshes = [meshes]
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in writers:
+        raise ValueError(f"Unknown mesh format {extension}, use one of {', '.join(writers)}")
+    writers[extension](meshes, filename)
+    return filename
+
+
+def vector_meshes(elec, mag, origins=None, elec_scale=2, mag_scale=2, from_atom=False,
+                  segments=16, elec_color="red", mag_color="blue"):
+    '''
+       Electric and magnetic arrows of many transitions, as multiple_vectors draws them
+
+       :param elec: Electric vectors
+       :type elec: (N,3) array-like of floats
+
+       :param mag: Magnetic vectors
+       :type mag: (N,3) array-like of floats
+
+       :param origins: Start of the arrows, defaults to the coordinate origin
+       :type origins: (3,) or (N,3) array-like of floats, optional
+
+       :param from_atom: Draw the scaled vectors from the origins, as for 'sele'
+       :type from_atom: Boolean, optional - default False
+
+       :param segments: Number of sides of the arrows
+       :type segments: Int, optional - default 16
+
+       :return: Electric and magnetic meshes, N arrows each
+       :rtype: Tuple of Mesh
+    '''
+    origins = [0.0, 0.0, 0.0] if origins is None else origins
+    return tuple(arrow_mesh(Arrows.from_vectors(origins, ends, color_rgb(color), scaling=scale,
+                                                from_atom=from_atom), segments, kind)
+                 for kind, ends, scale, color in (('electric', elec, elec_scale, elec_color),
+                                                  ('magnetic', mag, mag_scale, mag_color)))
+
+
+def stilde_spheres(stilde, scale=1.0, pos_color="blue", neg_color="orange", alpha=.5, segments=16):
+    '''
+       Spheres of radius scale*|S| at the origin, colored by the sign of S as sphere_field does
+
+       :param stilde: S-tilde of every transition
+       :type stilde: Array-like of floats
+
+       :return: One sphere per transition
+       :rtype: Mesh
+    '''
+    stilde = np.asarray(stilde, dtype=float).ravel()
+    return sphere_mesh(np.zeros((len(stilde), 3)), scale*np.abs(stilde),
+                       sign_colors(stilde, color_rgb(pos_color), color_rgb(neg_color)), alpha,
+                       segments, 'stilde')
+
+
+def export_table(table, rows, output=None, outdir=None, fmt='glb', elec_scale=2, mag_scale=2,
+                 segments=16, spheres=0.0):
+    '''
+       Writes the arrows of `rows` of an S-tilde table to one file, or with
+       `outdir` to one file per transition named after its row and orbitals
+
+       :param table: Table from loadCSV
+       :type table: Dataframe, ColumnTable or StildeTable
+
+       :param rows: Row positions
+       :type rows: Array-like of ints
+
+       :param spheres: Radius of an S-tilde sphere (see stilde_spheres) with |S| = 1, 0 for no spheres
+       :type spheres: Float, optional - default 0
+
+       :return: Paths written
+       :rtype: List of strings
+    '''
+    rows = np.asarray(rows, dtype=int)
+    elec, mag = row_vectors(table, rows)
+    meshes = list(vector_meshes(elec, mag, None, elec_scale, mag_scale, segments=segments))
+    if spheres:
+        meshes.append(stilde_spheres(np.asarray(table['S'])[rows], spheres, segments=segments))
+    if outdir is None:
+        return [write(meshes, output)]
+
+    if 'nocc' in table.columns and 'nvirt' in table.columns:
+        nocc, nvirt = np.asarray(table['nocc'])[rows], np.asarray(table['nvirt'])[rows]
+        names = [f"{row}_{i}_{a}" for row, i, a in zip(rows, nocc, nvirt)]
+    else:
+        names = [str(row) for row in rows]
+    os.makedirs(outdir, exist_ok=True)
+    paths = []
+    ##Every mesh holds one instance per row, the files get one of each
+    parts = zip(*(mesh.split(len(rows), [f"{mesh.name}{n}" for n in names]) for mesh in meshes))
+    for name, part in zip(names, parts):
+        paths.append(write(list(part), os.path.join(outdir, f"stilde_{name}.{fmt}")))
+    return paths
+
+
+if __name__=="__main__":
+    parser=ap.ArgumentParser()
+    parser.add_argument('file',help="Sorted stilde CSV file, as written by sorting.py")
+    parser.add_argument('-o','--output',help="Output file, .obj, .ply or .glb",default="vectors.glb")
+    parser.add_argument('-n','--number',help="Number of rows exported, from the top",type=int,default=20)
+    parser.add_argument('--split',help="Write one file per transition into --outdir",action='store_true')
+    parser.add_argument('--outdir',help="Output directory in --split mode",default="./Meshes")
+    parser.add_argument('-f','--format',help="File format in --split mode",choices=['obj','ply','glb'],
+                        default='glb')
+    parser.add_argument('--elec-scale',help="Scaling factor of the electric vectors",type=float,default=2)
+    parser.add_argument('--mag-scale',help="Scaling factor of the magnetic vectors",type=float,default=2)
+    parser.add_argument('--segments',help="Number of sides of the arrows",type=int,default=16)
+    parser.add_argument('--spheres',help="Also draw S-tilde spheres, of this radius for |S| = 1",
+                        type=float,default=0.0)
+    args=parser.parse_args()
+
+    table = load_table(args.file)
+    rows = np.arange(min(args.number, len(table)))
+    paths = export_table(table, rows, args.output, args.outdir if args.split else None, args.format,
+                         args.elec_scale, args.mag_scale, args.segments, args.spheres)
+    print(f"Wrote {len(rows)} transitions to {paths[0] if len(paths) == 1 else args.outdir}")
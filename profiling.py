@@ -0,0 +1,267 @@
+'''
+Opt-in profiling of the S-tilde PyMOL commands.
+
+Once enabled (stilde_profile_enable in PyMOL, or STILDE_PROFILE=1, true or
+yes in the environment before the first command is loaded) every public function of
+generate_arrow and pymol_functions, and the PyMOL calls that create objects,
+are wrapped with timers. Commands can also mark sub-phases such as parse,
+compute and emit with the phase context manager; phases are recorded as
+*command:phase*. stilde_profile prints call counts, cumulative time and
+percentiles, and can dump them to JSON. Nothing is timed while disabled.
+'''
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+import numpy as np
+from pymol import cmd
+
+enabled = False
+
+##Number of call durations kept per name for the percentiles
+history = 10000
+
+##Modules whose functions are wrapped, and the PyMOL calls timed as cmd.*
+modules = ('generate_arrow', 'pymol_functions')
+pymol_calls = ('load_cgo', 'pseudoatom', 'group', 'color', 'set', 'delete', 'load',
+               'get_color_tuple', 'get_coords')
+
+stats = {}
+_local = threading.local()
+_patched = []
+##Modules whose functions are currently wrapped
+_wrapped = set()
+##STILDE_PROFILE is only applied once, so stilde_profile_enable 0 keeps profiling off
+_requested = os.environ.get('STILDE_PROFILE', '').strip().lower() in ('1', 'true', 'yes')
+
+
+class Timer:
+    '''
+       Call count, cumulative time and recent durations of one function or phase
+    '''
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.times = deque(maxlen=history)
+
+    def add(self, seconds):
+        self.calls += 1
+        self.total += seconds
+        self.times.append(seconds)
+
+    def summary(self):
+        '''
+           :return: Calls, total/mean/max seconds and 50th/90th/99th percentiles
+           :rtype: Dict
+        '''
+        p50, p90, p99 = np.percentile(self.times, [50, 90, 99]) if self.times else (0.0, 0.0, 0.0)
+        return {'calls': self.calls, 'total': self.total, 'mean': self.total/max(self.calls, 1),
+                'p50': float(p50), 'p90': float(p90), 'p99': float(p99),
+                'max': max(self.times, default=0.0)}
+
+
+def _stack():
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+
+def record(name, seconds):
+    '''Adds one duration to the timer called `name`'''
+    if name not in stats:
+        stats[name] = Timer()
+    stats[name].add(seconds)
+
+
+@contextmanager
+def phase(name):
+    '''
+       Times the enclosed block as a sub-phase of the innermost running command
+
+       :param name: Phase name, e.g. parse, compute or emit
+       :type name: String
+    '''
+    if not enabled:
+        yield
+        return
+    stack = _stack()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(f"{stack[-1] if stack else '-'}:{name}", time.perf_counter() - start)
+
+
+def instrument(function, name=None):
+    '''
+       :param function: Function to time
+       :type function: Function
+
+       :param name: Name it is recorded under, defaults to the function name
+       :type name: String, optional
+
+       :return: Wrapper recording every call of `function`
+       :rtype: Function
+    '''
+    name = name or function.__name__
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        stack = _stack()
+        stack.append(name)
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            record(name, time.perf_counter() - start)
+            stack.pop()
+    return wrapper
+
+
+def _patch(namespace, attribute, wrapper):
+    _patched.append((namespace, attribute, getattr(namespace, attribute)))
+    setattr(namespace, attribute, wrapper)
+
+
+def instrument_loaded():
+    '''
+       Wraps the functions of the `modules` imported since profiling was enabled
+
+       Every module attribute referring to a wrapped function is replaced, so
+       calls between the modules are timed too. Commands registered with
+       cmd.extend are registered again with their wrapper. stilde_plugin calls
+       this after importing a module on first use of one of its commands.
+
+       :return: None
+    '''
+    loaded = [sys.modules[m] for m in modules if m in sys.modules]
+    for module in loaded:
+        if module.__name__ in _wrapped:
+            continue
+        for attribute, value in list(vars(module).items()):
+            if (attribute.startswith('_') or not callable(value) or isinstance(value, type)
+                    or getattr(value, '__module__', None) != module.__name__):
+                continue
+            wrapper = instrument(value)
+            for other in loaded:
+                for name, same in list(vars(other).items()):
+                    if same is value:
+                        _patch(other, name, wrapper)
+            if attribute in getattr(cmd, 'keyword', {}):
+                cmd.extend(attribute, wrapper)
+        _wrapped.add(module.__name__)
+
+
+def enable():
+    '''
+       Wraps the functions of `modules` and the `pymol_calls` of cmd with timers,
+       see instrument_loaded
+
+       :return: None
+    '''
+    global enabled
+    if enabled:
+        return
+    instrument_loaded()
+    for call in pymol_calls:
+        if hasattr(cmd, call):
+            _patch(cmd, call, instrument(getattr(cmd, call), 'cmd.' + call))
+    enabled = True
+
+
+def enable_requested():
+    '''
+       Enables profiling if STILDE_PROFILE asked for it and it has not been applied yet.
+       Called by pymol_functions once loaded and by the stilde_plugin stubs
+
+       :return: None
+    '''
+    global _requested
+    if _requested:
+        _requested = False
+        enable()
+
+
+def disable():
+    '''
+       Puts back every wrapped function
+
+       :return: None
+    '''
+    global enabled
+    while _patched:
+        namespace, attribute, original = _patched.pop()
+        setattr(namespace, attribute, original)
+        if attribute in getattr(cmd, 'keyword', {}) and namespace is not cmd:
+            cmd.extend(attribute, original)
+    _wrapped.clear()
+    enabled = False
+
+
+def reset():
+    '''Forgets all recorded timings'''
+    stats.clear()
+
+
+def report():
+    '''
+       :return: Summary of every timer, keyed by name
+       :rtype: Dict
+    '''
+    return {name: timer.summary() for name, timer in stats.items()}
+
+
+def stilde_profile(filename=None, sort='total', limit=40):
+    '''
+       Prints the recorded timings, slowest first
+
+       :param filename: Also dump the timings to this JSON file
+       :type filename: String, optional
+
+       :param sort: Column to sort by: calls, total, mean, p50, p90, p99 or max
+       :type sort: String, optional - default total
+
+       :param limit: Number of rows printed
+       :type limit: Int, optional - default 40
+
+       :return: Summary of every timer, keyed by name
+       :rtype: Dict
+    '''
+    summary = report()
+    if not enabled and not summary:
+        print("Profiling is off, turn it on with stilde_profile_enable")
+    rows = sorted(summary.items(), key=lambda item: item[1][sort], reverse=True)[:int(limit)]
+    print(f"{'name':40s} {'calls':>8s} {'total (s)':>10s} {'mean (ms)':>10s} "
+          f"{'p50 (ms)':>9s} {'p90 (ms)':>9s} {'p99 (ms)':>9s}")
+    for name, s in rows:
+        print(f"{name:40s} {s['calls']:8d} {s['total']:10.4f} {1e3*s['mean']:10.3f} "
+              f"{1e3*s['p50']:9.3f} {1e3*s['p90']:9.3f} {1e3*s['p99']:9.3f}")
+    if filename:
+        with open(filename, 'w') as f:
+            json.dump(summary, f, indent=2)
+    return summary
+cmd.extend("stilde_profile", stilde_profile)
+
+
+def stilde_profile_reset():
+    '''Clears the timings collected so far'''
+    reset()
+cmd.extend("stilde_profile_reset", stilde_profile_reset)
+
+
+def stilde_profile_enable(on=1):
+    '''
+       Turns profiling on (1) or off (0)
+
+       :param on: 1 to wrap the commands with timers, 0 to remove them
+       :type on: Int, optional - default 1
+    '''
+    if int(on):
+        enable()
+    else:
+        disable()
+cmd.extend("stilde_profile_enable", stilde_profile_enable)
@@ -1,23 +1,62 @@
 from pymol import cmd,preset,util,cgo
-import pandas as pd
+import ast
 import numpy as np
+import threading
+from collections import OrderedDict
 from copy import deepcopy
+##str_to_list lives in generate_arrow so cgo_arrows can parse its arguments too
+from generate_arrow import cgo_arrow, cgo_arrows, arrow_rows, str_to_list
+##The table modules (column_cache, stilde_table, vector_store, mesh_export) bring in
+##pandas; they are imported inside the functions using them, so the drawing commands
+##load without it when stilde_plugin imports this module on first use
+from scene_budget import budget
+##The polar plot math lives in geometry, it is still reachable from here
+from geometry import (calc_r, convert_cartesian, polar_to_cartesian, direction_table, polar_vertices,
+                      adaptive_polar_vertices, axes_arrows, sign_colors, polar_surface, polar_lines)
+import profiling
+import cgo_cache
+from profiling import phase
 
 #Keep track of times elec_mag is called
 count=1
 
-def loadCSV(filename):
+#Finished polar plot lobes, least recently used first (see polar_lobes)
+polar_cache=OrderedDict()
+polar_cache_size=32
+polar_cache_bytes=256*2**20
+##Background jobs use polar_cache from worker threads
+polar_cache_lock=threading.Lock()
+
+def loadCSV(filename, cache=True, compact=False, float32=False, lazy=False):
     """
     Loads and display a CSV file via Panda dataframe
 
+    The result is a full Dataframe unless lazy or compact is set: scripts
+    written against loadCSV use the pandas API (iloc, sort_values, groupby,
+    ...), which the lazy column_cache.ColumnTable does not offer. Reading
+    through the cache still skips the text parsing; lazy=1 also skips
+    reading columns that are never used.
+
     :param filename: Name of the file to be opened
     :type filename: string
 
+    :param cache: Read the file through its binary column cache (see column_cache), defaults to True.
+                  The cache is written next to the file, or into STILDE_COLUMN_CACHE if set
+    :type cache: Boolean
+
+    :param compact: Return the vectors as a stilde_table.StildeTable, defaults to False
+    :type compact: Boolean
+
+    :param float32: Keep a compact table in single precision, defaults to False
+    :type float32: Boolean
+
+    :param lazy: Return the memory mapped column_cache.ColumnTable instead of a Dataframe, defaults to False
+    :type lazy: Boolean
 
     :return: Dataframe of the CSV opened
-    :rtype: Dataframe
+    :rtype: Dataframe, ColumnTable when lazy, or StildeTable when compact
    """
-    data = pd.read_csv(filename)
+    data = read_table(filename, cache, compact, float32, lazy)
     if data.empty:
         print("Dataframe is empty")
     else:
@@ -25,6 +64,28 @@ def loadCSV(filename):
     return data
 cmd.extend("loadCSV", loadCSV)
 
+def read_table(filename, cache=True, compact=False, float32=False, lazy=False, progress=None):
+    """
+    Reads a CSV file the way loadCSV does, without printing it
+
+    :param progress: Called with the fraction of the file parsed, see background.progress
+    :type progress: Function, optional
+
+    :return: Table of the CSV opened
+    :rtype: Dataframe, column_cache.ColumnTable or StildeTable
+    """
+    from column_cache import load_table, read_csv_chunks, ColumnTable
+    from stilde_table import StildeTable
+    with phase('parse'):
+        if int(cache):
+            data = load_table(filename, reader=lambda name: read_csv_chunks(name, progress))
+        else:
+            data = read_csv_chunks(filename, progress)
+        if int(compact):
+            data = StildeTable.from_table(data, float32=bool(int(float32)))
+        elif isinstance(data, ColumnTable) and not int(lazy):
+            data = data.to_frame()
+    return data
 
 def newLoad(filename):
 
@@ -45,24 +106,6 @@ def newLoad(filename):
 cmd.extend("newLoad",newLoad)
 
 
-def str_to_list(string,internalType="float"):
-    """
-        :param string: Object to be converted to list of floats
-        :type string: string, float, or np.ndarray
-
-        :param internalType: String indicating the type of list to be converted to
-        :type internalType: string (,optional -) defaults to float
-
-        :return: Converted list of objectss
-        :rtype: List of floats
-    """
-    if type(string) in (list,np.ndarray):
-       return list(string)
-    newList=string.strip('][').split(',')
-    if internalType=="float":
-       newList=[float(n) for n in newList]
-    return newList
-
 def elec_mag(elec_end,mag_end,elec_scale=7, mag_scale=7, 
              elec_start=[0.0,0.0,0.0],mag_start=[0.0,0.0,0.0],
              use_lab=True):
@@ -97,8 +140,8 @@ def elec_mag(elec_end,mag_end,elec_scale=7, mag_scale=7,
         elec_start=str_to_list(elec_start)
     #Use count to make a unique name for each arrow object,
     #allows multiple elec_mags to be spawned
-    cgo_arrow(origin=elec_start,endpoint=temp_elec_end,type="electric",name=str(count), 
-              scaling=elec_scale,use_lab=use_lab)
+    elec_obj=cgo_arrow(origin=elec_start,endpoint=temp_elec_end,type="electric",name=str(count), 
+                       scaling=elec_scale,use_lab=use_lab)
 
     mag_end=str_to_list(mag_end)
     temp_mag_end = mag_end.copy()
@@ -106,9 +149,14 @@ def elec_mag(elec_end,mag_end,elec_scale=7, mag_scale=7,
         mag_start=str_to_list(mag_start)
 
     
-    cgo_arrow(origin=mag_start,endpoint=temp_mag_end,type="magnetic",name=str(count),
-              scaling=mag_scale,use_lab=use_lab)
+    mag_obj=cgo_arrow(origin=mag_start,endpoint=temp_mag_end,type="magnetic",name=str(count),
+                      scaling=mag_scale,use_lab=use_lab)
     cmd.group(f"stilde{count}",members=f"electric{count} magnetic{count}")
+    ##Let the scene budget remove old groups once there are too many
+    members=[f"electric{count}",f"magnetic{count}",f"vec_electric{count}",f"vec_magnetic{count}"]
+    if use_lab:
+        members+=[f"lab_electric{count}",f"lab_magnetic{count}"]
+    budget.track(f"stilde{count}",members,[elec_obj,mag_obj],atoms=2 if use_lab else 0)
 
     count+=1
     return
@@ -147,6 +195,254 @@ def elec_mag_fromAtom(elec_end,mag_end, elec_scale=7, mag_scale=7, elec_start='s
 cmd.extend("elec_mag_fromAtom", elec_mag_fromAtom)
 
 
+def elec_mag_batch(elec_ends, mag_ends, elec_scale=7, mag_scale=7,
+                   elec_start=None, mag_start=None, use_lab=False, from_atom=False):
+    """
+    Batch version of elec_mag. Draws every electric/magnetic pair at once as
+    one electric and one magnetic CGO object, grouped under a single stilde group
+
+    :param elec_ends: Endpoints of electric vectors
+    :type elec_ends: (N,3) array-like of floats
+
+    :param mag_ends: Endpoints of magnetic vectors
+    :type mag_ends: (N,3) array-like of floats
+
+    :param elec_scale: Scaling factor for electric vectors
+    :type elec_scale: int, optional - defaults to 7
+
+    :param mag_scale: Scaling factor for magnetic vectors
+    :type mag_scale: int, optional - defaults to 7
+
+    :param elec_start: Starting point(s) for electric vectors, or 'sele' - defaults to coordinate origin [0,0,0]
+    :type elec_start: List of floats or (N,3) array-like
+
+    :param mag_start: Starting point(s) for magnetic vectors, or 'sele' - defaults to coordinate origin [0,0,0]
+    :type mag_start: List of floats or (N,3) array-like
+
+    :param use_lab: Label every arrow with its length. Costs one pseudoatom call per arrow
+    :type use_lab: Boolean, optional - defaults to False
+
+    :param from_atom: The starting points are atom positions, the scaled vectors are drawn from them as with 'sele'
+    :type from_atom: Boolean, optional - defaults to False
+
+    :return: Name of the group holding the arrows
+    :rtype: String
+    """
+    ##Flags typed in PyMOL arrive as strings, "0" must stay off
+    return load_elec_mag(elec_mag_objects(elec_ends, mag_ends, elec_scale, mag_scale,
+                                          elec_start, mag_start, int(from_atom)), int(use_lab))
+cmd.extend("elec_mag_batch", elec_mag_batch)
+
+
+def elec_mag_objects(elec_ends, mag_ends, elec_scale=7, mag_scale=7,
+                     elec_start=None, mag_start=None, from_atom=False, progress=None,
+                     colors=None):
+    """
+    Arrow geometry of elec_mag_batch, see it for the parameters
+
+    :param progress: Called with the fraction of the arrow sets built, see background.progress
+    :type progress: Function, optional
+
+    :param colors: Arrow colors of each kind from generate_arrow.arrow_colors, looked up if not given
+    :type colors: Dict, optional
+
+    :return: Kind (electric/magnetic), CGO object, vector lengths and label positions of both sets
+    :rtype: List of tuples
+    """
+    objects = []
+    for k, (kind, ends, start, scale) in enumerate((("electric", elec_ends, elec_start, elec_scale),
+                                                    ("magnetic", mag_ends, mag_start, mag_scale))):
+        ends = np.array(str_to_list(ends), dtype=float).reshape(-1,3)
+        sele = isinstance(start, str) and start == 'sele'
+        if sele:
+            start = cmd.get_coords('sele', 1)[0]
+        elif start is None:
+            start = [0.0,0.0,0.0]
+        else:
+            start = np.array(str_to_list(start), dtype=float).reshape(-1,3)
+        with phase('compute'):
+            obj, lengths, mids = cgo_arrows(start, ends, type=kind, scaling=scale,
+                                            from_atom=bool(int(from_atom)) or sele,
+                                            colors=None if colors is None else colors[kind])
+        objects.append((kind, obj, lengths, mids))
+        if progress is not None:
+            progress((k+1)/2)
+    return objects
+
+
+def load_elec_mag(objects, use_lab=False):
+    """
+    Loads the arrows from elec_mag_objects as electric{count}/magnetic{count} in a stilde{count} group
+
+    :return: Name of the group holding the arrows
+    :rtype: String
+    """
+    global count
+    name = str(count)
+    members = f"electric{name} magnetic{name}"
+    labels = 0
+    for kind, obj, lengths, mids in objects:
+        with phase('emit'):
+            cmd.load_cgo(obj, kind+name)
+        if use_lab:
+            for k, (length, loc) in enumerate(zip(lengths, mids)):
+                cmd.pseudoatom(f"lab_{kind}{name}", name=f"lab{k}", label=f"{length:.2f}",
+                               pos=list(loc))
+            members += f" lab_{kind}{name}"
+            labels += len(lengths)
+    cmd.group(f"stilde{count}",members=members)
+    budget.track(f"stilde{name}", members.split(), [obj for _, obj, _, _ in objects], atoms=labels)
+
+    count+=1
+    return f"stilde{name}"
+
+
+def atom_vectors(obj, vectors, elec_scale=7, mag_scale=7, key="ID", state=1, use_lab=False):
+    """
+    Draws an electric/magnetic pair from each of many atoms of `obj` in one step.
+    The atom identifiers and coordinates are fetched once for the whole object
+    and the arrows are placed with elec_mag_batch, instead of one 'sele' per atom
+
+    :param obj: Object holding the atoms
+    :type obj: String
+
+    :param vectors: Atom identifier mapped to its (electric, magnetic) vectors, a table with
+                    an atom column and Electric/Magnetic X/Y/Z columns, or a .csv of that table.
+                    Strings starting with { are read as a dict
+    :type vectors: Dict, Dataframe or String
+
+    :param elec_scale: Scaling factor for electric vectors
+    :type elec_scale: int, optional - defaults to 7
+
+    :param mag_scale: Scaling factor for magnetic vectors
+    :type mag_scale: int, optional - defaults to 7
+
+    :param key: Atom property the identifiers refer to, e.g. ID, rank, index or name. Every
+                identifier must match a single atom of `obj`, so a name shared by several atoms
+                raises a KeyError
+    :type key: String, optional - defaults to ID
+
+    :param state: State of `obj` the coordinates are taken from
+    :type state: Int, optional - defaults to 1
+
+    :param use_lab: Label every arrow with its length
+    :type use_lab: Boolean, optional - defaults to False
+
+    :return: Name of the group holding the arrows
+    :rtype: String
+    """
+    ##A dict typed in PyMOL arrives as its text, anything else is a path
+    if isinstance(vectors, str) and vectors.strip().startswith('{'):
+        vectors = ast.literal_eval(vectors.strip())
+    elif isinstance(vectors, str):
+        from column_cache import load_table
+        vectors = load_table(vectors)
+    if isinstance(vectors, dict):
+        atoms = list(vectors)
+        vecs = np.array([np.ravel(vectors[atom]) for atom in atoms], dtype=float).reshape(-1,6)
+        elecVecs, magVecs = vecs[:,:3], vecs[:,3:]
+    else:
+        from stilde_table import row_vectors
+        atoms = np.asarray(vectors['atom'])
+        elecVecs, magVecs = row_vectors(vectors, np.arange(len(atoms)))
+
+    ##One pass over the object for the identifiers and one for the coordinates,
+    ##both in the same atom order
+    ids = []
+    cmd.iterate(obj, f"ids.append({key})", space={'ids': ids})
+    coords = cmd.get_coords(obj, int(state))
+    if coords is None or len(ids) != len(coords):
+        raise KeyError(f"No coordinates for the atoms of {obj} in state {state}")
+
+    with phase('compute'):
+        kind = str if key in ("name", "elem", "resn", "chain", "segi") else int
+        ids = np.array([kind(i) for i in ids])
+        atoms = np.array([kind(a) for a in atoms])
+        order = np.argsort(ids, kind='stable')
+        first = np.searchsorted(ids, atoms, sorter=order)
+        matches = np.searchsorted(ids, atoms, side='right', sorter=order) - first
+        rows = order[np.minimum(first, len(ids)-1)]
+        missing = matches == 0
+        if missing.any():
+            raise KeyError(f"Atoms not in {obj}: {atoms[missing].tolist()}")
+        ambiguous = matches > 1
+        if ambiguous.any():
+            raise KeyError(f"{key} of several atoms of {obj}: {atoms[ambiguous].tolist()}, "
+                           f"use a unique key such as ID or index")
+        starts = coords[rows]
+
+    return elec_mag_batch(elecVecs, magVecs, elec_scale=elec_scale, mag_scale=mag_scale,
+                          elec_start=starts, mag_start=starts, use_lab=use_lab, from_atom=True)
+cmd.extend("atom_vectors", atom_vectors)
+
+
+def animate_vectors(elec_frames, mag_frames, elec_scale=7, mag_scale=7, elec_start=None,
+                    mag_start=None, labels=None, name="stilde_anim", movie=1):
+    """
+    Loads sets of S-tilde vectors (one set per frequency, conformer, gauge origin, ...)
+    as the states of a single CGO object, so they can be scrubbed or played as a movie
+
+    :param elec_frames: Electric vectors of every frame, e.g. "[[1,0,0],[0,1,0]]" for two frames
+    :type elec_frames: (F,N,3) or (F,3) array-like of floats, or a string of nested lists
+
+    :param mag_frames: Magnetic vectors of every frame
+    :type mag_frames: (F,N,3) or (F,3) array-like of floats, or a string of nested lists
+
+    :param elec_start: Starting point(s) for electric vectors, the same in every frame - defaults to coordinate origin
+    :type elec_start: List of floats or (N,3) array-like, optional
+
+    :param mag_start: Starting point(s) for magnetic vectors, the same in every frame - defaults to coordinate origin
+    :type mag_start: List of floats or (N,3) array-like, optional
+
+    :param labels: Text shown in each state, e.g. the frequency of the frame
+    :type labels: List of strings, or a comma separated string, optional
+
+    :param name: Name of the CGO object, labels go to {name}_lab
+    :type name: String, optional - defaults to stilde_anim
+
+    :param movie: 1 to set up the movie frames to play through the states
+    :type movie: Int, optional - defaults to 1
+
+    :return: Number of states loaded
+    :rtype: Int
+    """
+    elec_frames = np.asarray(str_to_list(elec_frames), dtype=float)
+    mag_frames = np.asarray(str_to_list(mag_frames), dtype=float)
+    if isinstance(labels, str):
+        labels = [label.strip() for label in str_to_list(labels, internalType="str")]
+    nframes = len(elec_frames)
+    elec_frames = elec_frames.reshape(nframes,-1,3)
+    mag_frames = mag_frames.reshape(nframes,-1,3)
+
+    ##Geometry of every arrow of every frame in one pass per kind
+    objs = []
+    with phase('compute'):
+        for kind, frames, start, scale in (("electric", elec_frames, elec_start, elec_scale),
+                                           ("magnetic", mag_frames, mag_start, mag_scale)):
+            start = [0.0,0.0,0.0] if start is None else np.array(str_to_list(start), dtype=float)
+            start = np.broadcast_to(np.reshape(start,(-1,3)), frames.shape).reshape(-1,3)
+            obj, _, _ = cgo_arrows(start, frames.reshape(-1,3), type=kind, scaling=scale)
+            objs.append((obj, 31*frames.shape[1]))
+
+    with phase('emit'):
+        cmd.delete(name)
+        cmd.delete(f"{name}_lab")
+        for frame in range(nframes):
+            obj = []
+            for kind_obj, size in objs:
+                obj += kind_obj[size*frame:size*(frame+1)]
+            cmd.load_cgo(obj, name, state=frame+1)
+            if labels is not None:
+                cmd.pseudoatom(f"{name}_lab", name="lab", label=str(labels[frame]),
+                               pos=[0.0,0.0,0.0], state=frame+1)
+        if int(movie):
+            cmd.mset(f"1 -{nframes}")
+    budget.track(name, [f"{name}_lab"] if labels is not None else [], [obj for obj, _ in objs],
+                 atoms=nframes if labels is not None else 0)
+    return nframes
+cmd.extend("animate_vectors", animate_vectors)
+
+
 def select_vectors(index, df, fromAtom=False):
     """
     Pulls vector data from dataframe based on a given index. Automatically calls elec_mag to draw arrows
@@ -155,7 +451,7 @@ def select_vectors(index, df, fromAtom=False):
     :type index: Int
 
     :param df: Dataframe containing vector data loaded previously
-    :type df: Dataframe
+    :type df: Dataframe, ColumnTable or StildeTable
 
     :param fromAtom: Boolean indicating whether or not the vector will be drawn using an atom as origin, defaults to False
     :type fromAtom: Boolean
@@ -163,20 +459,21 @@ def select_vectors(index, df, fromAtom=False):
     :return: List of lists containing electric vector at index 0, magnetic vector at index 1
     :rtype: List of ints
     """
+    from stilde_table import row_vectors
     index = int(index)
-    cart=['X','Y','Z']
-    ##Uses list comprehension to express more succinctly
-    elecVec = [df.iloc[index]['Electric'+x] for x in cart]
-    magVec = [df.iloc[index]['Magnetic'+x] for x in cart]
+    ##Works for Dataframes, cached ColumnTables and StildeTables
+    elecVecs, magVecs = row_vectors(df, [index])
+    elecVec = [float(v) for v in elecVecs[0]]
+    magVec = [float(v) for v in magVecs[0]]
     vecList = [elecVec, magVec]
-    if fromAtom is False:
+    if not int(fromAtom):
         elec_mag(elecVec, magVec,elec_scale=2,mag_scale=2)
     else:
         elec_mag_fromAtom(elecVec,magVec,elec_scale=2,mag_scale=2)
     return vecList
 cmd.extend("select_vectors",select_vectors)
 
-def multiple_vectors(indices, df, fromAtom=False):
+def multiple_vectors(indices, df, fromAtom=False, batch=False):
 
     """
     Similar functionality to select_vectors, but calls select_vectors in a loop
@@ -186,18 +483,68 @@ def multiple_vectors(indices, df, fromAtom=False):
     :type index: List of ints
 
     :param df: Dataframe containing vector data loaded previously
-    :type df: Dataframe
+    :type df: Dataframe, ColumnTable or StildeTable
 
     :param fromAtom: Boolean indicating whether or not the vector will be drawn using an atom as origin, defaults to False
     :type fromAtom: Boolean
+
+    :param batch: Draw all vectors at once with elec_mag_batch instead of one group per index, defaults to False
+    :type batch: Boolean
     :return: None
     """
 
+    if isinstance(indices, str):
+        indices = str_to_list(indices, internalType="int")
+    if int(batch):
+        from stilde_table import row_vectors
+        indices = np.asarray(list(indices), dtype=int)
+        elecVecs, magVecs = row_vectors(df, indices)
+        start = 'sele' if int(fromAtom) else None
+        elec_mag_batch(elecVecs, magVecs, elec_scale=2, mag_scale=2,
+                       elec_start=start, mag_start=start)
+        return
+
     for index in indices:
         vec = select_vectors(index, df, fromAtom)
 
 cmd.extend("multiple_vectors", multiple_vectors)
 
+def export_vectors(filename, indices, df, fromAtom=False, segments=16):
+    """
+    Writes the arrows multiple_vectors draws to an .obj, .ply or .glb file instead,
+    see mesh_export
+
+    :param filename: Path of the file, its extension picks the format
+    :type filename: String
+
+    :param indices: Indices of dataframe where vector data will be selected from
+    :type indices: List of ints
+
+    :param df: Dataframe containing vector data loaded previously
+    :type df: Dataframe, ColumnTable or StildeTable
+
+    :param fromAtom: Draw the vectors from the 'sele' atom, defaults to False
+    :type fromAtom: Boolean
+
+    :param segments: Number of sides of the arrows, defaults to 16
+    :type segments: Int
+
+    :return: filename
+    :rtype: String
+    """
+    if isinstance(indices, str):
+        indices = str_to_list(indices, internalType="int")
+    import mesh_export
+    from stilde_table import row_vectors
+    indices = np.asarray(list(indices), dtype=int)
+    elecVecs, magVecs = row_vectors(df, indices)
+    fromAtom = bool(int(fromAtom))
+    start = cmd.get_coords('sele', 1)[0] if fromAtom else None
+    meshes = mesh_export.vector_meshes(elecVecs, magVecs, start, 2, 2, fromAtom, int(segments),
+                                       cmd.get_color_tuple('red'), cmd.get_color_tuple('blue'))
+    return mesh_export.write(meshes, filename)
+cmd.extend("export_vectors", export_vectors)
+
 def createSphere(pos, radius=1.0, color = 'Yellow',transparency=.5):
 
     """
@@ -226,27 +573,74 @@ def createSphere(pos, radius=1.0, color = 'Yellow',transparency=.5):
     cmd.set("cgo_transparency",value=transparency,selection="s1")
 cmd.extend("createSphere",createSphere)
 
+
+##(largest count, cgo_sphere_quality) used by sphere_field, from smooth to coarse
+sphere_qualities = ((50, 4), (500, 3), (5000, 2), (50000, 1))
+
+def sphere_field(positions, stilde, scale=1.0, pos_color="Blue", neg_color="Orange",
+                 transparency=.5, quality=None, name="stilde_spheres"):
+    """
+    Batch version of createSphere. Draws a sphere of radius scale*|S| at every position,
+    colored by the sign of S, as one CGO object
+
+    :param positions: x,y,z coordinates of the spheres
+    :type positions: (N,3) array-like of floats
+
+    :param stilde: S-tilde value of each sphere
+    :type stilde: Array-like of floats
+
+    :param scale: Radius of a sphere with |S| = 1
+    :type scale: Float, optional - defaults to 1.0
+
+    :param pos_color: Color of spheres with positive S
+    :type pos_color: String, optional - defaults to Blue
+
+    :param neg_color: Color of spheres with negative S
+    :type neg_color: String, optional - defaults to Orange
+
+    :param transparency: transparency value of the spheres
+    :type transparency: Float, optional - defaults to .5
+
+    :param quality: cgo_sphere_quality of the object, defaults to a value chosen from the number of spheres
+    :type quality: Int, optional
+
+    :param name: Name of the CGO object
+    :type name: String, optional - defaults to stilde_spheres
+
+    :return: Number of spheres drawn
+    :rtype: Int
+    """
+    with phase('compute'):
+        positions = np.array(str_to_list(positions), dtype=float).reshape(-1,3)
+        stilde = np.array(str_to_list(stilde), dtype=float).ravel()
+        colors = sign_colors(stilde, cmd.get_color_tuple(pos_color), cmd.get_color_tuple(neg_color))
+        ##One COLOR r g b SPHERE x y z radius row per sphere
+        obj = np.empty((len(stilde), 9))
+        obj[:,0] = cgo.COLOR
+        obj[:,1:4] = colors
+        obj[:,4] = cgo.SPHERE
+        obj[:,5:8] = positions
+        obj[:,8] = float(scale)*np.abs(stilde)
+    if quality is None:
+        quality = next((q for most, q in sphere_qualities if len(stilde) <= most), 0)
+
+    with phase('emit'):
+        cmd.delete(name)
+        cmd.load_cgo(obj.ravel().tolist(), name)
+        cmd.set("cgo_sphere_quality", int(quality), name)
+        cmd.set("cgo_transparency", transparency, name)
+    budget.track(name, objs=[obj.ravel()], kind='spheres')
+    return len(stilde)
+cmd.extend("sphere_field", sphere_field)
+
 def checkVecs(pairs,gauge="VE"):
     """Use gaugeComp to check given pairs
 
+    The vector files are read through vector_store, so they are only parsed
+    the first time and all pairs are looked up in one batch.
     """
-    vectors0=pd.read_csv(f"vector_{gauge}0N",delim_whitespace=True, header=None)    
-    vectors0.set_index([0,1],inplace=True)    
-    vectors1=pd.read_csv(f"vector_{gauge}1N",delim_whitespace=True, header=None)    
-    vectors1.set_index([0,1],inplace=True)
-
-    for i,a in pairs:
-        vecs0=np.array(vectors0.loc[i,a])
-        elec0,mag0=vecs0[1:4],vecs0[4:]
-        vecs1=np.array(vectors1.loc[i,a])
-        elec1,mag1=vecs1[1:4],vecs1[4:]
-        if "E" in gauge:
-            elec1-=elec0
-            elec1*=-1.0
-        elif "M" in gauge:
-            mag1-=mag0
-            mag1*=-1.0
-        
+    elec,mag=gauge_vectors(pairs,gauge)
+    for elec1,mag1 in zip(elec,mag):
         result={gauge:[elec1,mag1]}
         gaugeComp(result)
 cmd.extend("checkVecs",checkVecs)
@@ -289,8 +683,146 @@ def gaugeComp(vecs,freq=0.077357,max_len=4.0,use_lab=False):
     return
 cmd.extend("gaugeComp",gaugeComp)
 
+def gauge_vectors(pairs,gauge="VE",progress=None):
+    """Electric/magnetic vectors of many pairs for one gauge
+
+    Reads the vector_{gauge}0N and vector_{gauge}1N files like checkVecs,
+    taking the difference of the electric (VE) or magnetic (VM) vectors.
+
+    :param pairs: (occupied, virtual) pairs to look up
+    :type pairs: List of tuples of ints
+
+    :param gauge: Gauge of the vector files
+    :type gauge: String, optional - defaults to VE
+
+    :param progress: Called with the fraction of the two files read, see background.progress
+    :type progress: Function, optional
+
+    :return: Electric and magnetic vectors, one row per pair
+    :rtype: Tuple of (M,3) np.ndarray
+    """
+    from vector_store import VectorStore
+    with phase('parse'):
+        if progress is None:
+            progress=lambda fraction: None
+        vectors0=VectorStore(f"vector_{gauge}0N",lambda f: progress(f/2)).lookup(pairs)
+        progress(0.5)
+        vectors1=VectorStore(f"vector_{gauge}1N",lambda f: progress(.5+f/2)).lookup(pairs)
+        progress(1.0)
+    elec0,mag0=vectors0[:,1:4],vectors0[:,4:]
+    elec1,mag1=vectors1[:,1:4],vectors1[:,4:]
+    if "E" in gauge:
+        elec1=elec0-elec1
+    elif "M" in gauge:
+        mag1=mag0-mag1
+    return elec1,mag1
+
+def gauge_rescale(vecs,freq=0.077357):
+    """Apply the (1/freq)^(0.5) factor of gaugeComp to the VM/VE gauges
+
+    :param vecs: Gauge name mapped to electric and magnetic vectors
+    :type vecs: Dict of [(M,3) array-like, (M,3) array-like]
+
+    :return: Gauge name mapped to rescaled electric and magnetic arrays
+    :rtype: Dict of [(M,3) np.ndarray, (M,3) np.ndarray]
+    """
+    inv_freq=(1.0/freq)**.5
+    scaled={}
+    for gauge in vecs:
+        factor=inv_freq if gauge in ('VM','VE') else 1.0
+        scaled[gauge]=[np.asarray(vecs[gauge][0],dtype=float).reshape(-1,3)*factor,
+                       np.asarray(vecs[gauge][1],dtype=float).reshape(-1,3)*factor]
+    return scaled
+
+def gauge_table(vecs,pairs=None,freq=0.077357):
+    """Compares stilde vectors of many pairs between gauges
+
+    Batch version of the numbers printed by gaugeComp: every gauge holds an
+    (M,3) electric and an (M,3) magnetic array, one row per pair.
+
+    :param vecs: Gauge name mapped to electric and magnetic vectors
+    :type vecs: Dict of [(M,3) array-like, (M,3) array-like]
+
+    :param pairs: (occupied, virtual) pairs the rows belong to, added as nocc/nvirt columns
+    :type pairs: List of tuples of ints, optional
+
+    :param freq: Frequency used to rescale the VM/VE gauges
+    :type freq: Float, optional - defaults to 0.077357
+
+    :return: One row per pair and gauge with S, magnitudes and angle (degrees)
+    :rtype: Dataframe
+    """
+    import pandas as pd
+    frames=[]
+    for gauge,(elec,mag) in gauge_rescale(vecs,freq).items():
+        lengths_E=np.linalg.norm(elec,axis=1)
+        lengths_M=np.linalg.norm(mag,axis=1)
+        stildes=np.einsum('ij,ij->i',elec,mag)
+        ang=np.degrees(np.arccos(np.clip(stildes/(lengths_E*lengths_M),-1.0,1.0)))
+        frame=pd.DataFrame({'pair':np.arange(len(elec)),'gauge':gauge,'S':stildes,
+                            'Electric Magnitude':lengths_E,'Magnetic Magnitude':lengths_M,
+                            'Angle':ang})
+        if pairs is not None:
+            pairs_arr=np.asarray(pairs,dtype=int).reshape(-1,2)
+            frame.insert(1,'nocc',pairs_arr[:,0])
+            frame.insert(2,'nvirt',pairs_arr[:,1])
+        frames.append(frame)
+    return pd.concat(frames,ignore_index=True).sort_values(['pair','gauge'],kind='stable',
+                                                           ignore_index=True)
+
+def gaugeCompBatch(vecs,pairs=None,freq=0.077357,max_len=4.0,draw=None,use_lab=False):
+    """Compares stilde vectors of many pairs between gauges, drawing only a subset
+
+    Computes the gauge_table for all pairs. Pairs listed in draw (row
+    positions) are drawn like gaugeComp, rescaled relative to the longest
+    vector of that pair over all gauges, with one elec_mag_batch per gauge.
+
+    :param draw: Positions of the pairs to draw, defaults to drawing nothing
+    :type draw: List of ints, optional
+
+    :return: Table from gauge_table
+    :rtype: Dataframe
+    """
+    table=gauge_table(vecs,pairs,freq)
+    if draw is None or len(draw)==0:
+        return table
+
+    draw=np.asarray(draw,dtype=int)
+    scaled=gauge_rescale(vecs,freq)
+    ##Determine longest elec/magnetic of each pair, scale relative to these
+    max_E=np.max([np.linalg.norm(scaled[gauge][0][draw],axis=1) for gauge in scaled],axis=0)
+    max_M=np.max([np.linalg.norm(scaled[gauge][1][draw],axis=1) for gauge in scaled],axis=0)
+    for gauge in scaled:
+        elec=scaled[gauge][0][draw]*(max_len/max_E)[:,None]
+        mag=scaled[gauge][1][draw]*(max_len/max_M)[:,None]
+        elec_mag_batch(elec,mag,elec_scale=1,mag_scale=1,use_lab=use_lab)
+    return table
+cmd.extend("gaugeCompBatch",gaugeCompBatch)
+
+def checkVecsBatch(pairs,gauges=("VE","VM"),freq=0.077357,draw=None):
+    """Screen many pairs for gauge invariance with gaugeCompBatch
+
+    :param pairs: (occupied, virtual) pairs to check
+    :type pairs: List of tuples of ints
+
+    :param gauges: Gauges whose vector_{gauge}0N/1N files are read
+    :type gauges: List of strings or space separated string, optional - defaults to VE and VM
+
+    :param draw: Positions of the pairs to draw, defaults to drawing nothing
+    :type draw: List of ints, optional
+
+    :return: Table from gauge_table
+    :rtype: Dataframe
+    """
+    if isinstance(gauges,str):
+        gauges=gauges.split()
+    vecs={gauge:gauge_vectors(pairs,gauge) for gauge in gauges}
+    return gaugeCompBatch(vecs,pairs,freq,draw=draw)
+cmd.extend("checkVecsBatch",checkVecsBatch)
+
 def polar_plot(tensor=None, Ntheta=150, Nphi=150, origin=None,
-               scale=1.0, pos_color="Blue", neg_color="Orange",style="loop"):
+               scale=1.0, pos_color="Blue", neg_color="Orange",style="loop",
+               max_points=1000000, adaptive=0, tol=0.01, max_level=4):
     """Generate a polar plot from the passed in tensor
 
     Ntheta/Nphi give how many increments of theta/phi to sample.
@@ -302,40 +834,41 @@ def polar_plot(tensor=None, Ntheta=150, Nphi=150, origin=None,
     ('points' just plots vertices, 
      'lines' draws small segments between pairs of points,
      'loops' draws a continuous line from the first to last point)
+
+    The whole grid is evaluated with NumPy (see polar_vertices), at most
+    max_points grid points at a time.
+
+    adaptive=1 starts from a grid 2**max_level times coarser than Ntheta/Nphi
+    and only refines it where r changes sign or the surface deviates from a
+    straight chord by more than tol (relative to the largest r), see
+    adaptive_polar_vertices.
+
+    Lobes are cached (see polar_lobes), so plotting the same tensor again
+    with another scale or origin skips the evaluation. With cgo_cache turned
+    on, the lobes are also kept on disk and shared between sessions.
+    """
+    obj_pos, obj_neg = polar_plot_objects(tensor, Ntheta, Nphi, origin, scale, style,
+                                          max_points, adaptive, tol, max_level)
+    load_polar_plot(obj_pos, obj_neg, pos_color, neg_color)
+    return
+cmd.extend("polar_plot",polar_plot)
+
+def polar_plot_objects(tensor=None, Ntheta=150, Nphi=150, origin=None, scale=1.0, style="loop",
+                       max_points=1000000, adaptive=0, tol=0.01, max_level=4, progress=None):
+    """CGO lists of the positive and negative lobes drawn by polar_plot
+
+    :param progress: Called with the fraction of the lobes built, see background.progress
+    :type progress: Function, optional
+
+    :return: Positive and negative CGO objects
+    :rtype: Tuple of lists of floats
     """
     if tensor is None:
         tensor = np.array([1.0,1.0,1.0,0.0,0.0,0.0])
+    tensor = np.array(str_to_list(tensor), dtype=float)
     if origin is None:
         origin = [0.0,0.0,0.0]
-
-    pos=[]
-    neg=[]
-
-    theta_increment=(2*np.pi)/Ntheta
-    phi_increment=(np.pi)/Nphi
-
-    # For 'loops' and 'lines' style, alternating
-    # between forward and reverse loops over phi
-    # avoids the next linked vertex being far away.
-    forward = range(Nphi)
-    reverse = range(Nphi,0,-1)
-
-    for i in range(Ntheta): 
-        theta=i*theta_increment
-        if i%2==0:
-            phi_range=forward
-        else:
-            phi_range=reverse
-        for j in phi_range:
-            phi=j*phi_increment
-            r=scale*calc_r(theta,phi,tensor)
-            if r>=0.0:
-                pos.append((r,theta,phi))
-            else:
-                neg.append((np.abs(r),theta,phi))
-    
-    cart_pos = convert_cartesian(pos)        
-    cart_neg = convert_cartesian(neg)        
+    origin = np.array(str_to_list(origin), dtype=float)
 
     if style.lower() == "loop":
         begin = [cgo.BEGIN, cgo.LINE_LOOP]
@@ -347,48 +880,207 @@ def polar_plot(tensor=None, Ntheta=150, Nphi=150, origin=None,
         print("Unknown style, defaulting to 'loop'")
         begin = [cgo.BEGIN, cgo.LINE_LOOP]
 
-    # Write out list of vertices to make lines. For all but the first
-    # and last vertex need to repeat (e.g. v1->v2, v2->v, ...)
-    obj_pos = [[cgo.VERTEX,x[0]+origin[0],x[1]+origin[1],x[2]+origin[2]] for x in cart_pos]
-    #flatten the nested list
-    obj_pos = [vert for verts in obj_pos for vert in verts]
-    #Append group specifiers for CGO object
-    obj_pos = begin + obj_pos + [cgo.END]
-
-    obj_neg = [[cgo.VERTEX,x[0],x[1],x[2]] for x in cart_neg]
-    obj_neg = [vert for verts in obj_neg for vert in verts]
-    obj_neg = begin + obj_neg + [cgo.END]
-
-    cmd.load_cgo(obj_pos,"positive_polar",0)
-    cmd.color(pos_color,selection='positive_polar')
-    cmd.load_cgo(obj_neg,"negative_polar",0)
-    cmd.color(neg_color,selection='negative_polar')
-    return
-cmd.extend("polar_plot",polar_plot)
-
-def calc_r(theta=0.0,phi=0.0,tensor=None):
-    """Evaluate r from the polar function"""
-    sp=np.sin(phi)
-    st=np.sin(theta)
-    cp=np.cos(phi)
-    ct=np.cos(theta)
-
-    r=(tensor[0]*sp**2*ct**2
-      +tensor[1]*sp**2*st**2
-      +tensor[2]*cp**2
-      +2*tensor[3]*st*ct*sp**2
-      +2*tensor[4]*ct*sp*cp
-      +2*tensor[5]*st*sp*cp)
+    with phase('compute'):
+        cart_pos, cart_neg = polar_lobes(tensor, Ntheta, Nphi, scale, max_points,
+                                         adaptive, tol, max_level,
+                                         None if progress is None else lambda f: progress(.8*f))
+        obj_pos = vertex_cgo(begin, cart_pos + origin)
+        if progress is not None:
+            progress(0.9)
+        obj_neg = vertex_cgo(begin, cart_neg + origin)
+    return obj_pos, obj_neg
+
+def load_polar_plot(obj_pos, obj_neg, pos_color="Blue", neg_color="Orange"):
+    """Loads polar_plot_objects as positive_polar and negative_polar"""
+    with phase('emit'):
+        cmd.load_cgo(obj_pos,"positive_polar",0)
+        cmd.color(pos_color,selection='positive_polar')
+        cmd.load_cgo(obj_neg,"negative_polar",0)
+        cmd.color(neg_color,selection='negative_polar')
+    budget.track("positive_polar", ["negative_polar"], [obj_pos, obj_neg], kind='lines')
+
+def polar_plot_batch(tensors, origins=None, Ntheta=150, Nphi=150, scale=1.0,
+                     pos_color="Blue", neg_color="Orange", style="loop", merge=0,
+                     name="polar", max_points=1000000):
+    """Polar plots of many tensors, evaluated together
+
+    r for all tensors and grid points is a single product of the (M,6)
+    tensors with the cached direction_table basis, taken over blocks of
+    tensors holding at most max_points values. Each tensor is drawn at its
+    own origin as objects {name}{k}_positive/{name}{k}_negative, or with
+    merge=1 as one {name}_positive and one {name}_negative object holding
+    a separate line loop per tensor.
+
+    :param tensors: The 6 unique components (xx,yy,zz,xy,xz,yz) of every tensor
+    :type tensors: (M,6) array-like of floats
+
+    :param origins: Displacement of every plot - defaults to the coordinate origin
+    :type origins: (M,3) array-like of floats, optional
+
+    :param merge: 1 to draw all tensors into one object per sign
+    :type merge: Int, optional - default 0
+
+    :param name: Prefix of the object names
+    :type name: String, optional - default polar
+
+    :return: Names of the objects created
+    :rtype: List of strings
+    """
+    tensors = np.array(str_to_list(tensors), dtype=float).reshape(-1,6)
+    if origins is None:
+        origins = np.zeros((len(tensors),3))
+    origins = np.broadcast_to(np.array(str_to_list(origins), dtype=float).reshape(-1,3),
+                              (len(tensors),3))
+    Ntheta = int(Ntheta)
+    Nphi = int(Nphi)
+    scale = float(scale)
+
+    if style.lower() == "points":
+        begin = [cgo.BEGIN, cgo.POINTS]
+    elif style.lower() == "lines":
+        begin = [cgo.BEGIN, cgo.LINES]
+    else:
+        begin = [cgo.BEGIN, cgo.LINE_LOOP]
 
-    return r
-     
-def convert_cartesian(polar_coords):
-    """Convert polar coordinates to Cartesian
+    ##CGO lists of every tensor, positive then negative lobe
+    def build():
+        u, basis = direction_table(Ntheta, Nphi)
+        block = max(1, int(max_points)//len(u))
+        objs = []
+        for first in range(0, len(tensors), block):
+            r = scale*(tensors[first:first+block] @ basis.T)
+            for k, rk in enumerate(r, first):
+                positive = rk>=0.0
+                xyz = np.abs(rk)[:,None]*u + origins[k]
+                objs += [vertex_cgo(begin, xyz[positive]), vertex_cgo(begin, xyz[~positive])]
+        return objs
+    with phase('compute'):
+        objs = cgo_cache.cached('polar_batch', build, tensors, origins, Ntheta, Nphi, scale, begin)
+
+    names = []
+    with phase('emit'):
+        if int(merge):
+            for sign, color, part in (("positive", pos_color, 0), ("negative", neg_color, 1)):
+                obj = []
+                for lobe in objs[part::2]:
+                    obj += lobe
+                cmd.load_cgo(obj, f"{name}_{sign}", 0)
+                cmd.color(color, selection=f"{name}_{sign}")
+                names.append(f"{name}_{sign}")
+            budget.track(f"{name}_positive", [f"{name}_negative"], objs, kind='lines')
+        else:
+            for k in range(len(tensors)):
+                for sign, color, part in (("positive", pos_color, 0), ("negative", neg_color, 1)):
+                    cmd.load_cgo(objs[2*k+part], f"{name}{k}_{sign}", 0)
+                    cmd.color(color, selection=f"{name}{k}_{sign}")
+                    names.append(f"{name}{k}_{sign}")
+                budget.track(f"{name}{k}_positive", [f"{name}{k}_negative"], objs[2*k:2*k+2],
+                             kind='lines')
+    return names
+cmd.extend("polar_plot_batch",polar_plot_batch)
+
+def export_polar_plot(filename, tensor=None, Ntheta=150, Nphi=150, origin=None, scale=1.0,
+                      pos_color="Blue", neg_color="Orange", style="surface", max_points=1000000,
+                      adaptive=0, tol=0.01, max_level=4):
+    """Writes a polar plot to an .obj, .ply or .glb file, see mesh_export
+
+    style='surface' writes a closed triangle surface colored by the sign of r
+    (see geometry.polar_surface). 'loop', 'lines' and 'points' write the lobes
+    polar_plot draws, as line or point meshes.
+
+    :return: filename
+    :rtype: String
+    """
+    if tensor is None:
+        tensor = np.array([1.0,1.0,1.0,0.0,0.0,0.0])
+    tensor = np.array(str_to_list(tensor), dtype=float)
+    if origin is None:
+        origin = [0.0,0.0,0.0]
+    origin = np.array(str_to_list(origin), dtype=float)
+    colors = cmd.get_color_tuple(pos_color), cmd.get_color_tuple(neg_color)
 
-    Expects `polar_coords` to be a list of (r,theta,phi) tuples.
+    import mesh_export
+    with phase('compute'):
+        if style.lower() == "surface":
+            meshes = [polar_surface(tensor, int(Ntheta), int(Nphi), float(scale), origin, *colors)]
+        else:
+            pos, neg = polar_lobes(tensor, Ntheta, Nphi, scale, max_points, adaptive, tol, max_level)
+            meshes = polar_lines(pos + origin, neg + origin, style, *colors)
+    return mesh_export.write(meshes, filename)
+cmd.extend("export_polar_plot",export_polar_plot)
+
+def polar_lobes(tensor, Ntheta=150, Nphi=150, scale=1.0, max_points=1000000,
+                adaptive=0, tol=0.01, max_level=4, progress=None):
+    """Polar plot lobes of a tensor, through an LRU cache
+
+    The lobes are evaluated with polar_vertices (or adaptive_polar_vertices)
+    at scale 1 and kept in polar_cache, keyed by the tensor and the sampling
+    parameters. Any other scale is then applied to the cached vertices; a
+    negative scale swaps the lobes. The least recently used entries are
+    dropped once there are more than polar_cache_size of them or they hold
+    more than polar_cache_bytes. Lobes missing from polar_cache are looked
+    up in cgo_cache under the same key before they are evaluated.
+
+    :param progress: Passed on to polar_vertices when the lobes are evaluated
+    :type progress: Function, optional
+
+    :return: Cartesian vertices of the positive and negative lobes
+    :rtype: Tuple of (N,3) np.ndarray
+    """
+    tensor = np.asarray(str_to_list(tensor), dtype=float)
+    sampling = ('adaptive', float(tol), int(max_level)) if int(adaptive) else ()
+    key = (tuple(tensor), int(Ntheta), int(Nphi)) + sampling
+
+    with polar_cache_lock:
+        cached = polar_cache.get(key)
+        if cached is not None:
+            polar_cache.move_to_end(key)
+    if cached is not None:
+        pos, neg = cached
+    else:
+        ##Evaluated without holding the lock, so other plots are not blocked meanwhile
+        def build():
+            if int(adaptive):
+                lobes = adaptive_polar_vertices(tensor, Ntheta, Nphi, 1.0, tol, max_level,
+                                                progress)
+            else:
+                lobes = polar_vertices(tensor, Ntheta, Nphi, 1.0, max_points, progress)
+            return [lobe.ravel() for lobe in lobes]
+        ##Scale and origin are left out of the key, they are applied to the loaded lobes
+        pos, neg = (lobe.reshape(-1, 3) for lobe in
+                    cgo_cache.cached('polar_lobes', build, tensor, int(Ntheta), int(Nphi),
+                                     *sampling, arrays=True))
+        pos.setflags(write=False)
+        neg.setflags(write=False)
+        with polar_cache_lock:
+            polar_cache[key] = (pos, neg)
+            while (len(polar_cache) > polar_cache_size or
+                   sum(p.nbytes+n.nbytes for p,n in polar_cache.values()) > polar_cache_bytes):
+                polar_cache.popitem(last=False)
+                if not polar_cache:
+                    break
+
+    scale = float(scale)
+    if scale >= 0.0:
+        return pos*scale, neg*scale
+    return neg*-scale, pos*-scale
+
+def vertex_cgo(begin, xyz):
+    """Build a BEGIN/VERTEX.../END CGO list directly from an (N,3) array
+
+    :param begin: CGO list opening the primitive, e.g. [cgo.BEGIN, cgo.LINE_LOOP]
+    :type begin: List of floats
+
+    :param xyz: Vertices to write out
+    :type xyz: (N,3) np.ndarray
+
+    :return: CGO object
+    :rtype: List of floats
     """
-    return [(r*np.cos(theta)*np.sin(phi), r*np.sin(theta)*np.sin(phi), r*np.cos(phi))
-            for r,theta,phi in polar_coords]
+    buf = np.empty((len(xyz),4))
+    buf[:,0] = cgo.VERTEX
+    buf[:,1:] = xyz
+    return begin + buf.ravel().tolist() + [cgo.END]
 
 
 def coord_axes(x_scale=1.0,y_scale=1.0,z_scale=1.0, loc=None):
@@ -398,49 +1090,41 @@ def coord_axes(x_scale=1.0,y_scale=1.0,z_scale=1.0, loc=None):
     """
     if loc==None:
         loc = [1.0,1.0,1.0]
-
-    w = 0.06 # cylinder width 
-    l = 0.75 # cylinder length
-    h = 0.25 # cone height
-    d = w * 1.618 # cone base diameter
-    
-    x=x_scale*l
-    y=y_scale*l
-    z=z_scale*l
-
-    x_cone_start = loc.copy()
-    x_cone_start[0] += x
-    x_cone_end = x_cone_start.copy()
-    x_cone_end[0] += h
-
-    y_cone_start = loc.copy()
-    y_cone_start[1] += y
-    y_cone_end = y_cone_start.copy()
-    y_cone_end[1] += h
-
-    z_cone_start = loc.copy()
-    z_cone_start[2] += z
-    z_cone_end = z_cone_start.copy()
-    z_cone_end[2] += h
-
-    red = [1.0,0.0,0.0]
-    green = [0.0,1.0,0.0]
-    blue = [0.0,0.0,1.0]
-
-    #CYLINDER is defined by a top center (x1,y1,z1), bottom center (x2,y2,z2), radius (r),
-    #start color (r1,g1,b1), and end color (r2,g2,b2) (allows for a color gradient)
-
-    #CONE is top center (x1,y1,z1), bottom center (x2,y2,z2), top radius (r1), bottom radius (r2),
-    #start color (r1,g1,b1), end color (r2,g2,b2), and 0/1 for open/closed top/bottom       
-
-    x_arrow = ([CYLINDER] + loc + x_cone_start + [w] + 2*red
-               +[CONE] + x_cone_start + x_cone_end + [d] + [0.0] + 2*red + [1.0, 1.0]) 
-    y_arrow = ([CYLINDER] + loc + y_cone_start + [w] + 2*green
-               +[CONE] + y_cone_start + y_cone_end + [d] + [0.0] + 2*green + [1.0, 1.0]) 
-    z_arrow = ([CYLINDER] + loc + z_cone_start + [w] + 2*blue
-               +[CONE] + z_cone_start + z_cone_end + [d] + [0.0] + 2*blue + [1.0, 1.0])
-    obj = x_arrow + y_arrow + z_arrow 
-
-    cmd.load_cgo(obj, 'axes')
+    loc = [float(v) for v in str_to_list(loc)]
+    scales = (float(x_scale), float(y_scale), float(z_scale))
+    cmd.load_cgo(axes_cgo(*scales, loc), 'axes')
     return
 cmd.extend("coord_axes",coord_axes)
+
+def axes_cgo(x_scale, y_scale, z_scale, loc):
+    """CGO list of the axes drawn by coord_axes, see geometry.axes_arrows"""
+    ##Cones closed at both ends, unlike the vector arrows
+    return arrow_rows(axes_arrows(x_scale, y_scale, z_scale, loc), caps=(1.0, 1.0)).ravel().tolist()
+
+def stilde_cgo_cache(clear=0, on=None):
+    """
+    Prints the size of the on-disk CGO cache (see cgo_cache)
+
+    :param clear: 1 to delete every entry
+    :type clear: Int, optional - default 0
+
+    :param on: 1 to turn the cache on for this session, 0 to turn it off
+    :type on: Int, optional - default unchanged
+
+    :return: Number of entries and bytes in the cache
+    :rtype: Tuple of ints
+    """
+    if on is not None:
+        cgo_cache.enabled = bool(int(on))
+    if int(clear):
+        cgo_cache.evict(0)
+    found = cgo_cache.entries()
+    size = sum(entry[1] for entry in found)
+    state = "on" if cgo_cache.enabled else "off"
+    print(f"CGO cache ({state}) {cgo_cache.directory}: {len(found)} entries, "
+          f"{size/2**20:.1f} of {cgo_cache.max_bytes/2**20:.0f} MB")
+    return len(found), size
+cmd.extend("stilde_cgo_cache", stilde_cgo_cache)
+
+##Opt-in profiling of all the commands above, see profiling.py
+profiling.enable_requested()
@@ -0,0 +1,209 @@
+'''
+Renders S-tilde figures without an interactive PyMOL session.
+Usage at command line: py render_figures.py *manifest.json* -j *workers*
+
+The manifest is a JSON list of figures. Each entry needs a molecule file and an
+output .png, and can add a sorted S-tilde .csv with the row indices to draw, a
+tensor for a polar plot and view settings:
+
+    [{"molecule": "mol.xyz", "csv": "SortedData/output.csv", "indices": [0, 1, 2],
+      "output": "figures/mol.png", "fromAtom": false, "tensor": [1, 1, 1, 0, 0, 0],
+      "view": [...18 floats from get_view...], "settings": {"ray_opaque_background": 0},
+      "width": 1200, "height": 900, "dpi": 300, "ray": true}]
+
+Relative paths are taken relative to the manifest. Entries are split into
+batches and every batch is rendered by a headless PyMOL process (pymol -cq)
+running this same script, which draws with newLoad, loadCSV, multiple_vectors
+and polar_plot. Up to -j processes run at once, and the time spent on each
+figure is reported at the end.
+'''
+import argparse as ap
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+##Prefix of the lines a worker prints for each rendered figure
+RESULT = "RENDER_RESULT "
+
+path_keys = ('molecule', 'csv', 'output')
+
+
+def read_manifest(filename):
+    '''
+       Reads a manifest and makes its paths absolute
+
+       :param filename: JSON manifest file
+       :type filename: String
+
+       :return: Figure entries
+       :rtype: List of dicts
+    '''
+    root = Path(filename).resolve().parent
+    with open(filename) as f:
+        entries = json.load(f)
+    for entry in entries:
+        for key in path_keys:
+            if entry.get(key):
+                entry[key] = str(root / entry[key])
+    return entries
+
+
+def render_entry(entry):
+    '''
+       Draws and saves one figure in the running PyMOL. Only called inside a worker
+
+       :param entry: Figure entry from the manifest
+       :type entry: Dict
+
+       :return: Time in seconds spent on each step
+       :rtype: Dict
+    '''
+    from pymol import cmd
+    import pymol_functions as pf
+
+    timings = {}
+    start = time.perf_counter()
+    cmd.reinitialize()
+    pf.newLoad(entry['molecule'])
+    timings['load'] = time.perf_counter() - start
+
+    step = time.perf_counter()
+    if entry.get('csv'):
+        df = pf.loadCSV(entry['csv'])
+        pf.multiple_vectors(entry.get('indices', []), df,
+                            fromAtom=entry.get('fromAtom', False), batch=True)
+    if entry.get('tensor') is not None:
+        pf.polar_plot(entry['tensor'], **entry.get('polar', {}))
+    timings['draw'] = time.perf_counter() - step
+
+    step = time.perf_counter()
+    for setting, value in entry.get('settings', {}).items():
+        cmd.set(setting, value)
+    if entry.get('view'):
+        cmd.set_view(entry['view'])
+    else:
+        cmd.orient()
+    Path(entry['output']).parent.mkdir(parents=True, exist_ok=True)
+    cmd.png(entry['output'], width=entry.get('width', 1200), height=entry.get('height', 900),
+            dpi=entry.get('dpi', 300), ray=int(entry.get('ray', True)))
+    timings['render'] = time.perf_counter() - step
+    timings['total'] = time.perf_counter() - start
+    return timings
+
+
+def run_worker(jobfile):
+    '''
+       Renders every entry of a batch file, printing one RESULT line per entry
+
+       :param jobfile: JSON file with a list of figure entries
+       :type jobfile: String
+
+       :return: None
+    '''
+    with open(jobfile) as f:
+        entries = json.load(f)
+    for entry in entries:
+        try:
+            result = {'output': entry['output'], 'status': 'ok', 'timings': render_entry(entry)}
+        except Exception as err:
+            result = {'output': entry.get('output'), 'status': 'error', 'error': repr(err)}
+        print(RESULT + json.dumps(result), flush=True)
+
+
+def run_batch(entries, pymol='pymol'):
+    '''
+       Launches one headless PyMOL process for a batch of entries
+
+       :param entries: Figure entries to render
+       :type entries: List of dicts
+
+       :param pymol: PyMOL executable
+       :type pymol: String, optional - default pymol
+
+       :return: One result per entry
+       :rtype: List of dicts
+    '''
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+        json.dump(entries, f)
+    start = time.perf_counter()
+    try:
+        proc = subprocess.run([pymol, '-cq', os.path.abspath(__file__), '--', '--worker', f.name],
+                              capture_output=True, text=True)
+        stdout, error = proc.stdout, proc.stderr.strip()[-500:] or f"exit code {proc.returncode}"
+    except OSError as err:
+        stdout, error = '', "Could not launch PyMOL: {0}".format(err)
+    finally:
+        os.remove(f.name)
+    wall = time.perf_counter() - start
+
+    results = [json.loads(line[len(RESULT):]) for line in stdout.splitlines()
+               if line.startswith(RESULT)]
+    done = {r['output'] for r in results}
+    for entry in entries:
+        if entry['output'] not in done:
+            results.append({'output': entry['output'], 'status': 'error', 'error': error})
+    for result in results:
+        result['process_wall'] = wall
+    return results
+
+
+def render_all(entries, workers=None, batch=1, pymol='pymol'):
+    '''
+       Renders every entry through a pool of headless PyMOL processes
+
+       :param entries: Figure entries to render
+       :type entries: List of dicts
+
+       :param workers: Number of PyMOL processes at once, defaults to the number of cores
+       :type workers: Int, optional
+
+       :param batch: Number of entries rendered by each PyMOL process
+       :type batch: Int, optional - default 1
+
+       :param pymol: PyMOL executable
+       :type pymol: String, optional - default pymol
+
+       :return: One result per entry, with timings
+       :rtype: List of dicts
+    '''
+    workers = workers or os.cpu_count()
+    batches = [entries[i:i+batch] for i in range(0, len(entries), batch)]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(lambda b: run_batch(b, pymol), batches)
+    return [r for batch_results in results for r in batch_results]
+
+
+if __name__ in ("__main__", "pymol"):
+    if '--worker' in sys.argv:
+        ##Inside PyMOL: make the other modules of this directory importable
+        sys.path.insert(0, os.path.dirname(os.path.abspath(sys.argv[0])))
+        run_worker(sys.argv[sys.argv.index('--worker')+1])
+    else:
+        parser=ap.ArgumentParser()
+        parser.add_argument('manifest',help="JSON manifest of figures to render")
+        parser.add_argument('-j','--jobs',help="Number of PyMOL processes, defaults to the number of cores",
+                            type=int,default=None)
+        parser.add_argument('-b','--batch',help="Figures rendered by each PyMOL process",
+                            type=int,default=1)
+        parser.add_argument('--pymol',help="PyMOL executable",default="pymol")
+        parser.add_argument('-r','--report',help="Write per-figure timings to this JSON file")
+        args=parser.parse_args()
+
+        start = time.perf_counter()
+        results = render_all(read_manifest(args.manifest), args.jobs, args.batch, args.pymol)
+        for result in results:
+            if result['status'] == 'ok':
+                print(f"{result['output']}: {result['timings']['total']:.2f} s "
+                      f"(process {result['process_wall']:.2f} s)")
+            else:
+                print(f"{result['output']}: FAILED {result['error']}")
+        print(f"Rendered {sum(r['status'] == 'ok' for r in results)}/{len(results)} figures "
+              f"in {time.perf_counter() - start:.2f} s")
+        if args.report:
+            with open(args.report, 'w') as f:
+                json.dump(results, f, indent=2)
@@ -0,0 +1,280 @@
+'''
+Accounting and limits for the objects the S-tilde commands leave in a session.
+
+Every command that creates objects (elec_mag, elec_mag_batch, polar_plot,
+sphere_field, stilde_show, ...) reports the group or objects it made, with
+their vertex count and approximate memory, to the SceneBudget. There are no
+limits by default; once stilde_budget sets max_objects, max_vertices or max_mb
+and the session goes over them, the entries that are hidden are removed first,
+then the least recently drawn ones, and every removal is printed. With the merge
+policy, the CGOs of removed entries are appended to a single stilde_merged
+object instead, so the geometry stays visible as one cheap object.
+stilde_stats prints the footprint and stilde_budget changes the limits.
+'''
+import time
+from collections import OrderedDict
+import numpy as np
+from pymol import cmd
+
+##Approximate memory of one CGO float (float32 plus its render buffer), one atom and one object
+cgo_float_bytes = 8
+atom_bytes = 1024
+object_bytes = 4096
+
+##Floats in the CGO lists per vertex drawn: arrows are a cylinder and a cone (4 points)
+floats_per_vertex = {'arrows': 31/4, 'lines': 4, 'spheres': 9}
+
+
+def vertices(objs, kind):
+    '''
+       :param objs: CGO lists
+       :type objs: List of lists of floats
+
+       :param kind: arrows, lines (BEGIN/VERTEX/END lists) or spheres
+       :type kind: String
+
+       :return: Approximate number of vertices drawn
+       :rtype: Int
+    '''
+    return int(sum(len(obj) for obj in objs)/floats_per_vertex[kind])
+
+
+class Entry:
+    '''
+       One tracked group or set of objects
+    '''
+    def __init__(self, name, members, vertices, floats, atoms, cgo, on_evict):
+        self.name = name
+        self.members = list(members)
+        self.vertices = int(vertices)
+        self.atoms = int(atoms)
+        self.objects = len(self.members) + 1
+        self.nbytes = floats*cgo_float_bytes + atoms*atom_bytes + self.objects*object_bytes
+        self.cgo = cgo
+        self.on_evict = on_evict
+        self.drawn = time.time()
+
+
+class SceneBudget:
+    '''
+       :param max_objects: Most objects (including groups and label objects) kept
+       :type max_objects: Int, optional - default None, no limit
+
+       :param max_vertices: Most CGO vertices kept
+       :type max_vertices: Int, optional - default None, no limit
+
+       :param max_mb: Most approximate memory kept, in MB
+       :type max_mb: Float, optional - default None, no limit
+
+       :param policy: delete, or merge to append the CGOs of removed entries to one object
+       :type policy: String, optional - default delete
+
+       :param merged: Name of the object merged entries go to
+       :type merged: String, optional - default stilde_merged
+    '''
+    def __init__(self, max_objects=None, max_vertices=None, max_mb=None, policy='delete',
+                 merged='stilde_merged'):
+        self.max_objects = max_objects
+        self.max_vertices = max_vertices
+        self.max_mb = max_mb
+        self.policy = policy
+        self.merged = merged
+        ##Name mapped to its Entry, least recently drawn first
+        self.entries = OrderedDict()
+        self.merged_cgo = []
+        self.merged_vertices = 0
+        self.evicted = 0
+        ##Running objects, vertices and bytes of the entries and the merged object
+        self.totals = np.zeros(3, dtype=np.int64)
+
+    def _count(self, entry, sign):
+        self.totals += sign*np.array([entry.objects, entry.vertices, entry.nbytes], dtype=np.int64)
+
+    def track(self, name, members=(), objs=(), kind='arrows', atoms=0, on_evict=None):
+        '''
+           Records objects just created, then enforces the budget
+
+           :param name: Group, or object, removed as a whole
+           :type name: String
+
+           :param members: Objects deleted with `name`
+           :type members: List of strings, optional
+
+           :param objs: CGO lists loaded into the objects
+           :type objs: List of lists of floats, optional
+
+           :param kind: Kind of the CGO lists, see vertices
+           :type kind: String, optional - default arrows
+
+           :param atoms: Number of pseudoatoms (labels) created
+           :type atoms: Int, optional - default 0
+
+           :param on_evict: Called with `name` when the entry is removed by the budget
+           :type on_evict: Function, optional
+
+           :return: Names of the entries removed
+           :rtype: List of strings
+        '''
+        cgo = None
+        if self.policy == 'merge' and objs:
+            cgo = [np.asarray(obj, dtype=np.float32) for obj in objs]
+        floats = sum(len(obj) for obj in objs)
+        self.forget(name)
+        self.entries[name] = Entry(name, members, vertices(objs, kind), floats, atoms, cgo,
+                                   on_evict)
+        self._count(self.entries[name], 1)
+        return self.enforce(keep=(name,))
+
+    def touch(self, name):
+        '''Marks `name` as drawn just now'''
+        if name in self.entries:
+            self.entries.move_to_end(name)
+            self.entries[name].drawn = time.time()
+
+    def forget(self, name):
+        '''Stops tracking `name`, e.g. after it was deleted'''
+        if name in self.entries:
+            self._count(self.entries.pop(name), -1)
+
+    def usage(self):
+        '''
+           :return: Objects, vertices and approximate bytes of the tracked entries and merged object
+           :rtype: Tuple of ints
+        '''
+        return tuple(int(t) for t in self.totals)
+
+    def over(self):
+        objects, count, nbytes = self.usage()
+        return ((self.max_objects is not None and objects > self.max_objects) or
+                (self.max_vertices is not None and count > self.max_vertices) or
+                (self.max_mb is not None and nbytes > self.max_mb*2**20))
+
+    def enforce(self, keep=()):
+        '''
+           Removes entries until the session is within budget
+
+           Entries deleted outside of the budget are forgotten first. Hidden
+           entries go before visible ones, each in least recently drawn order.
+
+           :param keep: Names never removed, e.g. the entry just drawn
+           :type keep: Tuple of strings, optional
+
+           :return: Names of the entries removed
+           :rtype: List of strings
+        '''
+        if not self.over():
+            return []
+        names = set(cmd.get_names('objects') or [])
+        for name in [n for n in self.entries if n not in names]:
+            self.forget(name)
+        enabled = set(cmd.get_names('objects', enabled_only=1) or [])
+        order = sorted((name in enabled, k, name) for k, name in enumerate(self.entries)
+                       if name not in keep)
+        removed = []
+        merged = len(self.merged_cgo)
+        for _, _, name in order:
+            if not self.over():
+                break
+            self.evict(name, load=False)
+            removed.append(name)
+        if self.merged_cgo and self.over():
+            ##The merged geometry alone is over budget
+            self.clear_merged()
+        elif len(self.merged_cgo) > merged:
+            cmd.load_cgo(np.concatenate(self.merged_cgo).tolist(), self.merged)
+        return removed
+
+    def clear_merged(self):
+        '''Deletes the object holding merged entries'''
+        if self.merged_cgo:
+            cmd.delete(self.merged)
+            floats = sum(len(obj) for obj in self.merged_cgo)
+            self.totals -= [1, self.merged_vertices, floats*cgo_float_bytes + object_bytes]
+        self.merged_cgo = []
+        self.merged_vertices = 0
+
+    def evict(self, name, load=True):
+        '''
+           Deletes (or merges) one entry
+
+           :param name: Entry to remove
+           :type name: String
+
+           :param load: Reload the merged object now, enforce does it once for all entries
+           :type load: Boolean, optional - default True
+        '''
+        entry = self.entries[name]
+        self.forget(name)
+        if self.policy == 'merge' and entry.cgo:
+            floats = sum(len(obj) for obj in entry.cgo)
+            self.totals += [0 if self.merged_cgo else 1, entry.vertices, floats*cgo_float_bytes]
+            if not self.merged_cgo:
+                self.totals[2] += object_bytes
+            self.merged_cgo += entry.cgo
+            self.merged_vertices += entry.vertices
+            if load:
+                cmd.load_cgo(np.concatenate(self.merged_cgo).tolist(), self.merged)
+            print(f"Scene budget merged {name} into {self.merged}")
+        else:
+            print(f"Scene budget deleted {name}")
+        cmd.delete(" ".join(entry.members + [name]))
+        if entry.on_evict is not None:
+            entry.on_evict(name)
+        self.evicted += 1
+
+
+##Budget used by the S-tilde commands
+budget = SceneBudget()
+
+
+def stilde_stats(limit=10):
+    '''
+       Prints the objects, vertices and approximate memory of the S-tilde objects
+
+       :param limit: Number of the largest entries listed
+       :type limit: Int, optional - default 10
+
+       :return: Objects, vertices and approximate bytes in use
+       :rtype: Tuple of ints
+    '''
+    objects, count, nbytes = budget.usage()
+    print(f"{len(budget.entries)} entries, {budget.evicted} removed by the budget ({budget.policy})")
+    bound = lambda value, unit='': "no limit" if value is None else f"{value}{unit}"
+    print(f"objects  {objects:10d} of {bound(budget.max_objects)}")
+    print(f"vertices {count:10d} of {bound(budget.max_vertices)}")
+    print(f"memory   {nbytes/2**20:10.1f} MB of {bound(budget.max_mb, ' MB')}")
+    largest = sorted(budget.entries.values(), key=lambda e: e.nbytes, reverse=True)[:int(limit)]
+    if largest:
+        print(f"{'largest':30s} {'objects':>8s} {'vertices':>10s} {'MB':>8s} {'age (s)':>8s}")
+    for e in largest:
+        print(f"{e.name:30s} {e.objects:8d} {e.vertices:10d} {e.nbytes/2**20:8.2f} "
+              f"{time.time() - e.drawn:8.0f}")
+    return objects, count, nbytes
+cmd.extend("stilde_stats", stilde_stats)
+
+
+def stilde_budget(max_objects=None, max_vertices=None, max_mb=None, policy=None):
+    '''
+       Changes the limits of the budget and applies them. A limit of none removes it
+
+       :param policy: delete, or merge to keep removed geometry in one stilde_merged object
+       :type policy: String, optional
+
+       :return: Names of the entries removed
+       :rtype: List of strings
+    '''
+    def limit(value, kind):
+        return None if str(value).lower() == 'none' else kind(value)
+    if max_objects is not None:
+        budget.max_objects = limit(max_objects, int)
+    if max_vertices is not None:
+        budget.max_vertices = limit(max_vertices, int)
+    if max_mb is not None:
+        budget.max_mb = limit(max_mb, float)
+    if policy is not None:
+        budget.policy = policy
+    removed = budget.enforce()
+    if removed:
+        print(f"Removed {len(removed)} entries")
+    return removed
+cmd.extend("stilde_budget", stilde_budget)
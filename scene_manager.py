@@ -0,0 +1,192 @@
+'''
+Incremental display of S-tilde arrows for rows of a sorted table.
+
+elec_mag creates a new stildeN group on every call. The SceneManager instead
+keeps one group per (nocc, nvirt) transition, named st_{nocc}_{nvirt} and
+collected under the stilde_scene group. When the shown selection changes,
+only the difference is applied: transitions that left are deleted, new ones
+are drawn, and those whose vectors, scale or color changed are reloaded into
+their existing objects. Browsing a table therefore costs O(changed rows).
+'''
+import numpy as np
+from pymol import cmd
+from generate_arrow import cgo_arrows
+from stilde_table import row_vectors
+from scene_budget import budget
+from profiling import phase
+
+##Floats per arrow in the CGO lists of cgo_arrows
+arrow_size = 31
+
+
+class SceneManager:
+    '''
+       Tracks the transitions on display and their drawing parameters
+
+       :param group: Group holding every transition
+       :type group: String, optional - default stilde_scene
+    '''
+    def __init__(self, group='stilde_scene'):
+        self.group = group
+        ##Transition key mapped to the parameters it was drawn with
+        self.displayed = {}
+
+    @staticmethod
+    def name(key):
+        '''
+           :param key: (nocc, nvirt) of a transition
+           :type key: Tuple of ints
+
+           :return: Name of the group of that transition
+           :rtype: String
+        '''
+        return f"st_{key[0]}_{key[1]}"
+
+    def show(self, indices, df, elec_scale=2, mag_scale=2, fromAtom=False,
+             elec_color='red', mag_color='blue', use_lab=False):
+        '''
+           Makes the rows `indices` of `df` the transitions on display
+
+           :param indices: Rows of the table to show
+           :type indices: List of ints
+
+           :param df: Table from loadCSV, with nocc/nvirt columns if available
+           :type df: Dataframe, ColumnTable or StildeTable
+
+           :param fromAtom: Draw from the first atom of 'sele' instead of the coordinate origin
+           :type fromAtom: Boolean, optional - default False
+
+           :param use_lab: Label each transition with its S-tilde value
+           :type use_lab: Boolean, optional - default False
+
+           :return: Keys of the transitions removed, added and updated
+           :rtype: Tuple of three lists
+        '''
+        indices = np.asarray(list(indices), dtype=int)
+        fromAtom, use_lab = bool(int(fromAtom)), bool(int(use_lab))
+        elec, mag = row_vectors(df, indices)
+        stilde = np.asarray(df['S'])[indices] if 'S' in df.columns else np.zeros(len(indices))
+        if 'nocc' in df.columns and 'nvirt' in df.columns:
+            keys = list(zip(np.asarray(df['nocc'])[indices].tolist(),
+                            np.asarray(df['nvirt'])[indices].tolist()))
+        else:
+            keys = [('row', i) for i in indices.tolist()]
+        origin = cmd.get_coords('sele', 1)[0] if fromAtom else np.zeros(3)
+
+        wanted = {}
+        for k, key in enumerate(keys):
+            wanted[key] = (tuple(elec[k]), tuple(mag[k]), float(elec_scale), float(mag_scale),
+                           elec_color, mag_color, tuple(origin), fromAtom, use_lab,
+                           float(stilde[k]))
+
+        removed = [key for key in self.displayed if key not in wanted]
+        added = [key for key in wanted if key not in self.displayed]
+        updated = [key for key in wanted if key in self.displayed
+                   and self.displayed[key] != wanted[key]]
+        ##Transitions shown again unchanged count as just drawn for the budget
+        for key in wanted:
+            if key in self.displayed and key not in updated:
+                budget.touch(self.name(key))
+
+        with phase('emit'):
+            for key in removed:
+                cmd.delete(self.name(key))
+                budget.forget(self.name(key))
+                del self.displayed[key]
+        self.draw(added + updated, wanted, new=set(added))
+        return removed, added, updated
+
+    def draw(self, keys, params, new=()):
+        '''
+           Loads the arrows of `keys`, computed with one cgo_arrows call per kind and color
+
+           :param keys: Transitions to (re)draw
+           :type keys: List of tuples
+
+           :param params: Drawing parameters of each transition, as stored in `displayed`
+           :type params: Dict
+
+           :param new: Transitions that still need their group
+           :type new: Set of tuples
+
+           :return: None
+        '''
+        if not keys:
+            return
+        with phase('compute'):
+            p = [params[key] for key in keys]
+            origins = np.array([q[6] for q in p])
+            objs = {}
+            for kind, vec, scale, color in (('elec', 0, 2, 4), ('mag', 1, 3, 5)):
+                ##Scale the endpoints here, each transition can have its own scale
+                ends = np.array([q[vec] for q in p])*np.array([q[scale] for q in p])[:, None]
+                objs[kind] = [None]*len(keys)
+                for c in {q[color] for q in p}:
+                    rows = [k for k, q in enumerate(p) if q[color] == c]
+                    obj, _, _ = cgo_arrows(origins[rows], ends[rows], color=c, type='',
+                                           scaling=1, from_atom=p[0][7])
+                    for n, k in enumerate(rows):
+                        objs[kind][k] = obj[arrow_size*n:arrow_size*(n+1)]
+
+        with phase('emit'):
+            for k, key in enumerate(keys):
+                name = self.name(key)
+                cmd.load_cgo(objs['elec'][k], f"{name}_elec")
+                cmd.load_cgo(objs['mag'][k], f"{name}_mag")
+                members = f"{name}_elec {name}_mag"
+                if params[key][8]:
+                    cmd.delete(f"{name}_lab")
+                    cmd.pseudoatom(f"{name}_lab", name="lab", label=f"{params[key][9]:.3f}",
+                                   pos=list(origins[k]))
+                    members += f" {name}_lab"
+                elif key in self.displayed and self.displayed[key][8]:
+                    cmd.delete(f"{name}_lab")
+                if key in new or params[key][8]:
+                    cmd.group(name, members=members)
+                self.displayed[key] = params[key]
+            if new:
+                cmd.group(self.group, members=" ".join(self.name(key) for key in keys if key in new))
+            ##Tracked once grouped, so the budget never removes a transition before it is complete
+            for k, key in enumerate(keys):
+                budget.track(self.name(key), [f"{self.name(key)}_elec", f"{self.name(key)}_mag",
+                                              f"{self.name(key)}_lab"],
+                             [objs['elec'][k], objs['mag'][k]], atoms=int(params[key][8]),
+                             on_evict=lambda name, key=key: self.displayed.pop(key, None))
+
+    def clear(self):
+        '''
+           Deletes every transition on display
+
+           :return: None
+        '''
+        cmd.delete(self.group)
+        for key in self.displayed:
+            budget.forget(self.name(key))
+        self.displayed.clear()
+
+
+##Manager used by the PyMOL commands
+scene = SceneManager()
+
+
+def stilde_show(indices, df, elec_scale=2, mag_scale=2, fromAtom=False,
+                elec_color='red', mag_color='blue', use_lab=False):
+    '''
+       Shows the rows `indices` of `df`, only changing what differs from the current display
+
+       See SceneManager.show for the parameters.
+
+       :return: Keys of the transitions removed, added and updated
+       :rtype: Tuple of three lists
+    '''
+    removed, added, updated = scene.show(indices, df, elec_scale, mag_scale, fromAtom,
+                                         elec_color, mag_color, use_lab)
+    print(f"Removed {len(removed)}, added {len(added)}, updated {len(updated)} transitions")
+    return removed, added, updated
+cmd.extend("stilde_show", stilde_show)
+
+
+def stilde_clear():
+    '''Deletes every transition shown with stilde_show'''
+    scene.clear()
+cmd.extend("stilde_clear", stilde_clear)
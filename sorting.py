@@ -1,91 +1,484 @@
 '''
 This script functions as a sorting and filtering program for Excel files containing s-tilde and vector data.
-Usage at command line: py sorting.py *filename.csv* *output_filename.csv*
+Usage at command line: py sorting.py *filename.csv* -o *output_filename.csv* -n *number*
 Make sure to include the file extensions at both parts.
+Batch usage: py sorting.py --batch *directory or "glob*.csv"* -n *number* -j *processes*
+Watch usage: py sorting.py --watch *file, directory or "glob*.csv"* -o *output_filename.csv* -n *number*
 
 The program uses pandas to read in a .csv file as a dataframe. It then sorts the dataframe by absolute value of s-tilde, 
 maintaining the sign of s-tilde.
 At the end it outputs a new .csv file with the desired number of s-tilde values. 
+
+For very large files, --stream reads the .csv in chunks and only keeps a running
+top-N by absolute value of s-tilde, so memory stays proportional to chunk size + N.
+
+--incremental and --watch keep the top-N of a set of growing .csv files up to
+date. How far each input has been read is saved next to the output, so only
+rows appended since the last update are parsed and merged into the ranking.
 '''
+import hashlib
+import io
+import json
+import os
+import time
 import numpy as np
 import pandas as pd
 import argparse as ap
 from pathlib import Path
+from glob import glob
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 
-if __name__=="__main__":
-    ##Read file as mandatory argument, error if not given.
-    ##Read output as optional with -o flag, "output.csv" is default
-    ##Can get description of input by calling with -h
-    parser=ap.ArgumentParser()
-    parser.add_argument('file',help="CSV file of stilde values")
-    parser.add_argument('-o','--output',help='Sorted stilde output file, with extension',
-                        default="output.csv")
-    parser.add_argument('-n','--number',help="Number of stilde rows to sort",type=int,default=20)
-    args=parser.parse_args()
-
-    filename = args.file
-    output = args.output
-    number = args.number
+columns=["nocc","nvirt","S",
+        "ElectricX","ElectricY","ElectricZ",
+        "MagneticX","MagneticY","MagneticZ"]
 
-    columns=["nocc","nvirt","stilde",
-            "ElectricX","ElectricY","ElectricZ",
-            "MagneticX","MagneticY","MagneticZ"]
 
-    try:
-        dataframe = pd.read_csv(filename,header=0,names=columns)
-    except FileNotFoundError as err:
-        print("Exception: {0}".format(err))
-        exit()
-    print('\n')
+def add_derived_columns(dataframe):
+    '''
+       Inserts the electric/magnetic magnitudes and the cosine of the angle between them
 
+       :param dataframe: Raw s-tilde data with the columns listed in `columns`
+       :type dataframe: Dataframe
 
-    dataframe.insert(6, 'Electric Magnitude', np.nan, False)
-    dataframe.insert(10, 'Magnetic Magnitude', np.nan, False)
-    dataframe.insert(11, 'Cosine of Angle', np.nan, False)
+       :return: The same dataframe with the derived columns added
+       :rtype: Dataframe
+    '''
+    ##Numpy functions can be quickly/succinctly applied across dataframe
+    elec=dataframe[['ElectricX','ElectricY','ElectricZ']].values.astype(float)
+    mag=dataframe[['MagneticX','MagneticY','MagneticZ']].values.astype(float)
+    elecLength=np.linalg.norm(elec,axis=1)
+    magLength=np.linalg.norm(mag,axis=1)
+    dot=np.einsum('ij,ij->i',elec,mag)
 
+    dataframe.insert(6, 'Electric Magnitude', elecLength, False)
+    dataframe.insert(10, 'Magnetic Magnitude', magLength, False)
+    dataframe.insert(11, 'Cosine of Angle', dot/(elecLength*magLength), False)
+    return dataframe
 
-    ##Numpy functions can be quickly/succinctly applied across dataframe
-    elecLength=np.linalg.norm(dataframe[['ElectricX','ElectricY','ElectricZ']].values,axis=1)
-    magLength=np.linalg.norm(dataframe[['MagneticX','MagneticY','MagneticZ']].values,axis=1)
-    dot=np.einsum('ij,ij->i',dataframe[['ElectricX','ElectricY','ElectricZ']].values,
-               dataframe[['MagneticX','MagneticY','MagneticZ']].values)
 
-    dataframe['Electric Magnitude']=elecLength
-    dataframe['Magnetic Magnitude']=magLength
-    dataframe['Cosine of Angle']=dot/(elecLength*magLength)
+def sort_by_magnitude(dataframe):
+    '''
+       Sorts by absolute value of s-tilde, largest first, keeping the sign of s-tilde
 
+       :param dataframe: s-tilde data
+       :type dataframe: Dataframe
 
+       :return: Sorted dataframe
+       :rtype: Dataframe
+    '''
     ##Removes need for Negative? column
-    dataframe['absS']= dataframe['S'].apply(abs)
-    dataframe.sort_values(by='absS',axis=0,inplace=True,ascending = False)
-    dataframe.drop('absS', axis=1, inplace=True)
-    ##Requires pandas 1.1.0
-    #dataframe.sort_values(by='S',axis=0,inplace=True,ascending = False,key=np.abs)
-    print(dataframe)
+    order=np.argsort(-np.abs(dataframe['S'].values),kind='stable')
+    return dataframe.iloc[order]
 
 
-    number = int(input("Enter the number of S-tilde values you'd like to have in the exported file\n"))
+def top_n(dataframe, number):
+    '''
+       Keeps the `number` rows with the largest absolute s-tilde, in their original order
 
-    newData = dataframe[:number]
-    print(f"Top {number} s-tilde values")
-    print(newData)
+       Uses argpartition, so only the selected rows are ever sorted.
+
+       :param dataframe: s-tilde data
+       :type dataframe: Dataframe
+
+       :param number: Number of rows to keep
+       :type number: Int
+
+       :return: Selected rows
+       :rtype: Dataframe
+    '''
+    if number <= 0:
+        return dataframe.iloc[:0]
+    if len(dataframe) <= number:
+        return dataframe
+    keep=np.argpartition(-np.abs(dataframe['S'].values),number-1)[:number]
+    return dataframe.iloc[np.sort(keep)]
+
+
+def stream_top_n(filename, number, chunksize=1000000):
+    '''
+       Reads a s-tilde .csv in chunks and returns the sorted top `number` rows
+
+       Derived columns are only computed for each chunk, which is merged into
+       the running top-N and then discarded.
 
+       :param filename: s-tilde .csv file
+       :type filename: String
 
+       :param number: Number of rows to keep
+       :type number: Int
+
+       :param chunksize: Number of rows read at a time
+       :type chunksize: Int, optional - default 1000000
+
+       :return: Top `number` rows sorted by absolute value of s-tilde
+       :rtype: Dataframe
+    '''
+    return stream_summary(filename, number, chunksize)[0]
+
+
+def stream_summary(filename, number, chunksize=1000000):
+    '''
+       Same as stream_top_n, also counting the rows and summing s-tilde over the whole file
+
+       :return: Top `number` rows, number of rows read and total s-tilde
+       :rtype: Tuple of (Dataframe, Int, Float)
+    '''
+    top=None
+    rows=0
+    total=0.0
+    for chunk in pd.read_csv(filename,header=0,names=columns,chunksize=chunksize):
+        rows+=len(chunk)
+        total+=chunk['S'].sum()
+        chunk=add_derived_columns(chunk)
+        if top is not None:
+            chunk=pd.concat([top,chunk],ignore_index=True)
+        top=top_n(chunk,number)
+    if top is None:
+        top=add_derived_columns(pd.DataFrame(columns=columns,dtype=float))
+    return sort_by_magnitude(top).reset_index(drop=True), rows, float(total)
+
+
+def write_output(newData, output, outdir='./SortedData'):
+    '''
+       Writes the sorted s-tilde rows to `outdir`/`output`
+
+       :param newData: Rows to be written
+       :type newData: Dataframe
+
+       :param output: Output file name, with extension
+       :type output: String
+
+       :param outdir: Output directory, created if needed
+       :type outdir: String, optional - default ./SortedData
+
+       :return: Path of the written file
+       :rtype: Path
+    '''
     ##Path will automatically enter address compatible with Linux/Mac/Windows
-    outdir = Path('./SortedData')
+    outdir = Path(outdir)
     if not Path.exists(outdir):
         Path.mkdir(outdir)
     ##Can extend Path objects with /
     fullname = outdir / output
 
-
     try:
         ##Removed row label
         newData.to_csv(fullname,index=False)
         print("New file saved successfully")
     except OSError as err:
         print("Directory error: {0}".format(err))
+    return fullname
+
+
+summary_name = 'summary.csv'
+
+
+def sort_file(filename, outdir, number, chunksize=1000000):
+    '''
+       Streams one s-tilde .csv into `outdir`, keeping the top `number` rows
+
+       :param filename: s-tilde .csv file
+       :type filename: String
+
+       :param outdir: Output directory, the output keeps the input file name
+       :type outdir: String
+
+       :return: Summary of the file for the batch index
+       :rtype: Dict
+    '''
+    newData, rows, total = stream_summary(filename, number, chunksize)
+    output = Path(outdir) / Path(filename).name
+    newData.to_csv(output, index=False)
+    return {'input': str(Path(filename).resolve()), 'output': str(output), 'rows': rows,
+            'retained': len(newData),
+            'top |S|': float(np.abs(newData['S']).max()) if len(newData) else np.nan,
+            'total S': total, 'retained S': float(newData['S'].sum())}
+
+
+def find_inputs(pattern):
+    '''
+       :param pattern: Directory (all .csv files in it) or glob pattern
+       :type pattern: String
+
+       :return: Matching .csv files
+       :rtype: List of Paths
+    '''
+    if Path(pattern).is_dir():
+        return sorted(Path(pattern).glob('*.csv'))
+    return sorted(Path(p) for p in glob(pattern))
+
+
+def sort_batch(pattern, outdir='./SortedData', number=20, chunksize=1000000, workers=None):
+    '''
+       Sorts every s-tilde .csv matching `pattern` across a process pool
+
+       Inputs whose output is newer than the input, and which are already in
+       the summary index, are skipped. The summary index (summary.csv in
+       `outdir`) lists the row count, top absolute s-tilde and total/retained
+       s-tilde of every input.
+
+       :param pattern: Directory or glob pattern of s-tilde .csv files
+       :type pattern: String
+
+       :param outdir: Output directory, must not be the directory of the inputs
+       :type outdir: String, optional - default ./SortedData
+
+       :param workers: Number of processes, defaults to the number of cores
+       :type workers: Int, optional
+
+       :return: Summary index
+       :rtype: Dataframe
+    '''
+    outdir = Path(outdir)
+    inputs = find_inputs(pattern)
+    ##Outputs keep the input file names, so they would replace the inputs
+    clash = [f for f in inputs if (outdir / f.name).resolve() == f.resolve()]
+    if clash:
+        raise ValueError(f"{outdir} holds the inputs, the sorted files would overwrite "
+                         f"{len(clash)} of them; choose another --outdir")
+    outdir.mkdir(parents=True, exist_ok=True)
+    index = outdir / summary_name
+    previous = {}
+    if index.exists():
+        previous = {row['input']: row for row in pd.read_csv(index).to_dict('records')}
+
+    summaries = []
+    todo = []
+    for filename in inputs:
+        if filename.resolve() == index.resolve():
+            continue
+        output = outdir / filename.name
+        row = previous.get(str(filename.resolve()))
+        if (row is not None and row['retained'] == min(number, row['rows'])
+                and output.exists() and output.stat().st_mtime >= filename.stat().st_mtime):
+            print(f"{filename} is up to date")
+            summaries.append(row)
+        else:
+            todo.append(str(filename))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(sort_file, f, outdir, number, chunksize): f for f in todo}
+        for future in as_completed(futures):
+            try:
+                summaries.append(future.result())
+                print(f"{futures[future]} sorted")
+            except (OSError, ValueError, KeyError) as err:
+                print("Exception in {0}: {1}".format(futures[future], err))
+
+    summary = pd.DataFrame(summaries, columns=['input', 'output', 'rows', 'retained', 'top |S|',
+                                               'total S', 'retained S'])
+    summary = summary.sort_values('input', ignore_index=True)
+    summary.to_csv(index, index=False)
+    return summary
+
+
+##Bytes of an input hashed to notice when it was replaced rather than appended to
+head_size = 1024
+
+
+def read_new_rows(filename, offset=0, blocksize=2**26):
+    '''
+       Parses the complete lines of a s-tilde .csv after byte `offset`
+
+       A partly written last line is left for the next call.
+
+       :param filename: s-tilde .csv file
+       :type filename: String
+
+       :param offset: Bytes already read, 0 to start after the header
+       :type offset: Int, optional - default 0
+
+       :param blocksize: Bytes read at a time
+       :type blocksize: Int, optional - default 64 MB
+
+       :return: Generator of (rows, offset after them)
+       :rtype: Generator of (Dataframe, Int)
+    '''
+    with open(filename, 'rb') as f:
+        if offset == 0:
+            if not f.readline().endswith(b'\n'):
+                return
+            offset = f.tell()
+        f.seek(offset)
+        rest = b''
+        while True:
+            block = f.read(blocksize)
+            if not block:
+                return
+            block = rest + block
+            cut = block.rfind(b'\n') + 1
+            rest = block[cut:]
+            if cut:
+                offset += cut
+                yield pd.read_csv(io.BytesIO(block[:cut]), header=None, names=columns), offset
+
+
+def file_head(filename, size):
+    '''
+       :return: Hash of the first `size` bytes of `filename`
+       :rtype: String
+    '''
+    with open(filename, 'rb') as f:
+        return hashlib.sha1(f.read(size)).hexdigest()
+
+
+def update_top_n(pattern, output='output.csv', outdir='./SortedData', number=20, blocksize=2**26):
+    '''
+       Merges the rows added to the inputs since the last update into the saved top-N
+
+       The read position of every input and the running row count and total
+       s-tilde are kept in `output`.state.json. Inputs that shrank or whose
+       first bytes changed are read again from the start, and everything is
+       rebuilt when the output is missing or `number` changed. The output is
+       only rewritten when the top-N changes.
+
+       :param pattern: s-tilde .csv file, directory or glob pattern
+       :type pattern: String
+
+       :param output: Output file name, with extension
+       :type output: String, optional - default output.csv
+
+       :param outdir: Output directory
+       :type outdir: String, optional - default ./SortedData
+
+       :param number: Number of rows to keep
+       :type number: Int, optional - default 20
+
+       :return: Top `number` rows, whether the output was rewritten, and the state
+       :rtype: Tuple of (Dataframe, Boolean, Dict)
+    '''
+    fullname = Path(outdir) / output
+    state_file = Path(outdir) / (output + '.state.json')
+    state = {'number': number, 'rows': 0, 'total': 0.0, 'files': {}}
+    top = None
+    if state_file.exists() and fullname.exists():
+        with open(state_file) as f:
+            saved = json.load(f)
+        if saved['number'] == number:
+            state = saved
+            top = pd.read_csv(fullname, float_precision='round_trip')
+    old = top
+
+    rebuilt = False
+    for filename in find_inputs(pattern):
+        path = str(filename.resolve())
+        if path in (str(fullname.resolve()), str(state_file.resolve())):
+            continue
+        info = state['files'].get(path, {'offset': 0, 'head': None})
+        size = filename.stat().st_size
+        if info['offset'] and (size < info['offset'] or
+                               file_head(filename, min(info['offset'], head_size)) != info['head']):
+            rebuilt = True
+            break
+        for chunk, offset in read_new_rows(filename, info['offset'], blocksize):
+            state['rows'] += len(chunk)
+            state['total'] += float(chunk['S'].sum())
+            chunk = add_derived_columns(chunk)
+            if top is not None:
+                chunk = pd.concat([top, chunk], ignore_index=True)
+            top = sort_by_magnitude(top_n(chunk, number)).reset_index(drop=True)
+            info = {'offset': offset, 'head': file_head(filename, min(offset, head_size))}
+        state['files'][path] = info
+
+    if rebuilt:
+        ##An input was replaced, start over from every file
+        state_file.unlink()
+        return update_top_n(pattern, output, outdir, number, blocksize)
+    if top is None:
+        top = add_derived_columns(pd.DataFrame(columns=columns, dtype=float))
+
+    ##equals treats NaNs in the same places as equal, array_equal would not
+    changed = old is None or not old.equals(top)
+    if changed:
+        write_output(top, output, outdir)
+    Path(outdir).mkdir(parents=True, exist_ok=True)
+    temp = state_file.with_name(state_file.name + '.tmp')
+    with open(temp, 'w') as f:
+        json.dump(state, f, indent=1)
+    os.replace(temp, state_file)
+    return top, changed, state
+
+
+def watch(pattern, output='output.csv', outdir='./SortedData', number=20, interval=10.0,
+          blocksize=2**26):
+    '''
+       Runs update_top_n every `interval` seconds until interrupted
+
+       :param interval: Seconds between updates
+       :type interval: Float, optional - default 10
+    '''
+    try:
+        while True:
+            top, changed, state = update_top_n(pattern, output, outdir, number, blocksize)
+            if changed:
+                print(f"{state['rows']} rows, total s-tilde {state['total']:.6g}")
+                print(top)
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__=="__main__":
+    ##Read file as mandatory argument, error if not given.
+    ##Read output as optional with -o flag, "output.csv" is default
+    ##Can get description of input by calling with -h
+    parser=ap.ArgumentParser()
+    parser.add_argument('file',help="CSV file of stilde values, or directory/glob pattern with --batch")
+    parser.add_argument('-o','--output',help='Sorted stilde output file, with extension',
+                        default="output.csv")
+    parser.add_argument('-n','--number',help="Number of stilde rows to sort",type=int,default=20)
+    parser.add_argument('--stream',help="Read the file in chunks, keeping only a running top-N",
+                        action='store_true')
+    parser.add_argument('--chunksize',help="Rows per chunk in --stream mode",type=int,default=1000000)
+    parser.add_argument('--batch',help="Sort every CSV matched by file across a process pool",
+                        action='store_true')
+    parser.add_argument('--outdir',help="Output directory",default="./SortedData")
+    parser.add_argument('-j','--jobs',help="Number of processes in --batch mode",type=int,default=None)
+    parser.add_argument('--incremental',help="Merge rows added to the file(s) since the last run into the output",
+                        action='store_true')
+    parser.add_argument('--watch',help="Repeat --incremental until interrupted",action='store_true')
+    parser.add_argument('--interval',help="Seconds between updates in --watch mode",type=float,default=10.0)
+    args=parser.parse_args()
+
+    if args.batch:
+        try:
+            print(sort_batch(args.file,args.outdir,args.number,args.chunksize,args.jobs))
+        except ValueError as err:
+            parser.error(str(err))
+        exit()
+    if args.watch:
+        watch(args.file,args.output,args.outdir,args.number,args.interval)
+        exit()
+    if args.incremental:
+        top, changed, state = update_top_n(args.file,args.output,args.outdir,args.number)
+        print(f"{state['rows']} rows, total s-tilde {state['total']:.6g}")
+        print(top if changed else "Top {0} s-tilde values unchanged".format(args.number))
+        exit()
+
+    filename = args.file
+    output = args.output
+    number = args.number
+
+    try:
+        if args.stream:
+            newData = stream_top_n(filename,number,args.chunksize)
+        else:
+            dataframe = pd.read_csv(filename,header=0,names=columns)
+    except FileNotFoundError as err:
+        print("Exception: {0}".format(err))
+        exit()
+    print('\n')
+
+    if not args.stream:
+        dataframe = sort_by_magnitude(add_derived_columns(dataframe))
+        print(dataframe)
+        newData = dataframe[:number]
+
+    print(f"Top {number} s-tilde values")
+    print(newData)
+
+    write_output(newData, output, args.outdir)
 
     #visual representation of s-tilde
     #print a relative number of s-tilde based on percent error/total sum of all values
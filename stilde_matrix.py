@@ -0,0 +1,261 @@
+'''
+Sparse occupied x virtual view of S-tilde contributions.
+
+StildeMatrix stores the (nocc, nvirt, S) entries of a table in compressed
+sparse row order (rows are occupied orbitals), with the electric/magnetic
+vectors kept alongside, plus a column (virtual orbital) permutation. Row and
+column sums, the top contributions of one orbital and coverage of orbital
+windows are then array slices and reductions instead of full-table groupbys.
+
+Tables are read with load_table from column_cache, so the .csv files written
+by sorting.py (or the raw files it reads) are only parsed once. Only NumPy is
+needed; to_scipy returns a scipy.sparse matrix when SciPy is installed.
+'''
+import numpy as np
+import pandas as pd
+from column_cache import load_table
+
+cart = ['X', 'Y', 'Z']
+
+
+class StildeMatrix:
+    '''
+       :param nocc: Occupied orbital of every entry
+       :type nocc: Array-like of ints
+
+       :param nvirt: Virtual orbital of every entry
+       :type nvirt: Array-like of ints
+
+       :param S: S-tilde of every entry
+       :type S: Array-like of floats
+
+       :param elec: Electric vector of every entry
+       :type elec: (N,3) array-like of floats, optional
+
+       :param mag: Magnetic vector of every entry
+       :type mag: (N,3) array-like of floats, optional
+    '''
+    def __init__(self, nocc, nvirt, S, elec=None, mag=None):
+        nocc = np.asarray(nocc, dtype=np.int64)
+        nvirt = np.asarray(nvirt, dtype=np.int64)
+        order = np.lexsort((nvirt, nocc))
+
+        ##CSR arrays: entries of occupied[k] are indptr[k]:indptr[k+1]
+        self.occupied, counts = np.unique(nocc[order], return_counts=True)
+        self.indptr = np.concatenate([[0], np.cumsum(counts)])
+        self.indices = nvirt[order]
+        self.data = np.asarray(S, dtype=float)[order]
+        self.elec = None if elec is None else np.asarray(elec, dtype=float).reshape(-1, 3)[order]
+        self.mag = None if mag is None else np.asarray(mag, dtype=float).reshape(-1, 3)[order]
+        self.rows = np.repeat(np.arange(len(self.occupied)), counts)
+
+        ##CSC view: entries of virtual[k] are col_order[col_indptr[k]:col_indptr[k+1]]
+        self.col_order = np.lexsort((self.occupied[self.rows], self.indices))
+        self.virtual, counts = np.unique(self.indices[self.col_order], return_counts=True)
+        self.col_indptr = np.concatenate([[0], np.cumsum(counts)])
+
+    @classmethod
+    def from_table(cls, df):
+        '''
+           :param df: Table with nocc, nvirt and S (or stilde) columns, and optionally the vectors
+           :type df: Dataframe or ColumnTable
+
+           :rtype: StildeMatrix
+        '''
+        stilde = 'S' if 'S' in df.columns else 'stilde'
+        vectors = {}
+        for kind in ('Electric', 'Magnetic'):
+            if all(kind + x in df.columns for x in cart):
+                vectors[kind] = np.column_stack([np.asarray(df[kind + x]) for x in cart])
+        return cls(np.asarray(df['nocc']), np.asarray(df['nvirt']), np.asarray(df[stilde]),
+                   vectors.get('Electric'), vectors.get('Magnetic'))
+
+    @classmethod
+    def from_csv(cls, filename):
+        '''
+           :param filename: S-tilde .csv, as read or written by sorting.py
+           :type filename: String
+
+           :rtype: StildeMatrix
+        '''
+        return cls.from_table(load_table(filename))
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def total(self):
+        '''Sum of S-tilde over all entries'''
+        return float(self.data.sum())
+
+    def occupied_totals(self, absolute=False):
+        '''
+           :param absolute: Sum absolute values of S-tilde instead of signed ones
+           :type absolute: Boolean, optional - default False
+
+           :return: Occupied orbitals and the sum of S-tilde over each of their rows
+           :rtype: Tuple of np.ndarray
+        '''
+        data = np.abs(self.data) if absolute else self.data
+        return self.occupied, np.add.reduceat(data, self.indptr[:-1]) if len(self) else data
+
+    def virtual_totals(self, absolute=False):
+        '''
+           :param absolute: Sum absolute values of S-tilde instead of signed ones
+           :type absolute: Boolean, optional - default False
+
+           :return: Virtual orbitals and the sum of S-tilde over each of their columns
+           :rtype: Tuple of np.ndarray
+        '''
+        data = self.data[self.col_order]
+        if absolute:
+            data = np.abs(data)
+        return self.virtual, np.add.reduceat(data, self.col_indptr[:-1]) if len(self) else data
+
+    def _entries(self, positions):
+        frame = pd.DataFrame({'nocc': self.occupied[self.rows[positions]],
+                              'nvirt': self.indices[positions], 'S': self.data[positions]})
+        for kind, vectors in (('Electric', self.elec), ('Magnetic', self.mag)):
+            if vectors is not None:
+                for n, x in enumerate(cart):
+                    frame[kind + x] = vectors[positions, n]
+        return frame
+
+    def row(self, i):
+        '''
+           :param i: Occupied orbital
+           :type i: Int
+
+           :return: Every entry of orbital `i`, by virtual orbital
+           :rtype: Dataframe
+        '''
+        k = np.searchsorted(self.occupied, i)
+        if k == len(self.occupied) or self.occupied[k] != i:
+            return self._entries(np.arange(0))
+        return self._entries(np.arange(self.indptr[k], self.indptr[k+1]))
+
+    def column(self, a):
+        '''
+           :param a: Virtual orbital
+           :type a: Int
+
+           :return: Every entry of orbital `a`, by occupied orbital
+           :rtype: Dataframe
+        '''
+        k = np.searchsorted(self.virtual, a)
+        if k == len(self.virtual) or self.virtual[k] != a:
+            return self._entries(np.arange(0))
+        return self._entries(self.col_order[self.col_indptr[k]:self.col_indptr[k+1]])
+
+    @staticmethod
+    def _top(frame, k):
+        order = np.argsort(-np.abs(frame['S'].values), kind='stable')[:int(k)]
+        return frame.iloc[order].reset_index(drop=True)
+
+    def top_virtuals(self, i, k=5):
+        '''
+           :param i: Occupied orbital
+           :type i: Int
+
+           :param k: Number of entries
+           :type k: Int, optional - default 5
+
+           :return: The `k` entries of orbital `i` with the largest absolute S-tilde
+           :rtype: Dataframe
+        '''
+        return self._top(self.row(i), k)
+
+    def top_occupied(self, a, k=5):
+        '''
+           :param a: Virtual orbital
+           :type a: Int
+
+           :param k: Number of entries
+           :type k: Int, optional - default 5
+
+           :return: The `k` entries of orbital `a` with the largest absolute S-tilde
+           :rtype: Dataframe
+        '''
+        return self._top(self.column(a), k)
+
+    def top_per_occupied(self, k=1):
+        '''
+           :param k: Number of entries per occupied orbital
+           :type k: Int, optional - default 1
+
+           :return: The `k` largest absolute S-tilde entries of every occupied orbital
+           :rtype: Dataframe
+        '''
+        order = np.lexsort((-np.abs(self.data), self.rows))
+        rank = np.arange(len(order)) - self.indptr[self.rows[order]]
+        return self._entries(order[rank < int(k)])
+
+    def coverage(self, occupied=None, virtual=None, absolute=False):
+        '''
+           Fraction of the total S-tilde coming from orbitals in a window
+
+           :param occupied: Inclusive (first, last) occupied orbitals, defaults to all
+           :type occupied: Tuple of ints, optional
+
+           :param virtual: Inclusive (first, last) virtual orbitals, defaults to all
+           :type virtual: Tuple of ints, optional
+
+           :param absolute: Compare absolute values of S-tilde instead of signed ones
+           :type absolute: Boolean, optional - default False
+
+           :raises ValueError: If the total S-tilde is zero, e.g. for an empty matrix
+
+           :rtype: Float
+        '''
+        data = np.abs(self.data) if absolute else self.data
+        total = data.sum()
+        if total == 0.0:
+            raise ValueError("Coverage is undefined, the total S-tilde is zero")
+        keep = np.ones(len(data), dtype=bool)
+        if occupied is not None:
+            nocc = self.occupied[self.rows]
+            keep &= (nocc >= occupied[0]) & (nocc <= occupied[1])
+        if virtual is not None:
+            keep &= (self.indices >= virtual[0]) & (self.indices <= virtual[1])
+        return float(data[keep].sum()/total)
+
+    def cumulative_coverage(self, axis='occupied', absolute=True):
+        '''
+           Orbitals ranked by the sum of their S-tilde, with the running fraction of the total
+
+           With absolute (the default) orbitals are ranked by the sum of |S| over
+           their entries, so the coverage rises monotonically to 1. Otherwise
+           they are ranked by the absolute value of their signed sum and the
+           signed sums are accumulated, which can overshoot 1 or turn negative
+           when contributions cancel.
+
+           :param axis: occupied or virtual
+           :type axis: String, optional - default occupied
+
+           :param absolute: Sum absolute values of S-tilde instead of signed ones
+           :type absolute: Boolean, optional - default True
+
+           :raises ValueError: If the total S-tilde is zero, e.g. for an empty matrix
+
+           :return: Orbital, its summed S-tilde and the cumulative fraction of the total
+           :rtype: Dataframe
+        '''
+        if axis == 'occupied':
+            orbitals, totals = self.occupied_totals(absolute)
+        else:
+            orbitals, totals = self.virtual_totals(absolute)
+        total = totals.sum()
+        if total == 0.0:
+            raise ValueError("Coverage is undefined, the total S-tilde is zero")
+        order = np.argsort(-np.abs(totals), kind='stable')
+        return pd.DataFrame({axis: orbitals[order], 'S': totals[order],
+                             'coverage': np.cumsum(totals[order])/total})
+
+    def to_scipy(self):
+        '''
+           :return: S-tilde as a SciPy CSR matrix; row k is occupied[k], column indices are virtual orbitals
+           :rtype: scipy.sparse.csr_matrix
+        '''
+        from scipy.sparse import csr_matrix
+        return csr_matrix((self.data, self.indices, self.indptr),
+                          shape=(len(self.occupied), int(self.indices.max(initial=-1)) + 1))
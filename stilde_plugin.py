@@ -0,0 +1,77 @@
+'''
+PyMOL plugin entry point for the S-tilde commands, with fast startup.
+
+Importing this module only needs pymol.cmd. register() adds a lightweight stub
+for every command; the first time one of them is used, the module defining it
+is imported (bringing in NumPy, and pandas once a table is read), registers
+the real commands with cmd.extend, and the call is passed on. The commands
+table is checked against the cmd.extend calls of each module by the tests. Scripted or headless PyMOL sessions
+that never draw S-tilde vectors no longer pay for those imports.
+
+Load it from pymolrc.pml (see the file in this directory), with this directory
+on sys.path: the commands live in the sibling modules (pymol_functions,
+generate_arrow, geometry, ...), so this file cannot be installed on its own
+through PyMOL's plugin manager.
+'''
+import importlib
+import os
+import sys
+from pymol import cmd
+
+##Module defining each command, kept in sync with the cmd.extend calls
+commands = {
+    'generate_arrow': ['cgo_arrow'],
+    'pymol_functions': ['loadCSV', 'newLoad', 'elec_mag', 'elec_mag_fromAtom', 'elec_mag_batch',
+                        'atom_vectors', 'animate_vectors', 'select_vectors', 'multiple_vectors',
+                        'export_vectors', 'createSphere', 'sphere_field', 'checkVecs', 'gaugeComp',
+                        'gaugeCompBatch', 'checkVecsBatch', 'polar_plot', 'polar_plot_batch',
+                        'export_polar_plot', 'coord_axes', 'stilde_cgo_cache'],
+    'background': ['polar_plot_async', 'loadCSV_async', 'multiple_vectors_async', 'checkVecs_async',
+                   'stilde_jobs', 'stilde_cancel', 'stilde_wait'],
+    'profiling': ['stilde_profile', 'stilde_profile_reset', 'stilde_profile_enable'],
+    'scene_manager': ['stilde_show', 'stilde_clear'],
+    'scene_budget': ['stilde_stats', 'stilde_budget'],
+}
+
+
+def stub(module, name):
+    '''
+       :param module: Name of the module defining the command
+       :type module: String
+
+       :param name: Name of the command
+       :type name: String
+
+       :return: Function importing `module` on its first call and running the real command
+       :rtype: Function
+    '''
+    def command(*args, **kwargs):
+        loaded = importlib.import_module(module)
+        ##Profiling turned on before this import, or asked for by STILDE_PROFILE, wraps
+        ##the new functions too
+        profiling = importlib.import_module('profiling')
+        if profiling.enabled:
+            profiling.instrument_loaded()
+        else:
+            profiling.enable_requested()
+        return getattr(loaded, name)(*args, **kwargs)
+    command.__name__ = name
+    command.__doc__ = f"Loads {module} on first use, see {module}.{name}"
+    return command
+
+
+def register():
+    '''
+       Adds a stub for every command whose module has not been imported yet
+
+       :return: None
+    '''
+    ##The command modules are kept next to this file
+    here = os.path.dirname(os.path.abspath(__file__))
+    if here not in sys.path:
+        sys.path.insert(0, here)
+    for module, names in commands.items():
+        if module in sys.modules:
+            continue
+        for name in names:
+            cmd.extend(name, stub(module, name))
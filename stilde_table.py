@@ -0,0 +1,145 @@
+'''
+Compact, array backed S-tilde table.
+
+StildeTable keeps the electric and magnetic vectors of every transition as
+two contiguous (N,3) arrays, with S and the occupied/virtual orbital indices
+as flat arrays, optionally in float32. The vectors of many rows are then one
+fancy index instead of one Dataframe lookup per component. Column lookup by
+name (ElectricX, S, Electric Magnitude, ...) returns array views or derived
+arrays, so the table can be used wherever loadCSV results are.
+'''
+import numpy as np
+from column_cache import load_table, ArrayTable
+
+cart = ['X', 'Y', 'Z']
+
+##Columns computed from the vectors instead of stored
+derived = ['Electric Magnitude', 'Magnetic Magnitude', 'Cosine of Angle']
+
+
+def row_vectors(table, rows):
+    '''
+       :param table: Table from loadCSV
+       :type table: StildeTable, Dataframe or ColumnTable
+
+       :param rows: Row positions
+       :type rows: Array-like of ints
+
+       :return: Electric and magnetic vectors of `rows`
+       :rtype: Tuple of (N,3) np.ndarray
+    '''
+    if isinstance(table, StildeTable):
+        return table.vectors(rows)
+    rows = np.asarray(rows, dtype=int)
+    return tuple(np.column_stack([np.asarray(table[kind + x])[rows] for x in cart])
+                 for kind in ('Electric', 'Magnetic'))
+
+
+class StildeTable(ArrayTable):
+    '''
+       :param elec: Electric vector of every transition
+       :type elec: (N,3) array-like of floats
+
+       :param mag: Magnetic vector of every transition
+       :type mag: (N,3) array-like of floats
+
+       :param S: S-tilde of every transition
+       :type S: Array-like of floats, optional
+
+       :param nocc: Occupied orbital of every transition
+       :type nocc: Array-like of ints, optional
+
+       :param nvirt: Virtual orbital of every transition
+       :type nvirt: Array-like of ints, optional
+
+       :param float32: Store the floats in single precision
+       :type float32: Boolean, optional - default False
+    '''
+    def __init__(self, elec, mag, S=None, nocc=None, nvirt=None, float32=False):
+        dtype = np.float32 if float32 else np.float64
+        self.elec = np.ascontiguousarray(elec, dtype=dtype).reshape(-1, 3)
+        self.mag = np.ascontiguousarray(mag, dtype=dtype).reshape(-1, 3)
+        self.S = None if S is None else np.ascontiguousarray(S, dtype=dtype)
+        self.nocc = None if nocc is None else np.ascontiguousarray(nocc, dtype=np.int32)
+        self.nvirt = None if nvirt is None else np.ascontiguousarray(nvirt, dtype=np.int32)
+        self.columns = [c for c, a in (('nocc', self.nocc), ('nvirt', self.nvirt), ('S', self.S))
+                        if a is not None]
+        self.columns += ['Electric' + x for x in cart] + ['Magnetic' + x for x in cart] + derived
+
+    @classmethod
+    def from_table(cls, df, float32=False):
+        '''
+           :param df: Table with Electric/Magnetic X/Y/Z columns, and optionally S (or stilde), nocc and nvirt
+           :type df: Dataframe or ColumnTable
+
+           :param float32: Store the floats in single precision
+           :type float32: Boolean, optional - default False
+
+           :rtype: StildeTable
+        '''
+        elec, mag = row_vectors(df, np.arange(len(df)))
+        stilde = next((c for c in ('S', 'stilde') if c in df.columns), None)
+        optional = [np.asarray(df[c]) if c in df.columns else None for c in ('nocc', 'nvirt')]
+        return cls(elec, mag, None if stilde is None else np.asarray(df[stilde]), *optional,
+                   float32=float32)
+
+    @classmethod
+    def from_csv(cls, filename, float32=False):
+        '''
+           :param filename: S-tilde .csv, as written by sorting.py
+           :type filename: String
+
+           :param float32: Store the floats in single precision
+           :type float32: Boolean, optional - default False
+
+           :rtype: StildeTable
+        '''
+        return cls.from_table(load_table(filename), float32)
+
+    def __len__(self):
+        return len(self.elec)
+
+    @property
+    def empty(self):
+        return len(self) == 0
+
+    @property
+    def nbytes(self):
+        '''Bytes held by the arrays'''
+        return sum(a.nbytes for a in (self.elec, self.mag, self.S, self.nocc, self.nvirt)
+                   if a is not None)
+
+    def vectors(self, rows):
+        '''
+           :param rows: Row positions
+           :type rows: Array-like of ints
+
+           :return: Electric and magnetic vectors of `rows`
+           :rtype: Tuple of (N,3) np.ndarray
+        '''
+        rows = np.asarray(rows, dtype=int)
+        return self.elec[rows], self.mag[rows]
+
+    def __getitem__(self, name):
+        if isinstance(name, (list, tuple)):
+            missing = [c for c in name if c not in self.columns]
+            if missing:
+                raise KeyError(missing)
+            view = StildeTable.__new__(StildeTable)
+            view.__dict__.update(self.__dict__)
+            view.columns = list(name)
+            return view
+        if name not in self.columns:
+            raise KeyError(name)
+        if name in ('nocc', 'nvirt', 'S'):
+            return getattr(self, name)
+        if name.startswith('Electric') and name[-1] in cart:
+            return self.elec[:, cart.index(name[-1])]
+        if name.startswith('Magnetic') and name[-1] in cart:
+            return self.mag[:, cart.index(name[-1])]
+        if name == 'Electric Magnitude':
+            return np.linalg.norm(self.elec, axis=1)
+        if name == 'Magnetic Magnitude':
+            return np.linalg.norm(self.mag, axis=1)
+        norms = np.linalg.norm(self.elec, axis=1)*np.linalg.norm(self.mag, axis=1)
+        return np.einsum('ij,ij->i', self.elec, self.mag)/np.where(norms > 0, norms, 1)
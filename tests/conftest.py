@@ -0,0 +1,54 @@
+'''
+Shared setup of the tests.
+
+The stand-in PyMOL of benchmarks/fake_pymol.py is installed before any module
+of the package is imported, so the tests run without PyMOL, and the CGO disk
+cache is turned off so every test builds its own geometry.
+'''
+import os
+import sys
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pytest
+
+root = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(root / 'benchmarks'), str(root)]
+os.environ['STILDE_CGO_CACHE'] = '0'
+
+import fake_pymol
+
+fake_cmd = fake_pymol.install()
+
+
+@pytest.fixture
+def cmd():
+    '''The fake pymol.cmd, with no calls or objects recorded'''
+    fake_cmd.reset()
+    return fake_cmd
+
+
+@pytest.fixture
+def make_raw():
+    '''
+       :return: Function making an unsorted s-tilde table with `rows` rows and
+                unique (nocc, nvirt) pairs, in the column order of sorting.columns
+       :rtype: Function
+    '''
+    def make(rows, seed=0):
+        rng = np.random.default_rng(seed)
+        raw = pd.DataFrame({'nocc': np.arange(1, rows+1), 'nvirt': np.arange(rows+1, 2*rows+1),
+                            'S': rng.normal(size=rows)})
+        for kind in ('Electric', 'Magnetic'):
+            for x in 'XYZ':
+                raw[kind + x] = rng.normal(size=rows)
+        return raw
+    return make
+
+
+@pytest.fixture
+def table(make_raw):
+    '''A sorted s-tilde table, as loadCSV returns it'''
+    import sorting
+    data = sorting.add_derived_columns(make_raw(20))
+    return sorting.sort_by_magnitude(data).reset_index(drop=True)
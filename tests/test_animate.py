@@ -0,0 +1,50 @@
+'''
+Every state of animate_vectors must hold the arrows of its own frame.
+'''
+import numpy as np
+import pytest
+import pymol_functions
+from generate_arrow import cgo_arrows
+
+
+@pytest.fixture
+def states(cmd, monkeypatch):
+    '''Records the CGO of every state, and the labels, loaded by animate_vectors'''
+    loaded = {'cgo': {}, 'labels': {}}
+    def load_cgo(obj, name, state=0, **kwargs):
+        loaded['cgo'][state] = obj
+    def pseudoatom(object='', label='', state=0, **kwargs):
+        loaded['labels'][state] = label
+    monkeypatch.setattr(cmd, 'load_cgo', load_cgo)
+    monkeypatch.setattr(cmd, 'pseudoatom', pseudoatom)
+    return loaded
+
+
+def frame_arrows(elec, mag, start=(0.0, 0.0, 0.0), elec_scale=7, mag_scale=7):
+    return (cgo_arrows(start, elec, type='electric', scaling=elec_scale)[0] +
+            cgo_arrows(start, mag, type='magnetic', scaling=mag_scale)[0])
+
+
+def test_frames_of_several_vectors(states):
+    rng = np.random.default_rng(12)
+    elec, mag = rng.normal(size=(3, 2, 3)), rng.normal(size=(3, 2, 3))
+    assert pymol_functions.animate_vectors(elec, mag, 2, 3, elec_start=[1.0, 0.0, 0.0],
+                                           mag_start=[1.0, 0.0, 0.0]) == 3
+    assert sorted(states['cgo']) == [1, 2, 3]
+    for frame in range(3):
+        np.testing.assert_allclose(states['cgo'][frame+1],
+                                   frame_arrows(elec[frame], mag[frame], [1.0, 0.0, 0.0], 2, 3))
+    assert not states['labels']
+
+
+def test_frames_and_labels_typed_in_pymol(states):
+    ##One vector per frame, as the nested list text of the docstring
+    count = pymol_functions.animate_vectors("[[1,0,0],[0,1,0]]", "[[0,0,1],[1,1,0]]",
+                                            labels="0.05 au, 0.08 au")
+    assert count == 2
+    np.testing.assert_allclose(states['cgo'][2], frame_arrows([[0, 1, 0]], [[1, 1, 0]]))
+    assert states['labels'] == {1: '0.05 au', 2: '0.08 au'}
+    pymol_functions.animate_vectors([[1, 0, 0], [0, 1, 0]], [[0, 0, 1], [1, 1, 0]],
+                                    labels=('first', 'second'))
+    np.testing.assert_allclose(states['cgo'][1], frame_arrows([[1, 0, 0]], [[0, 0, 1]]))
+    assert states['labels'] == {1: 'first', 2: 'second'}
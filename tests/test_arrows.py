@@ -0,0 +1,77 @@
+'''
+cgo_arrows must draw exactly what one cgo_arrow call per vector draws, from any str_to_list input.
+'''
+import numpy as np
+import pytest
+from generate_arrow import cgo_arrow, cgo_arrows, str_to_list
+
+##Floats of one arrow: a cylinder and a cone
+arrow_size = 31
+
+
+@pytest.fixture
+def vectors():
+    rng = np.random.default_rng(1)
+    return rng.normal(size=(6,3)), rng.normal(size=(6,3))
+
+
+@pytest.mark.parametrize('kind', ['electric', 'magnetic'])
+def test_cgo_arrows_match_cgo_arrow(cmd, vectors, kind):
+    origins, ends = vectors
+    obj, lengths, mids = cgo_arrows(origins, ends, type=kind, scaling=3)
+    assert len(obj) == arrow_size*len(ends)
+    for k in range(len(ends)):
+        single = cgo_arrow(list(origins[k]), list(ends[k]), type=kind, name=str(k), scaling=3,
+                           use_lab=False)
+        np.testing.assert_allclose(obj[arrow_size*k:arrow_size*(k+1)], single)
+    np.testing.assert_allclose(lengths, np.linalg.norm(ends - origins, axis=1))
+
+
+def test_cgo_arrows_from_atom_match_sele(cmd, vectors, monkeypatch):
+    atom = np.array([[1.0, -2.0, 0.5]])
+    monkeypatch.setattr(cmd, 'get_coords', lambda *args, **kwargs: atom)
+    _, ends = vectors
+    obj, lengths, _ = cgo_arrows(atom[0], ends, type='electric', scaling=2, from_atom=True)
+    for k in range(len(ends)):
+        single = cgo_arrow('sele', list(ends[k]), type='electric', name=str(k), scaling=2,
+                           use_lab=False)
+        np.testing.assert_allclose(obj[arrow_size*k:arrow_size*(k+1)], single)
+    np.testing.assert_allclose(lengths, np.linalg.norm(ends, axis=1))
+
+
+def test_cgo_arrows_parse_strings(cmd, vectors):
+    origins, ends = vectors
+    expected = cgo_arrows(origins, ends, from_atom=True)
+    parsed = cgo_arrows(str(origins.tolist()), str(ends.tolist()), from_atom="1")
+    np.testing.assert_allclose(parsed[0], expected[0])
+    ##"0" typed in PyMOL keeps from_atom off
+    off = cgo_arrows(str(origins.tolist()), str(ends.tolist()), from_atom="0")
+    np.testing.assert_allclose(off[0], cgo_arrows(origins, ends)[0])
+
+
+def test_cgo_arrows_midpoints(cmd, vectors):
+    origins, ends = vectors
+    obj, _, mids = cgo_arrows(origins, ends, scaling=1)
+    rows = np.reshape(obj, (-1, arrow_size))
+    ##From the start of the cylinder to the tip of the cone
+    np.testing.assert_allclose(mids, (rows[:, 1:4] + rows[:, 18:21])/2)
+    np.testing.assert_allclose(rows[:, 1:4], origins)
+
+
+@pytest.mark.parametrize('value', [0.5, 2, np.float32(1.5), np.int64(3)])
+def test_str_to_list_wraps_numbers(value):
+    assert str_to_list(value) == [float(value)]
+    assert str_to_list(value, internalType="int") == [value]
+
+
+def test_str_to_list_strings():
+    assert str_to_list("[1, 2.5,3]") == [1.0, 2.5, 3.0]
+    assert str_to_list("[[1,0,0],[0,1,0]]") == [[1, 0, 0], [0, 1, 0]]
+    assert str_to_list((4, 5)) == [4, 5]
+
+
+def test_sphere_field_with_one_value(cmd):
+    import pymol_functions
+    assert pymol_functions.sphere_field([[0.0, 1.0, 2.0]], 0.5, scale=2.0) == 1
+    ##COLOR r g b SPHERE x y z radius
+    np.testing.assert_allclose(cmd.objects['stilde_spheres'][4:], [7.0, 0.0, 1.0, 2.0, 1.0])
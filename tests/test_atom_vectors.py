@@ -0,0 +1,64 @@
+'''
+atom_vectors must draw every pair from its own atom, and refuse identifiers it cannot place.
+'''
+import numpy as np
+import pandas as pd
+import pytest
+import pymol_functions
+
+atoms = {'ID': [11, 12, 13, 14], 'name': ['C1', 'O', 'O', 'N']}
+coords = np.array([[0.0, 0.0, 0.0], [1.0, 2.0, 3.0], [-1.0, 0.5, 2.0], [4.0, 4.0, 0.0]])
+
+
+@pytest.fixture
+def molecule(cmd, monkeypatch):
+    def iterate(selection, expression, space):
+        key = expression[len('ids.append('):-1]
+        space['ids'].extend(atoms[key])
+    monkeypatch.setattr(cmd, 'iterate', iterate, raising=False)
+    monkeypatch.setattr(cmd, 'get_coords', lambda *args, **kwargs: coords)
+    return cmd
+
+
+vectors = {13: ([1.0, 0.0, 0.0], [0.0, 1.0, 0.0]), 11: ([0.5, 0.5, 0.0], [0.0, 0.0, 2.0])}
+
+
+def drawn(cmd, group):
+    name = group[len('stilde'):]
+    return cmd.objects['electric' + name], cmd.objects['magnetic' + name]
+
+
+def test_arrows_start_at_their_atoms(molecule):
+    group = pymol_functions.atom_vectors('mol', vectors, 2, 3)
+    elec = np.array([v[0] for v in vectors.values()])
+    mag = np.array([v[1] for v in vectors.values()])
+    starts = coords[[2, 0]]
+    expected = pymol_functions.elec_mag_batch(elec, mag, 2, 3, starts, starts, from_atom=True)
+    for obj, want in zip(drawn(molecule, group), drawn(molecule, expected)):
+        np.testing.assert_allclose(obj, want)
+
+
+def test_dict_text_and_csv(molecule, tmp_path):
+    group = pymol_functions.atom_vectors('mol', vectors)
+    from_text = pymol_functions.atom_vectors('mol', ' ' + str(vectors))
+    table = pd.DataFrame({'atom': list(vectors)})
+    for n, kind in enumerate(('Electric', 'Magnetic')):
+        for k, x in enumerate('XYZ'):
+            table[kind + x] = [v[n][k] for v in vectors.values()]
+    table.to_csv(tmp_path / 'atoms.csv', index=False)
+    from_csv = pymol_functions.atom_vectors('mol', str(tmp_path / 'atoms.csv'))
+    for other in (from_text, from_csv):
+        for obj, want in zip(drawn(molecule, other), drawn(molecule, group)):
+            np.testing.assert_allclose(obj, want)
+
+
+def test_names_shared_by_several_atoms_are_refused(molecule):
+    group = pymol_functions.atom_vectors('mol', {'N': vectors[13]}, key='name')
+    np.testing.assert_allclose(drawn(molecule, group)[0][1:4], coords[3])
+    with pytest.raises(KeyError, match='several atoms'):
+        pymol_functions.atom_vectors('mol', {'O': vectors[13], 'N': vectors[11]}, key='name')
+
+
+def test_missing_atoms_are_refused(molecule):
+    with pytest.raises(KeyError, match='not in mol'):
+        pymol_functions.atom_vectors('mol', {15: vectors[13]})
@@ -0,0 +1,65 @@
+'''
+Background jobs must draw what their synchronous commands draw, calling PyMOL only from its thread.
+'''
+import threading
+import time
+import numpy as np
+import pytest
+import background
+import pymol_functions
+
+
+@pytest.fixture
+def main_thread_only(cmd, monkeypatch):
+    '''Records the threads get_color_tuple is called from'''
+    threads = []
+    lookup = cmd.get_color_tuple
+    def get_color_tuple(color):
+        threads.append(threading.current_thread())
+        return lookup(color)
+    monkeypatch.setattr(cmd, 'get_color_tuple', get_color_tuple)
+    return threads
+
+
+def test_multiple_vectors_async_matches_batch(cmd, table, main_thread_only):
+    job = background.multiple_vectors_async("[0,2,5]", table)
+    assert background.stilde_wait(job, timeout=30)
+    assert background.jobs[job].status == 'done'
+    name = str(pymol_functions.count-1)
+    drawn = {kind: cmd.objects[kind + name] for kind in ('electric', 'magnetic')}
+    pymol_functions.multiple_vectors([0, 2, 5], table, batch=True)
+    name = str(pymol_functions.count-1)
+    for kind, obj in drawn.items():
+        np.testing.assert_allclose(obj, cmd.objects[kind + name])
+    assert main_thread_only and all(t is threading.main_thread() for t in main_thread_only)
+
+
+def test_cancelled_job_draws_nothing(cmd):
+    job = background.polar_plot_async([1.0, -0.5, 0.8, 0.3, -0.2, 0.1], 2000, 2000,
+                                      max_points=10000)
+    background.stilde_cancel(job)
+    assert background.stilde_wait(job, timeout=30)
+    assert background.jobs[job].status == 'cancelled'
+    assert 'positive_polar' not in cmd.objects
+
+
+def test_finished_job_reports_progress(cmd):
+    job = background.polar_plot_async([1.0, 1.0, 1.0, 0.0, 0.0, 0.0], 20, 20)
+    assert background.stilde_wait(job, timeout=30)
+    assert background.jobs[job].progress == 1.0
+    assert 'positive_polar' in cmd.objects
+
+
+def test_next_command_loads_finished_results(cmd):
+    ##No Qt dispatcher here, as in a headless script
+    job = background.jobs[background.polar_plot_async([1.0, 1.0, 1.0, 0.0, 0.0, 0.0], 20, 20)]
+    job.future.result(timeout=30)
+    ##The emit step is queued by a callback of the worker, just after the result
+    for _ in range(1000):
+        if not background.pending.empty():
+            break
+        time.sleep(0.01)
+    assert 'positive_polar' not in cmd.objects
+    second = background.polar_plot_async([1.0, 2.0, 1.0, 0.0, 0.0, 0.0], 10, 10)
+    assert job.status == 'done' and 'positive_polar' in cmd.objects
+    background.stilde_wait(second)
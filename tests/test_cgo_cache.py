@@ -0,0 +1,98 @@
+'''
+A hit in the CGO disk cache must return exactly what building the geometry returns.
+'''
+import os
+import numpy as np
+import pytest
+import cgo_cache
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(cgo_cache, 'directory', str(tmp_path / 'cgo'))
+    monkeypatch.setattr(cgo_cache, 'enabled', True)
+    monkeypatch.setattr(cgo_cache, 'min_floats', 10)
+    return cgo_cache
+
+
+def counting(objs):
+    '''
+       :return: Builder returning `objs`, and the list of its calls
+       :rtype: Tuple
+    '''
+    calls = []
+    def build():
+        calls.append(1)
+        return objs
+    return build, calls
+
+
+def test_hit_returns_the_built_lists(cache):
+    ##Values float32 would round
+    objs = [(np.arange(30)/3 + 1e-9).tolist(), [0.1]*12]
+    build, calls = counting(objs)
+    assert cache.cached('test', build, [1.0, 2.0], 3) == objs
+    assert cache.cached('test', build, [1.0, 2.0], 3) == objs
+    assert len(calls) == 1 and len(cache.entries()) == 1
+
+
+def test_other_inputs_miss(cache):
+    build, calls = counting([[0.5]*20])
+    cache.cached('test', build, [1.0, 2.0], 3)
+    cache.cached('test', build, [1.0, 2.5], 3)
+    cache.cached('test', build, [1.0, 2.0], 4)
+    cache.cached('other', build, [1.0, 2.0], 3)
+    assert len(calls) == 4 and len(cache.entries()) == 4
+
+
+def test_arrays(cache):
+    pos = np.random.default_rng(0).normal(size=(10, 3))
+    build, calls = counting([pos.ravel()])
+    cache.cached('test', build, 1, arrays=True)
+    loaded, = cache.cached('test', build, 1, arrays=True)
+    assert isinstance(loaded, np.ndarray) and len(calls) == 1
+    np.testing.assert_array_equal(loaded.reshape(-1, 3), pos)
+
+
+def test_small_results_are_not_stored(cache):
+    build, calls = counting([[1.0]*9])
+    cache.cached('test', build, 1)
+    cache.cached('test', build, 1)
+    assert len(calls) == 2 and not cache.entries()
+
+
+def test_disabled_cache_always_builds(cache, monkeypatch):
+    monkeypatch.setattr(cache, 'enabled', False)
+    build, calls = counting([[1.0]*20])
+    cache.cached('test', build, 1)
+    cache.cached('test', build, 1)
+    assert len(calls) == 2 and not os.path.exists(cache.directory)
+
+
+def test_evict_deletes_the_least_recently_used(cache):
+    for k in range(3):
+        cache.cached('test', lambda: [[float(k)]*100], k)
+        path = cache.entry_path(cache.make_key('test', k))
+        os.utime(path, (k, k))
+    ##Reading an entry makes it the most recently used
+    cache.load(cache.make_key('test', 0))
+    size = cache.entries()[0][1]
+    assert cache.evict(2*size) == 1
+    assert not os.path.exists(cache.entry_path(cache.make_key('test', 1)))
+
+
+def test_polar_plots_share_the_lobes_on_disk(cmd, cache):
+    import pymol_functions
+    tensor = [1.0, -0.5, 0.8, 0.3, -0.2, 0.1]
+    pymol_functions.polar_cache.clear()
+    pymol_functions.polar_plot_objects(tensor, 30, 20)
+    for scale, origin in ((2.0, [1.0, 0.0, 0.0]), (-0.5, [0.0, 3.0, 1.0])):
+        pymol_functions.polar_cache.clear()
+        from_disk = pymol_functions.polar_plot_objects(tensor, 30, 20, origin, scale)
+        cache.enabled = False
+        pymol_functions.polar_cache.clear()
+        built = pymol_functions.polar_plot_objects(tensor, 30, 20, origin, scale)
+        cache.enabled = True
+        assert from_disk == built
+    ##Scale and origin are applied after loading, not part of the key
+    assert len(cache.entries()) == 1
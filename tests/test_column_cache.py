@@ -0,0 +1,93 @@
+'''
+Tables must read back from the column cache exactly as they were parsed.
+'''
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from column_cache import cache_path, load_table, read_csv_chunks, ColumnTable
+
+
+@pytest.fixture
+def csv(tmp_path, table):
+    path = tmp_path / 'output.csv'
+    table.to_csv(path, index=False)
+    return str(path)
+
+
+def test_round_trip(csv):
+    built = load_table(csv)
+    assert isinstance(built, ColumnTable)
+    assert os.path.exists(cache_path(csv))
+    expected = pd.read_csv(csv)
+    for table in (built, load_table(csv)):
+        assert list(table.columns) == list(expected.columns)
+        assert len(table) == len(expected)
+        pd.testing.assert_frame_equal(table.to_frame(), expected)
+
+
+def test_columns_and_rows(csv):
+    table = load_table(csv)
+    expected = pd.read_csv(csv)
+    np.testing.assert_array_equal(table['S'], expected['S'])
+    sub = table[['S', 'nocc']]
+    assert sub.columns == ['S', 'nocc']
+    pd.testing.assert_frame_equal(table.take([3, 1]), expected.iloc[[3, 1]])
+
+
+def test_stale_cache_is_rebuilt(csv, make_raw):
+    load_table(csv)
+    make_raw(7, seed=9).to_csv(csv, index=False)
+    table = load_table(csv)
+    pd.testing.assert_frame_equal(table.to_frame(), pd.read_csv(csv))
+
+
+def test_long_header(tmp_path):
+    ##A header longer than the column alignment must not overlap the first column
+    frame = pd.DataFrame({f"a rather long column name {k}": np.arange(5.0) + k for k in range(40)})
+    path = str(tmp_path / 'wide.csv')
+    frame.to_csv(path, index=False)
+    load_table(path)
+    pd.testing.assert_frame_equal(load_table(path).to_frame(), frame)
+
+
+def test_text_columns_are_not_cached(tmp_path):
+    path = str(tmp_path / 'text.csv')
+    pd.DataFrame({'name': ['a', 'b'], 'S': [1.0, 2.0]}).to_csv(path, index=False)
+    assert isinstance(load_table(path), pd.DataFrame)
+    assert not os.path.exists(cache_path(path))
+
+
+def test_empty_table(tmp_path):
+    path = str(tmp_path / 'empty.csv')
+    pd.DataFrame({'S': np.zeros(0)}).to_csv(path, index=False)
+    assert load_table(path).empty
+
+
+def test_read_csv_chunks_reports_progress(csv):
+    seen = []
+    data = read_csv_chunks(csv, seen.append, chunksize=3)
+    pd.testing.assert_frame_equal(data, pd.read_csv(csv))
+    assert seen == sorted(seen) and seen[-1] == 1.0
+
+
+def test_loadCSV_returns_a_dataframe_unless_lazy(cmd, csv):
+    import pymol_functions
+    assert isinstance(pymol_functions.loadCSV(csv), pd.DataFrame)
+    assert isinstance(pymol_functions.loadCSV(csv, lazy=1), ColumnTable)
+    pd.testing.assert_frame_equal(pymol_functions.loadCSV(csv, cache=0), pd.read_csv(csv))
+
+
+def test_cache_directory(csv, tmp_path, monkeypatch):
+    import column_cache
+    monkeypatch.setattr(column_cache, 'directory', str(tmp_path / 'caches'))
+    table = load_table(csv)
+    assert isinstance(table, ColumnTable)
+    assert not os.path.exists(csv + '.stcache')
+    assert os.path.dirname(cache_path(csv)) == str(tmp_path / 'caches')
+    ##A .csv of the same name elsewhere has its own cache
+    other = tmp_path / 'other' / os.path.basename(csv)
+    other.parent.mkdir()
+    pd.read_csv(csv)[:5].to_csv(other, index=False)
+    assert cache_path(str(other)) != cache_path(csv)
+    assert len(load_table(str(other))) == 5 and len(load_table(csv)) == len(table)
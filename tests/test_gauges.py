@@ -0,0 +1,60 @@
+'''
+gauge_table and gaugeCompBatch must give the numbers and arrows of one gaugeComp call per pair.
+'''
+import numpy as np
+import pytest
+import pymol_functions
+
+##Floats of one arrow: a cylinder and a cone
+arrow_size = 31
+
+
+@pytest.fixture
+def vecs():
+    rng = np.random.default_rng(10)
+    return {gauge: [rng.normal(size=(3, 3)), rng.normal(size=(3, 3))]
+            for gauge in ('LG', 'VE', 'VM')}
+
+
+def printed(out, label):
+    '''Dict printed by gaugeComp after `label`='''
+    line = next(line for line in out.split('\n') if line.startswith(label + '='))
+    return eval(line[len(label)+1:], {'np': np})
+
+
+def test_gauge_table_matches_gaugeComp(cmd, vecs, capsys):
+    table = pymol_functions.gauge_table(vecs, pairs=[(1, 5), (2, 6), (3, 7)])
+    assert list(table['gauge']) == ['LG', 'VE', 'VM']*3
+    assert list(table['nocc']) == [1]*3 + [2]*3 + [3]*3
+    for k in range(3):
+        capsys.readouterr()
+        pymol_functions.gaugeComp({gauge: [v[0][k].tolist(), v[1][k].tolist()]
+                                   for gauge, v in vecs.items()})
+        out = capsys.readouterr().out
+        rows = table[table['pair'] == k].set_index('gauge')
+        for column, label in (('S', 'Stilde'), ('Electric Magnitude', 'Electric'),
+                              ('Magnetic Magnitude', 'Magnetic')):
+            expected = printed(out, label)
+            np.testing.assert_allclose(rows[column], [expected[gauge] for gauge in rows.index])
+        ##The angles are printed as an array, to 8 significant digits
+        angles = next(line for line in out.split('\n') if line.startswith('Angles='))
+        np.testing.assert_allclose(rows['Angle'], np.array(angles[8:-1].split(), dtype=float),
+                                   rtol=1e-7)
+
+
+def test_gaugeCompBatch_draws_what_gaugeComp_draws(cmd, vecs):
+    single = []
+    for k in range(3):
+        first = pymol_functions.count
+        pymol_functions.gaugeComp({gauge: [v[0][k].tolist(), v[1][k].tolist()]
+                                   for gauge, v in vecs.items()})
+        single.append([(cmd.objects[f"vec_electric{n}"], cmd.objects[f"vec_magnetic{n}"])
+                       for n in range(first, first+len(vecs))])
+    first = pymol_functions.count
+    pymol_functions.gaugeCompBatch(vecs, draw=[0, 1, 2])
+    for j in range(len(vecs)):
+        for kind, batch in enumerate((cmd.objects[f"electric{first+j}"],
+                                      cmd.objects[f"magnetic{first+j}"])):
+            for k in range(3):
+                np.testing.assert_allclose(batch[arrow_size*k:arrow_size*(k+1)], single[k][j][kind],
+                                           atol=1e-12)
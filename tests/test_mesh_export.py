@@ -0,0 +1,95 @@
+'''
+Exported meshes must have well formed headers and hold one instance per transition.
+'''
+import json
+import os
+import struct
+import numpy as np
+import pytest
+import mesh_export
+from geometry import sphere_mesh
+
+##Vertices of one arrow with 16 sides, see geometry.arrow_mesh
+arrow_vertices = 5*16 + 3
+
+
+@pytest.fixture
+def meshes(table):
+    return list(mesh_export.vector_meshes(*mesh_export.row_vectors(table, range(4))))
+
+
+def test_obj(tmp_path, meshes):
+    path = mesh_export.write(meshes, str(tmp_path / 'vectors.obj'))
+    lines = open(path).read().split('\n')
+    assert lines[0].startswith('#')
+    assert [line for line in lines if line.startswith('o ')] == ['o electric', 'o magnetic']
+    assert sum(line.startswith('v ') for line in lines) == 2*4*arrow_vertices
+    faces = [line for line in lines if line.startswith('f ')]
+    assert len(faces) == sum(m.primitives for m in meshes)
+    ##Indices count from 1 over the whole file
+    last = max(int(corner.split('//')[0]) for face in faces for corner in face.split()[1:])
+    assert last == 2*4*arrow_vertices
+
+
+@pytest.mark.parametrize('binary', [True, False])
+def test_ply(tmp_path, meshes, binary):
+    path = str(tmp_path / 'vectors.ply')
+    mesh_export.write_ply(meshes, path, binary)
+    data = open(path, 'rb').read()
+    header, body = data.split(b'end_header\n')
+    header = header.decode('ascii').split('\n')
+    assert header[0] == 'ply'
+    assert header[1] == f"format {'binary_little_endian' if binary else 'ascii'} 1.0"
+    assert f"element vertex {2*4*arrow_vertices}" in header
+    assert f"element face {sum(m.primitives for m in meshes)}" in header
+    if binary:
+        ##x y z nx ny nz as floats, rgba as bytes; faces as a count byte and 3 ints
+        faces = sum(m.primitives for m in meshes)
+        assert len(body) == 2*4*arrow_vertices*(6*4 + 4) + faces*(1 + 3*4)
+
+
+def test_glb(tmp_path, meshes):
+    path = mesh_export.write(meshes, str(tmp_path / 'vectors.glb'))
+    data = open(path, 'rb').read()
+    magic, version, length = struct.unpack('<III', data[:12])
+    assert (magic, version, length) == (mesh_export.GLB_MAGIC, 2, len(data))
+    size, kind = struct.unpack('<II', data[12:20])
+    assert kind == mesh_export.JSON_CHUNK and size % 4 == 0
+    gltf = json.loads(data[20:20+size])
+    assert [node['name'] for node in gltf['nodes']] == ['electric', 'magnetic']
+    binary_size, kind = struct.unpack('<II', data[20+size:28+size])
+    assert kind == mesh_export.BIN_CHUNK and binary_size >= gltf['buffers'][0]['byteLength']
+    positions = gltf['accessors'][gltf['meshes'][0]['primitives'][0]['attributes']['POSITION']]
+    assert positions['count'] == 4*arrow_vertices
+
+
+def test_unknown_format(tmp_path, meshes):
+    with pytest.raises(ValueError):
+        mesh_export.write(meshes, str(tmp_path / 'vectors.stl'))
+
+
+def test_sphere_mesh_radii():
+    centers = np.array([[0.0, 0.0, 0.0], [3.0, 1.0, -2.0]])
+    mesh = sphere_mesh(centers, [0.5, 2.0], [1.0, 0.0, 0.0], segments=12)
+    for center, radius, part in zip(centers, [0.5, 2.0], mesh.split(2)):
+        np.testing.assert_allclose(np.linalg.norm(part.positions - center, axis=1), radius,
+                                   rtol=1e-6)
+
+
+def test_export_table_split_with_spheres(tmp_path, table):
+    paths = mesh_export.export_table(table, [0, 3, 5], outdir=str(tmp_path / 'out'), fmt='glb',
+                                     spheres=0.5)
+    assert len(paths) == 3 and all(os.path.exists(p) for p in paths)
+    assert os.path.basename(paths[1]) == f"stilde_3_{table['nocc'][3]}_{table['nvirt'][3]}.glb"
+    data = open(paths[1], 'rb').read()
+    size, = struct.unpack('<I', data[12:16])
+    gltf = json.loads(data[20:20+size])
+    assert [node['name'] for node in gltf['nodes']] == [f"{kind}3_{table['nocc'][3]}_"
+                                                        f"{table['nvirt'][3]}"
+                                                        for kind in ('electric', 'magnetic',
+                                                                     'stilde')]
+    ##The spheres are transparent and colored by the sign of S
+    sphere = mesh_export.stilde_spheres([1.0, -2.0], 0.5)
+    assert sphere.colors[0, 3] == pytest.approx(0.5)
+    np.testing.assert_allclose(sphere.colors[0, :3], [0.0, 0.0, 1.0])
+    np.testing.assert_allclose(sphere.colors[-1, :3], [1.0, 0.5, 0.0])
@@ -0,0 +1,73 @@
+'''
+stilde_plugin must stub every command, and load only what the first command needs.
+'''
+import ast
+import os
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+import pytest
+import stilde_plugin
+
+root = Path(__file__).resolve().parent.parent
+
+
+def extended(module):
+    '''
+       :return: Names of the commands a module registers with cmd.extend
+       :rtype: List of strings
+    '''
+    tree = ast.parse((root / f"{module}.py").read_text())
+    return [call.args[0].value for call in ast.walk(tree)
+            if isinstance(call, ast.Call) and isinstance(call.func, ast.Attribute)
+            and call.func.attr == 'extend' and getattr(call.func.value, 'id', None) == 'cmd'
+            and call.args and isinstance(call.args[0], ast.Constant)]
+
+
+def test_commands_table_matches_the_modules():
+    for module, names in stilde_plugin.commands.items():
+        assert sorted(names) == sorted(extended(module)), module
+    ##Modules registering commands that are not in the table
+    for path in root.glob('*.py'):
+        if path.stem not in stilde_plugin.commands and path.stem != 'stilde_plugin':
+            assert not extended(path.stem), path.stem
+
+
+def run(code, **environ):
+    '''Runs `code` in a fresh interpreter with the fake PyMOL, returning its output'''
+    setup = f"""
+        import sys
+        sys.path[:0] = [{str(root / 'benchmarks')!r}, {str(root)!r}]
+        import fake_pymol
+        cmd = fake_pymol.install()
+        import stilde_plugin
+        stilde_plugin.register()
+    """
+    env = {name: value for name, value in os.environ.items() if name != 'STILDE_PROFILE'}
+    env.update(STILDE_CGO_CACHE='0', **environ)
+    done = subprocess.run([sys.executable, '-c', textwrap.dedent(setup) + textwrap.dedent(code)],
+                          env=env, capture_output=True, text=True, timeout=120)
+    assert done.returncode == 0, done.stderr
+    return done.stdout
+
+
+def test_drawing_commands_load_without_pandas():
+    out = run("""
+        cmd.keyword['polar_plot'][0]('[1,1,1,0,0,0]', 10, 10)
+        cmd.keyword['elec_mag'][0]([1,0,0], [0,1,0])
+        print('pandas' in sys.modules, 'positive_polar' in cmd.objects)
+    """)
+    assert out.split() == ['False', 'True']
+
+
+@pytest.mark.parametrize('command', ['cgo_arrow', 'polar_plot'])
+def test_stubs_honour_STILDE_PROFILE(command):
+    out = run(f"""
+        args = ([0,0,0], [1,0,0]) if {command!r} == 'cgo_arrow' else ('[1,1,1,0,0,0]', 10, 10)
+        cmd.keyword[{command!r}][0](*args)
+        import profiling
+        print(profiling.enabled, any(name.endswith({command!r}) for name in profiling.stats))
+        cmd.keyword[{command!r}][0](*args)
+    """, STILDE_PROFILE='1')
+    assert out.split() == ['True', 'True']
@@ -0,0 +1,114 @@
+'''
+The polar plot grid must not depend on how it is split into blocks, cached or batched.
+'''
+import numpy as np
+import pytest
+import pymol_functions
+from geometry import calc_r, direction_table, polar_vertices, adaptive_polar_vertices
+
+tensor = [1.0, -0.5, 0.8, 0.3, -0.2, 0.1]
+
+
+@pytest.mark.parametrize('max_points', [1, 49, 50, 777, 2999])
+def test_chunked_polar_vertices_match_unchunked(max_points):
+    ##60*50 points fit in one direction_table, smaller max_points go through theta blocks
+    pos, neg = polar_vertices(tensor, 60, 50, scale=1.5)
+    chunked_pos, chunked_neg = polar_vertices(tensor, 60, 50, scale=1.5, max_points=max_points)
+    np.testing.assert_allclose(chunked_pos, pos, atol=1e-12)
+    np.testing.assert_allclose(chunked_neg, neg, atol=1e-12)
+    assert len(pos) + len(neg) == 60*50
+
+
+@pytest.mark.parametrize('max_points', [1000000, 500])
+def test_progress_blocks_give_the_same_grid(max_points):
+    seen = []
+    pos, neg = polar_vertices(tensor, 40, 30, max_points=max_points)
+    blocked = polar_vertices(tensor, 40, 30, max_points=max_points, progress=seen.append,
+                             block=100)
+    np.testing.assert_array_equal(blocked[0], pos)
+    np.testing.assert_array_equal(blocked[1], neg)
+    assert len(seen) > 1 and seen == sorted(seen) and seen[-1] == 1.0
+
+
+def test_lobes_follow_the_sign_of_r():
+    pos, neg = polar_vertices([1.0, -1.0, 0.0, 0.0, 0.0, 0.0], 40, 40)
+    ##r = x^2 - y^2 on the unit sphere: |x| >= |y| on the positive lobe
+    assert np.all(np.abs(pos[:, 0]) >= np.abs(pos[:, 1]) - 1e-12)
+    assert np.all(np.abs(neg[:, 1]) > np.abs(neg[:, 0]))
+
+
+@pytest.mark.parametrize('Ntheta,Nphi,max_level', [(150, 150, 4), (10, 10, 4), (3, 2, 4),
+                                                   (100, 37, 3), (64, 64, 6)])
+def test_adaptive_grid_stays_within_the_requested_resolution(Ntheta, Nphi, max_level):
+    ##With tol 0 every interval is refined as far as allowed
+    pos, neg = adaptive_polar_vertices(tensor, Ntheta, Nphi, tol=0.0, max_level=max_level)
+    ##Every line of theta also holds its phi = pi end
+    assert len(pos) + len(neg) <= Ntheta*(Nphi+1)
+
+
+def test_direction_table_is_shared_and_matches_calc_r():
+    u, basis = direction_table(12, 9)
+    assert direction_table(12, 9)[0] is u and not u.flags.writeable
+    ##r = u.T @ T @ u for a full symmetric tensor
+    full = np.array([[1.0, 0.3, -0.2], [0.3, -0.5, 0.1], [-0.2, 0.1, 0.8]])
+    np.testing.assert_allclose(basis @ tensor, np.einsum('ni,ij,nj->n', u, full, u))
+    ##Row 1 is theta 0 and the second phi of the grid
+    assert basis[1] @ tensor == pytest.approx(calc_r(0.0, np.pi/9, tensor))
+
+
+@pytest.fixture
+def evaluations(monkeypatch):
+    '''Counts the grids polar_lobes evaluates, with an empty cache'''
+    calls = []
+    evaluate = pymol_functions.polar_vertices
+    def counted(*args, **kwargs):
+        calls.append(args[:3])
+        return evaluate(*args, **kwargs)
+    monkeypatch.setattr(pymol_functions, 'polar_vertices', counted)
+    pymol_functions.polar_cache.clear()
+    yield calls
+    pymol_functions.polar_cache.clear()
+
+
+def test_polar_lobes_are_evaluated_once_per_tensor(evaluations):
+    pos, neg = pymol_functions.polar_lobes(tensor, 30, 20)
+    for scale in (2.0, 0.5):
+        scaled = pymol_functions.polar_lobes(str(tensor), 30, 20, scale)
+        np.testing.assert_allclose(scaled[0], pos*scale)
+        np.testing.assert_allclose(scaled[1], neg*scale)
+    ##A negative scale turns the negative lobe outwards, it becomes the positive one
+    flipped = pymol_functions.polar_lobes(tensor, 30, 20, -2.0)
+    np.testing.assert_allclose(flipped[0], neg*2.0)
+    np.testing.assert_allclose(flipped[1], pos*2.0)
+    assert len(evaluations) == 1
+    pymol_functions.polar_lobes(tensor, 30, 21)
+    assert len(evaluations) == 2
+
+
+def test_polar_cache_drops_the_least_recently_used(evaluations, monkeypatch):
+    monkeypatch.setattr(pymol_functions, 'polar_cache_size', 2)
+    tensors = [[1.0, 1.0, float(k), 0.0, 0.0, 0.0] for k in range(3)]
+    for t in tensors[:2]:
+        pymol_functions.polar_lobes(t, 10, 10)
+    pymol_functions.polar_lobes(tensors[0], 10, 10)
+    pymol_functions.polar_lobes(tensors[2], 10, 10)
+    assert [key[0] for key in pymol_functions.polar_cache] == [tuple(tensors[0]), tuple(tensors[2])]
+    assert len(evaluations) == 3
+
+
+@pytest.mark.parametrize('max_points', [1000000, 150])
+def test_polar_plot_batch_matches_polar_plot(cmd, max_points):
+    rng = np.random.default_rng(11)
+    tensors, origins = rng.normal(size=(4, 6)), rng.normal(size=(4, 3))
+    names = pymol_functions.polar_plot_batch(tensors, origins, 15, 10, scale=1.5,
+                                             max_points=max_points)
+    assert len(names) == 8
+    for k in range(4):
+        single = pymol_functions.polar_plot_objects(tensors[k], 15, 10, origins[k], 1.5)
+        np.testing.assert_allclose(cmd.objects[f"polar{k}_positive"], single[0])
+        np.testing.assert_allclose(cmd.objects[f"polar{k}_negative"], single[1])
+
+    ##One line loop per tensor in each merged object
+    pymol_functions.polar_plot_batch(tensors, origins, 15, 10, scale=1.5, merge=1, name='all')
+    merged = np.concatenate([cmd.objects[f"polar{k}_positive"] for k in range(4)])
+    np.testing.assert_allclose(cmd.objects['all_positive'], merged)
@@ -0,0 +1,69 @@
+'''
+SceneBudget must remove hidden entries first, then the least recently drawn ones, and keep its totals.
+'''
+import pytest
+from scene_budget import SceneBudget, object_bytes
+
+
+@pytest.fixture
+def draw(cmd):
+    '''Loads an object of `size` floats and tracks it in `budget`'''
+    def draw(budget, name, size=9):
+        cmd.load_cgo([0.0]*size, name)
+        return budget.track(name, objs=[[0.0]*size], kind='spheres')
+    return draw
+
+
+def test_least_recently_drawn_go_first(cmd, draw):
+    budget = SceneBudget(max_objects=3)
+    for name in ('a', 'b', 'c'):
+        assert draw(budget, name) == []
+    budget.touch('a')
+    assert draw(budget, 'd') == ['b']
+    assert draw(budget, 'e') == ['c']
+    assert list(budget.entries) == ['a', 'd', 'e']
+    assert 'b' not in cmd.objects and 'c' not in cmd.objects
+
+
+def test_hidden_entries_go_first(cmd, draw, monkeypatch):
+    budget = SceneBudget(max_objects=2)
+    draw(budget, 'a')
+    draw(budget, 'b')
+    names = cmd.get_names
+    monkeypatch.setattr(cmd, 'get_names', lambda kind, enabled_only=0:
+                        [n for n in names() if not enabled_only or n != 'b'])
+    assert draw(budget, 'c') == ['b']
+    assert list(budget.entries) == ['a', 'c']
+
+
+def test_entries_deleted_elsewhere_are_forgotten(cmd, draw):
+    budget = SceneBudget(max_objects=2)
+    draw(budget, 'a')
+    draw(budget, 'b')
+    cmd.delete('a')
+    assert draw(budget, 'c') == []
+    assert list(budget.entries) == ['b', 'c']
+
+
+def test_merge_keeps_the_geometry(cmd, draw):
+    budget = SceneBudget(max_objects=3, policy='merge')
+    for name in ('a', 'b', 'c'):
+        draw(budget, name)
+    ##The merged object counts as one more object
+    assert draw(budget, 'd') == ['a', 'b']
+    assert 'a' not in cmd.objects and len(cmd.objects['stilde_merged']) == 18
+    assert budget.usage()[:2] == (3, 4)
+    budget.clear_merged()
+    budget.forget('c')
+    budget.forget('d')
+    assert budget.usage() == (0, 0, 0)
+
+
+def test_totals_follow_the_entries(draw):
+    budget = SceneBudget()
+    draw(budget, 'a', 18)
+    draw(budget, 'a', 9)
+    assert budget.usage()[:2] == (1, 1)
+    assert budget.usage()[2] >= object_bytes
+    budget.forget('a')
+    assert budget.usage() == (0, 0, 0)
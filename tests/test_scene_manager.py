@@ -0,0 +1,73 @@
+'''
+SceneManager.show must only touch the transitions that changed.
+'''
+import numpy as np
+import pytest
+from generate_arrow import cgo_arrow
+from scene_manager import SceneManager
+
+
+@pytest.fixture
+def scene(cmd):
+    return SceneManager(group='test_scene')
+
+
+def keys(table, rows):
+    return [(int(table['nocc'][k]), int(table['nvirt'][k])) for k in rows]
+
+
+def test_show_draws_every_new_transition(scene, cmd, table):
+    removed, added, updated = scene.show([0, 1, 2], table)
+    assert (removed, updated) == ([], [])
+    assert added == keys(table, [0, 1, 2])
+    for key in added:
+        assert f"{scene.name(key)}_elec" in cmd.objects
+        assert f"{scene.name(key)}_mag" in cmd.objects
+        assert scene.name(key) in cmd.others
+
+
+def test_show_applies_only_the_difference(scene, cmd, table):
+    scene.show([0, 1, 2], table)
+    loads = cmd.calls['load_cgo']
+    removed, added, updated = scene.show([1, 2, 3], table)
+    assert removed == keys(table, [0])
+    assert added == keys(table, [3])
+    assert updated == []
+    ##One electric and one magnetic object for the single new transition
+    assert cmd.calls['load_cgo'] - loads == 2
+    ##Deleting the group deletes its objects in PyMOL
+    assert scene.name(removed[0]) not in cmd.others
+    assert set(scene.displayed) == set(keys(table, [1, 2, 3]))
+
+
+def test_same_selection_draws_nothing(scene, cmd, table):
+    scene.show([4, 5], table)
+    loads = cmd.calls['load_cgo']
+    assert scene.show([5, 4], table) == ([], [], [])
+    assert scene.show([5, 4], table, fromAtom="0", use_lab="0") == ([], [], [])
+    assert cmd.calls['load_cgo'] == loads
+
+
+def test_changed_parameters_redraw_in_place(scene, cmd, table):
+    scene.show([0, 1], table)
+    removed, added, updated = scene.show([0, 1, 2], table, elec_scale=3)
+    assert removed == []
+    assert added == keys(table, [2])
+    assert updated == keys(table, [0, 1])
+
+
+def test_arrows_match_cgo_arrow(scene, cmd, table):
+    scene.show([0], table, elec_scale=2)
+    key, = keys(table, [0])
+    elec = [table[f"Electric{x}"][0] for x in 'XYZ']
+    expected = cgo_arrow([0.0, 0.0, 0.0], elec, type='electric', name='check', scaling=2,
+                         use_lab=False)
+    np.testing.assert_allclose(cmd.objects[f"{scene.name(key)}_elec"], expected)
+
+
+def test_clear_forgets_everything(scene, cmd, table):
+    scene.show([0, 1], table)
+    scene.clear()
+    assert scene.displayed == {}
+    removed, added, updated = scene.show([0, 1], table)
+    assert added == keys(table, [0, 1])
@@ -0,0 +1,79 @@
+'''
+Streamed and incremental rankings must equal sorting the whole table at once.
+'''
+import numpy as np
+import pandas as pd
+import pytest
+import sorting
+
+
+def full_sort(raw, number):
+    data = sorting.add_derived_columns(raw.copy())
+    return sorting.sort_by_magnitude(data)[:number].reset_index(drop=True)
+
+
+@pytest.mark.parametrize('chunksize', [7, 100, 1000])
+def test_stream_top_n_matches_full_sort(tmp_path, make_raw, chunksize):
+    raw = make_raw(300, seed=3)
+    raw.to_csv(tmp_path / 'stilde.csv', index=False)
+    top = sorting.stream_top_n(tmp_path / 'stilde.csv', 15, chunksize)
+    pd.testing.assert_frame_equal(top, full_sort(raw, 15), check_dtype=False)
+
+
+@pytest.mark.parametrize('blocksize', [64, 2**26])
+def test_incremental_matches_full_sort(tmp_path, make_raw, blocksize):
+    raw = make_raw(300, seed=2)
+    path = tmp_path / 'stilde.csv'
+    outdir = tmp_path / 'out'
+    raw[:100].to_csv(path, index=False)
+    top, changed, state = sorting.update_top_n(str(path), outdir=str(outdir), number=10,
+                                               blocksize=blocksize)
+    assert changed and state['rows'] == 100
+    pd.testing.assert_frame_equal(top, full_sort(raw[:100], 10), check_dtype=False)
+
+    raw[100:].to_csv(path, mode='a', header=False, index=False)
+    top, changed, state = sorting.update_top_n(str(path), outdir=str(outdir), number=10,
+                                               blocksize=blocksize)
+    assert state['rows'] == 300
+    assert state['total'] == pytest.approx(raw['S'].sum())
+    pd.testing.assert_frame_equal(top, full_sort(raw, 10), check_dtype=False)
+    written = pd.read_csv(outdir / 'output.csv')
+    pd.testing.assert_frame_equal(written, full_sort(raw, 10), check_dtype=False)
+
+
+def test_partly_written_line_waits_for_the_next_update(tmp_path, make_raw):
+    raw = make_raw(50, seed=4)
+    path = tmp_path / 'stilde.csv'
+    outdir = str(tmp_path / 'out')
+    text = raw.to_csv(index=False)
+    cut = text.rfind('\n', 0, len(text)-1) + 10
+    path.write_text(text[:cut])
+    _, _, state = sorting.update_top_n(str(path), outdir=outdir, number=5)
+    assert state['rows'] == 49
+    path.write_text(text)
+    top, _, state = sorting.update_top_n(str(path), outdir=outdir, number=5)
+    assert state['rows'] == 50
+    pd.testing.assert_frame_equal(top, full_sort(raw, 5), check_dtype=False)
+
+
+def test_unchanged_top_rows_with_nan_are_not_rewritten(tmp_path, make_raw):
+    raw = make_raw(30, seed=5)
+    ##A null electric vector makes the cosine NaN
+    raw.loc[3, ['ElectricX', 'ElectricY', 'ElectricZ']] = 0.0
+    raw.loc[3, 'S'] = 50.0
+    raw.to_csv(tmp_path / 'stilde.csv', index=False)
+    outdir = str(tmp_path / 'out')
+    with np.errstate(invalid='ignore'):
+        top, changed, _ = sorting.update_top_n(str(tmp_path / 'stilde.csv'), outdir=outdir,
+                                               number=5)
+        assert changed and top['Cosine of Angle'].isna().any()
+        _, changed, _ = sorting.update_top_n(str(tmp_path / 'stilde.csv'), outdir=outdir,
+                                             number=5)
+    assert not changed
+
+
+def test_batch_refuses_to_overwrite_its_inputs(tmp_path, make_raw):
+    make_raw(10).to_csv(tmp_path / 'stilde.csv', index=False)
+    with pytest.raises(ValueError):
+        sorting.sort_batch(str(tmp_path), outdir=str(tmp_path))
+    pd.testing.assert_frame_equal(pd.read_csv(tmp_path / 'stilde.csv'), make_raw(10))
@@ -0,0 +1,41 @@
+'''
+sphere_field must draw the sphere createSphere draws for every position, colored by the sign of S.
+'''
+import numpy as np
+import pytest
+import pymol_functions
+
+
+def test_spheres_match_createSphere(cmd):
+    rng = np.random.default_rng(13)
+    positions, stilde = rng.normal(size=(5, 3)), rng.normal(size=5)
+    assert pymol_functions.sphere_field(positions, stilde, scale=2.0, pos_color="red",
+                                        neg_color="blue") == 5
+    rows = np.reshape(cmd.objects['stilde_spheres'], (-1, 9))
+    for row, position, s in zip(rows, positions, stilde):
+        pymol_functions.createSphere(list(position), 2.0*abs(s))
+        np.testing.assert_allclose(row[4:], cmd.objects['s1'])
+        np.testing.assert_allclose(row[:4], [6.0] + ([1.0, 0.0, 0.0] if s >= 0 else [0.0, 0.0, 1.0]))
+
+
+@pytest.mark.parametrize('count,quality', [(1, 4), (50, 4), (51, 3), (5000, 2), (60000, 0)])
+def test_quality_follows_the_number_of_spheres(cmd, monkeypatch, count, quality):
+    settings = {}
+    monkeypatch.setattr(cmd, 'set', lambda name, value, *args: settings.__setitem__(name, value))
+    pymol_functions.sphere_field(np.zeros((count, 3)), np.ones(count))
+    assert settings['cgo_sphere_quality'] == quality
+    pymol_functions.sphere_field(np.zeros((count, 3)), np.ones(count), quality=1)
+    assert settings['cgo_sphere_quality'] == 1
+
+
+def test_positions_and_values_typed_in_pymol(cmd):
+    pymol_functions.sphere_field("[[0,0,0],[1,2,3]]", "[0.5,-1]", name="typed")
+    rows = np.reshape(cmd.objects['typed'], (-1, 9))
+    np.testing.assert_allclose(rows[:, 5:], [[0, 0, 0, 0.5], [1, 2, 3, 1.0]])
+
+
+def test_spheres_are_tracked_by_the_budget(cmd):
+    from scene_budget import budget
+    pymol_functions.sphere_field(np.zeros((4, 3)), np.ones(4), name="tracked")
+    assert budget.entries['tracked'].vertices == 4
+    budget.forget('tracked')
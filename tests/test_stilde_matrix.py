@@ -0,0 +1,73 @@
+'''
+StildeMatrix reductions must equal the same groupbys over the table.
+'''
+import numpy as np
+import pandas as pd
+import pytest
+from stilde_matrix import StildeMatrix
+
+
+@pytest.fixture
+def frame():
+    ##Few orbitals, so every row and column holds several entries of both signs
+    rng = np.random.default_rng(6)
+    frame = pd.DataFrame({'nocc': rng.integers(1, 10, 200), 'nvirt': rng.integers(10, 30, 200)})
+    frame = frame.drop_duplicates().reset_index(drop=True)
+    frame['S'] = rng.normal(size=len(frame))
+    for kind in ('Electric', 'Magnetic'):
+        for x in 'XYZ':
+            frame[kind + x] = rng.normal(size=len(frame))
+    return frame
+
+
+@pytest.mark.parametrize('axis,totals', [('nocc', 'occupied_totals'), ('nvirt', 'virtual_totals')])
+def test_totals_match_groupby(frame, axis, totals):
+    matrix = StildeMatrix.from_table(frame)
+    for absolute in (False, True):
+        expected = frame['S'].abs() if absolute else frame['S']
+        expected = expected.groupby(frame[axis]).sum()
+        orbitals, sums = getattr(matrix, totals)(absolute)
+        np.testing.assert_array_equal(orbitals, expected.index)
+        np.testing.assert_allclose(sums, expected.values)
+
+
+def test_row_and_column(frame):
+    matrix = StildeMatrix.from_table(frame)
+    row = matrix.row(3)
+    expected = frame[frame['nocc'] == 3].sort_values('nvirt').reset_index(drop=True)
+    pd.testing.assert_frame_equal(row, expected, check_dtype=False)
+    assert matrix.column(5).empty
+    assert len(matrix.top_occupied(12, 2)) == min(2, (frame['nvirt'] == 12).sum())
+
+
+@pytest.mark.parametrize('absolute', [False, True])
+def test_coverage(frame, absolute):
+    matrix = StildeMatrix.from_table(frame)
+    S = frame['S'].abs() if absolute else frame['S']
+    window = frame['nocc'].between(2, 5) & frame['nvirt'].between(12, 20)
+    assert matrix.coverage((2, 5), (12, 20), absolute) == pytest.approx(S[window].sum()/S.sum())
+    assert matrix.coverage(absolute=absolute) == pytest.approx(1.0)
+
+
+def test_cumulative_coverage_rises_to_one(frame):
+    matrix = StildeMatrix.from_table(frame)
+    for axis in ('occupied', 'virtual'):
+        coverage = matrix.cumulative_coverage(axis)['coverage'].values
+        assert np.all(np.diff(coverage) >= 0) and np.all(coverage > 0)
+        assert coverage[-1] == pytest.approx(1.0)
+    ##Signed sums may cancel, the last row still covers the whole total
+    signed = matrix.cumulative_coverage(absolute=False)
+    assert signed['coverage'].iloc[-1] == pytest.approx(1.0)
+    np.testing.assert_allclose(np.abs(signed['S']), np.sort(np.abs(signed['S']))[::-1])
+
+
+def test_zero_total_raises():
+    empty = StildeMatrix([], [], [])
+    with pytest.raises(ValueError):
+        empty.coverage()
+    with pytest.raises(ValueError):
+        empty.cumulative_coverage()
+    cancelling = StildeMatrix([1, 1], [2, 3], [0.5, -0.5])
+    with pytest.raises(ValueError):
+        cancelling.coverage()
+    assert cancelling.coverage(absolute=True) == 1.0
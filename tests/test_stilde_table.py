@@ -0,0 +1,52 @@
+'''
+StildeTable must read like the Dataframe it was built from.
+'''
+import numpy as np
+import pandas as pd
+import pytest
+from column_cache import load_table
+from stilde_table import StildeTable, row_vectors
+
+
+def test_columns_match_the_table(table):
+    compact = StildeTable.from_table(table)
+    pd.testing.assert_frame_equal(compact.to_frame(), table[compact.columns], check_dtype=False)
+    pd.testing.assert_frame_equal(compact.take([4, 0]), table[compact.columns].iloc[[4, 0]],
+                                  check_dtype=False)
+    assert 'Cosine of Angle' in compact and 'stilde' not in compact
+
+
+def test_row_vectors_of_every_kind_of_table(table, tmp_path):
+    table.to_csv(tmp_path / 'output.csv', index=False)
+    ##Compared with the table as read back, the .csv may round the last digit
+    table = pd.read_csv(tmp_path / 'output.csv')
+    expected = row_vectors(table, [3, 1, 7])
+    for other in (StildeTable.from_table(table), load_table(str(tmp_path / 'output.csv'))):
+        for vectors, want in zip(row_vectors(other, [3, 1, 7]), expected):
+            np.testing.assert_array_equal(vectors, want)
+
+
+def test_float32(table):
+    compact = StildeTable.from_table(table, float32=True)
+    assert compact['S'].dtype == np.float32
+    assert compact.nbytes < StildeTable.from_table(table).nbytes
+    np.testing.assert_allclose(compact['Electric Magnitude'], table['Electric Magnitude'],
+                               rtol=1e-6)
+
+
+def test_column_subset(table):
+    compact = StildeTable.from_table(table)[['S', 'ElectricX']]
+    assert compact.columns == ['S', 'ElectricX']
+    with pytest.raises(KeyError):
+        compact[['S', 'missing']]
+
+
+@pytest.mark.parametrize('rows', [20, 8])
+def test_repr_lines_up_with_the_header(table, tmp_path, rows):
+    table[:rows].to_csv(tmp_path / 'output.csv', index=False)
+    for printed in (StildeTable.from_table(table[:rows]), load_table(str(tmp_path / 'output.csv'))):
+        lines = [line for line in repr(printed).split('\n') if line and line != '...'
+                 and not line.startswith('[')]
+        ##Every row ends where the header ends, as Dataframe printing aligns right
+        assert len(lines) == min(rows, 10) + 1
+        assert len({len(line) for line in lines}) == 1
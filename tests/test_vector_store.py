@@ -0,0 +1,67 @@
+'''
+VectorStore lookups must return the rows a pandas index lookup of the raw files returns.
+'''
+import numpy as np
+import pandas as pd
+import pytest
+from column_cache import ColumnTable
+from vector_store import VectorStore, pair_keys
+
+
+def write_vectors(path, rng, rows=60):
+    '''Writes a raw gauge vector file in random pair order, returning its table'''
+    pairs = [(i, a) for i in range(1, 7) for a in range(7, 17)]
+    order = rng.permutation(len(pairs))[:rows]
+    raw = pd.DataFrame([pairs[k] for k in order])
+    raw = pd.concat([raw, pd.DataFrame(rng.normal(size=(rows, 7)), columns=range(2, 9))], axis=1)
+    raw.to_csv(path, sep=' ', header=False, index=False)
+    return pd.read_csv(path, sep=r'\s+', header=None).set_index([0, 1])
+
+
+@pytest.fixture
+def vectors(tmp_path):
+    rng = np.random.default_rng(8)
+    raw0 = write_vectors(tmp_path / 'vector_VE0N', rng)
+    return raw0, write_vectors(tmp_path / 'vector_VE1N', rng), tmp_path
+
+
+def test_lookup_matches_pandas(vectors):
+    raw, _, tmp_path = vectors
+    pairs = list(raw.index[::-3])
+    store = VectorStore(str(tmp_path / 'vector_VE0N'))
+    np.testing.assert_array_equal(store.lookup(pairs), np.array([raw.loc[pair] for pair in pairs]))
+    ##Reopened from the cache
+    again = VectorStore(str(tmp_path / 'vector_VE0N'))
+    assert isinstance(again.table, ColumnTable)
+    np.testing.assert_array_equal(again.lookup(pairs[:4]), store.lookup(pairs[:4]))
+
+
+def test_missing_pairs_are_named(vectors):
+    raw, _, tmp_path = vectors
+    store = VectorStore(str(tmp_path / 'vector_VE0N'))
+    missing = [(9, 9), (1, 99)]
+    with pytest.raises(KeyError, match=r'\[\[9, 9\], \[1, 99\]\]'):
+        store.lookup([raw.index[0]] + missing)
+    ##Past the last key, and between keys
+    with pytest.raises(KeyError):
+        store.lookup([(2**20, 1)])
+    with pytest.raises(KeyError):
+        store.lookup([(0, 0)])
+
+
+def test_pair_keys_sort_like_the_pairs():
+    occ, virt = np.array([1, 1, 2, 3]), np.array([50, 2**31, 1, 0])
+    assert np.all(np.diff(pair_keys(occ, virt)) > 0)
+
+
+def test_gauge_vectors_match_the_original_checkVecs(cmd, vectors, monkeypatch):
+    import pymol_functions
+    raw0, raw1, tmp_path = vectors
+    pairs = [pair for pair in raw0.index if pair in raw1.index][:5]
+    monkeypatch.chdir(tmp_path)
+    elec, mag = pymol_functions.gauge_vectors(pairs, "VE")
+    for k, (i, a) in enumerate(pairs):
+        ##What checkVecs computed one pair at a time
+        vecs0, vecs1 = np.array(raw0.loc[i, a]), np.array(raw1.loc[i, a])
+        np.testing.assert_allclose(elec[k], -(vecs1[1:4] - vecs0[1:4]))
+        np.testing.assert_allclose(mag[k], vecs1[4:])
@@ -0,0 +1,83 @@
+'''
+Indexed store for the raw gauge vector files (vector_VE0N, vector_VM1N, ...).
+
+Each whitespace delimited file is converted once, through column_cache, into a
+binary table sorted on a combined (occupied, virtual) key. Later opens memory
+map the table, and a whole batch of pairs is found with one searchsorted call.
+'''
+import numpy as np
+from column_cache import load_table, read_csv_chunks
+
+##Columns of the raw files after the occupied/virtual indices
+value_columns = [f"v{n}" for n in range(7)]
+
+
+def pair_keys(occ, virt):
+    '''
+       Combines occupied and virtual orbital indices into one sortable integer key
+
+       :param occ: Occupied orbital indices
+       :type occ: Array-like of ints
+
+       :param virt: Virtual orbital indices
+       :type virt: Array-like of ints
+
+       :return: Keys
+       :rtype: np.ndarray of int64
+    '''
+    return (np.asarray(occ, dtype=np.int64) << 32) | np.asarray(virt, dtype=np.int64)
+
+
+def read_vector_file(filename, progress=None):
+    '''
+       Parses a raw gauge vector file and sorts it by (occupied, virtual) key
+
+       :param filename: Path of the vector file
+       :type filename: String
+
+       :param progress: Called with the fraction of the file parsed
+       :type progress: Function, optional
+
+       :return: Table with a key column followed by the vector data
+       :rtype: Dataframe
+    '''
+    data = read_csv_chunks(filename, progress, sep=r'\s+', header=None)
+    data.columns = ['occ', 'virt'] + value_columns[:data.shape[1]-2]
+    data.insert(0, 'key', pair_keys(data['occ'], data['virt']))
+    return data.sort_values('key', kind='stable').reset_index(drop=True)
+
+
+class VectorStore:
+    '''
+       Memory mapped, key sorted view of one gauge vector file
+
+       :param filename: Path of the raw vector file
+       :type filename: String
+
+       :param progress: Called with the fraction parsed when the file is converted
+       :type progress: Function, optional
+    '''
+    def __init__(self, filename, progress=None):
+        self.filename = filename
+        self.table = load_table(filename, reader=lambda name: read_vector_file(name, progress))
+        self.columns = [c for c in value_columns if c in self.table.columns]
+
+    def lookup(self, pairs):
+        '''
+           Finds the vector data of many (occupied, virtual) pairs at once
+
+           :param pairs: Pairs to look up
+           :type pairs: (M,2) array-like of ints
+
+           :return: Rows of vector data, in the order of `pairs`
+           :rtype: (M,7) np.ndarray
+        '''
+        pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+        wanted = pair_keys(pairs[:, 0], pairs[:, 1])
+        keys = np.asarray(self.table['key'])
+        rows = np.searchsorted(keys, wanted)
+        found = rows < len(keys)
+        found[found] = keys[rows[found]] == wanted[found]
+        if not found.all():
+            raise KeyError(f"{pairs[~found].tolist()} not in {self.filename}")
+        return np.column_stack([np.asarray(self.table[c])[rows] for c in self.columns])